@@ -0,0 +1,180 @@
+'''
+Benchmarks for the consolidator using simulated mats instead of serial ports.
+
+1. Decoding throughput of the byte by byte reader the consolidator used
+   originally against the bulk reader of the acquisition pipeline in
+   script.py.
+2. Frame rate against the number of mats when the mats are polled one after
+   another and when they are read in parallel (--parallel).
+3. Capture cadence at 20 fps when storing a frame sometimes stalls (a slow
+   disk), with the mats read and the frames stored on the same thread and
+   with the acquisition pipeline.
+
+"python benchmark.py [seconds_per_case]"
+
+'''
+
+import os
+import sys
+import time
+import tempfile
+import threading
+import numpy as np
+import script
+from matfile import MatFileWriter
+from concurrent.futures import ThreadPoolExecutor
+from simulator import SimulatedMat, randomMap
+
+# original implementation which reads one byte at a time
+def legacyReceiveMap(ser, currMat, frame):
+    offset = 48*currMat
+    xbyte = ser.read().decode('utf-8')
+    HighByte = ser.read()
+    LowByte = ser.read()
+    high = int.from_bytes(HighByte, 'big')
+    low = int.from_bytes(LowByte, 'big')
+    nPoints = ((high << 8) | low)
+    xbyte = ser.read().decode('utf-8')
+    xbyte = ser.read().decode('utf-8')
+    n = 0
+    while(n < nPoints):
+        x = int.from_bytes(ser.read(), 'big')
+        y = int.from_bytes(ser.read(), 'big')
+        high = int.from_bytes(ser.read(), 'big')
+        low = int.from_bytes(ser.read(), 'big')
+        frame[y+offset][x] = ((high << 8) | low)
+        n += 1
+
+# the points read in one go and decoded together, the same way as the acquisition pipeline
+def bulkReceiveMap(ser, currMat, frame):
+    payload = script.activePointsReadPayload(ser)
+    if payload is not None:
+        script.decodePoints(payload, frame, currMat)
+
+# request and decode frames for the given duration, returns frames per second
+def run(receive, mat, duration):
+    frames = 0
+    startTime = time.perf_counter()
+    while time.perf_counter() - startTime < duration:
+        frame = np.zeros((48, 48))
+        script.RequestPressureMap(mat)
+        # skip the leading 'N'
+        mat.read()
+        receive(mat, 0, frame)
+        frames += 1
+    return frames / (time.perf_counter() - startTime)
+
+# wait for the reply of a mat (bounded by the port timeout) and decode it, returns the time of the reply
+def waitMap(ser, currMat, frame):
+    if ser.read() == b'N':
+        replyTime = time.time()
+        bulkReceiveMap(ser, currMat, frame)
+        return replyTime
+    ser.reset_input_buffer()
+    return None
+
+# read a frame from every mat, one after another
+def readSequential(ports, frame, readers):
+    matTimes = []
+    for x in range(len(ports)):
+        script.RequestPressureMap(ports[x])
+        matTimes.append(waitMap(ports[x], x, frame))
+    return matTimes
+
+# request a frame from all the mats at once and read the replies on the readers pool
+def readParallel(ports, frame, readers):
+    for port in ports:
+        script.RequestPressureMap(port)
+    # each thread only writes to the rows of its own mat
+    return list(readers.map(lambda x: waitMap(ports[x], x, frame), range(len(ports))))
+
+# frames per second for numMats simulated mats with the given reply latency
+def runMats(read, numMats, latency, duration, readers=None):
+    ports = [SimulatedMat(randomMap(300, seed=x), latency=latency) for x in range(numMats)]
+    frame = np.zeros((48*numMats, 48))
+    frames = 0
+    startTime = time.perf_counter()
+    while time.perf_counter() - startTime < duration:
+        frame.fill(0)
+        read(ports, frame, readers)
+        frames += 1
+    return frames / (time.perf_counter() - startTime)
+
+def benchmarkDecode(duration):
+    print("Points \t| Byte Reads (fps) \t| Bulk Read (fps) \t| Speedup")
+    print("-" * 72)
+    for nPoints in [0, 100, 500, 1000, 2304]:
+        frame = randomMap(nPoints)
+        mat = SimulatedMat(frame)
+        # both readers have to produce the same matrix
+        expected = np.zeros((48, 48))
+        mat.write(b'R'); mat.read(); legacyReceiveMap(mat, 0, expected)
+        decoded = np.zeros((48, 48))
+        mat.write(b'R'); mat.read(); bulkReceiveMap(mat, 0, decoded)
+        assert np.array_equal(expected, decoded)
+        legacy = run(legacyReceiveMap, mat, duration)
+        bulk = run(bulkReceiveMap, mat, duration)
+        print(nPoints, "\t|", '%.1f'%legacy, "\t\t|", '%.1f'%bulk, "\t\t|", '%.1fx'%(bulk/legacy))
+
+def benchmarkMats(duration, latency=0.01):
+    print("\nMats \t| Sequential (fps) \t| Parallel (fps) \t| Speedup \t(reply latency", latency*1000, "ms)")
+    print("-" * 72)
+    for numMats in [1, 2, 3, 4]:
+        sequential = runMats(readSequential, numMats, latency, duration)
+        with ThreadPoolExecutor(max_workers=numMats) as readers:
+            parallel = runMats(readParallel, numMats, latency, duration, readers)
+        print(numMats, "\t|", '%.1f'%sequential, "\t\t|", '%.1f'%parallel, "\t\t|", '%.1fx'%(parallel/sequential))
+
+# recording which stalls for stall seconds every interval frames
+class StallingRecorder:
+    def __init__(self, writer, stall=0.3, interval=20):
+        self.writer = writer
+        self.stall = stall
+        self.interval = interval
+        self.frames = 0
+
+    def append(self, frame, timestamp=None, matTimes=None):
+        self.frames += 1
+        if self.frames % self.interval == 0:
+            time.sleep(self.stall)
+        self.writer.append(frame, timestamp, matTimes)
+
+# the main loop before the pipeline, reading and storing on one thread
+def runSynchronous(ports, readers, recorder, scheduler, duration):
+    stop = threading.Event()
+    threading.Timer(duration, stop.set).start()
+    frame = np.zeros((48*len(ports), 48))
+    while not stop.is_set():
+        matTimes = readParallel(ports, frame, readers)
+        recorder.append(frame, time.time(), matTimes)
+        frame.fill(0)
+        scheduler.wait(stop)
+    return recorder.frames
+
+def runPipeline(ports, readers, recorder, scheduler, duration):
+    stop = threading.Event()
+    pipeline = script.AcquisitionPipeline(ports, recorder, scheduler, 48*len(ports), 48, 64, readers)
+    pipeline.start(stop)
+    stop.wait(duration)
+    stop.set()
+    pipeline.join()
+    return pipeline.stats()["dropped"]
+
+def benchmarkPipeline(duration, numMats=2, latency=0.01):
+    print("\nStalls of 0.3 s every 20 frames \t| Captured (fps) \t| Late \t| Dropped \t(target 20 fps)")
+    print("-" * 88)
+    with tempfile.TemporaryDirectory() as folder, ThreadPoolExecutor(max_workers=numMats) as readers:
+        for label, run in [("Same thread", runSynchronous), ("Pipeline", runPipeline)]:
+            ports = [SimulatedMat(randomMap(300, seed=x), latency=latency) for x in range(numMats)]
+            writer = MatFileWriter(os.path.join(folder, label + ".smat"), 48*numMats, 48, numMatTimes=numMats)
+            scheduler = script.FrameScheduler(20)
+            run(ports, readers, StallingRecorder(writer), scheduler, duration)
+            writer.close()
+            print(label.ljust(32), "\t|", '%.1f'%scheduler.rate(), "\t\t|", scheduler.late, "\t|", scheduler.dropped)
+
+if __name__ == '__main__':
+    duration = float(sys.argv[1]) if len(sys.argv) > 1 else 1.0
+    benchmarkDecode(duration)
+    benchmarkMats(duration)
+    # the stalls have to happen a few times
+    benchmarkPipeline(max(duration, 5.0))
@@ -0,0 +1,114 @@
+'''
+Instrumentation of the consolidator
+
+Values such as the reply latency of each mat, the bytes read, the points
+in each frame and the time taken to decode and store a frame are counted in
+fixed size histograms, so the memory used does not grow with the length of
+the session. Recording can be switched on and off while the program runs;
+when it is off a value costs a single attribute check.
+
+The histograms have buckets spaced evenly on a log scale (4 per doubling
+by default) between a lowest and a highest value, with one more bucket on
+each side for the values outside them. Percentiles are given as the upper
+edge of their bucket, so they are within 19% of the real value.
+
+'''
+
+import json
+import math
+import time
+import bisect
+import threading
+
+class Histogram:
+    def __init__(self, name, unit, low, high, bucketsPerDoubling=4):
+        self.name = name
+        self.unit = unit
+        numBuckets = math.ceil(math.log2(high / low) * bucketsPerDoubling)
+        self.bounds = [low * 2 ** (i / bucketsPerDoubling) for i in range(numBuckets + 1)]
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    # upper edge of the bucket holding the q-th percentile, never more than the largest value
+    def percentile(self, q):
+        if self.count == 0:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.bounds[i] if i < len(self.bounds) else self.max, self.max)
+        return self.max
+
+    def summary(self):
+        if self.count == 0:
+            return {"name": self.name, "unit": self.unit, "count": 0}
+        return {
+            "name": self.name,
+            "unit": self.unit,
+            "count": self.count,
+            "mean": self.total / self.count,
+            "min": self.min,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max
+        }
+
+class Instruments:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        return self.enabled
+
+    # histogram for a name, created the first time it is used
+    def histogram(self, name, unit, low, high):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(name, Histogram(name, unit, low, high))
+        return histogram
+
+    # time in seconds, from a microsecond up to a minute
+    def time(self, name, seconds):
+        if self.enabled:
+            self.histogram(name, "s", 1e-6, 60).add(seconds)
+
+    # counts such as bytes or points, from 1 up to 10 million
+    def amount(self, name, value, unit):
+        if self.enabled:
+            self.histogram(name, unit, 1, 1e7).add(value)
+
+    def summary(self):
+        return [self.histograms[name].summary() for name in sorted(self.histograms)]
+
+    def report(self):
+        lines = ["%-28s| %8s | %10s | %10s | %10s | %10s | %10s" % ("", "Count", "Mean", "p50", "p90", "p99", "Max"), "-" * 104]
+        for entry in self.summary():
+            if entry["count"] == 0:
+                continue
+            scale, unit = (1e3, "ms") if entry["unit"] == "s" else (1, entry["unit"])
+            values = ["%10.3f" % (entry[key] * scale) for key in ["mean", "p50", "p90", "p99", "max"]]
+            lines.append("%-28s| %8d | %s" % ("%s (%s)" % (entry["name"], unit), entry["count"], " | ".join(values)))
+        return "\n".join(lines)
+
+    def dump(self, path):
+        with open(path, 'w') as file:
+            json.dump({"time": time.time(), "histograms": self.summary()}, file, indent=2)
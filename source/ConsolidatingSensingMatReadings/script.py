@@ -1,186 +1,458 @@
-'''
-Program has to be run from command line with the following format
-"python script.py PATH number_of_mats PORTS"
-
-All the lines which print the time taken for read cycle have been commented out.
-In case of any testing these can be removed.
-
-'''
-
-from datetime import datetime
-import numpy as np
-import keyboard
-import serial
-import sys
-import os
-import time
-import json
-
-# JSON file name
-filename=''
-
-# Number of Mats Connected
-numMats = 1
-
-# Ports used to connect the mats in order
-ports = ['COM3']
-
-# Store Serial connections
-ser = []
-
-# store list of dictionaries containing timestamp and pressure data
-data = []
-
-# request the mat to send active pressure points
-def RequestPressureMap(ser):
-    data = "R"
-    ser.write(data.encode())
-
-# function to get values and store it in array
-def activePointsReceiveMap(ser, currMat):
-    global Values
-    # calculate offset for storing vlaues in array based on current mat
-    offset = 48*currMat
-    # read values according to the active points protocol
-    xbyte = ser.read().decode('utf-8')
-    HighByte = ser.read()
-    LowByte = ser.read()
-    high = int.from_bytes(HighByte, 'big')
-    low = int.from_bytes(LowByte, 'big')
-    nPoints = ((high << 8) | low)
-    xbyte = ser.read().decode('utf-8')
-    xbyte = ser.read().decode('utf-8')
-    x = 0
-    y = 0
-    n = 0
-    # iterate till all the points sent is read and stored in array
-    while(n < nPoints):
-        x = ser.read()
-        y = ser.read()
-        x = int.from_bytes(x, 'big')
-        y = int.from_bytes(y, 'big')
-        HighByte = ser.read()
-        LowByte = ser.read()
-        high = int.from_bytes(HighByte, 'big')
-        low = int.from_bytes(LowByte, 'big')
-        val = ((high << 8) | low)
-        Values[y+offset][x] = val
-        n += 1
-
-# Check for input and call function to read point if number of points mentioned
-def activePointsGetMap(ser, currMat):
-    xbyte = ''
-    # check for input in serial port
-    if ser.in_waiting > 0:
-        try:
-            xbyte = ser.read().decode('utf-8')
-        except Exception:
-            print("Exception")
-        if(xbyte == 'N'):
-            activePointsReceiveMap(ser, currMat)
-        else:
-            ser.flush()
-
-class Null:
-    def write(self, text):
-        pass
-    def flush(self):
-        pass
-
-# Call functions to request and get pressure values
-def getMatrix():
-    for x in range(numMats):
-        #startTime = time.time()
-        RequestPressureMap(ser[x])
-        activePointsGetMap(ser[x], x)
-        #endTime = time.time()
-        #print("Time Taken for Mat ", x+1, ": ", '{:.8f}'.format(endTime-startTime), "s")
-
-# function to write all values to JSON
-def write_json():
-    with open("template.json",'r+') as file:
-        # loading data into a dict
-        file_data = json.load(file)
-        # add list of dictionaries into existing data
-        writeData = {"pressureData": data}
-        file_data.update(writeData)
-        file.seek(0)
-        # convert back to json.
-        writeFilename = filename + "\SensingMatData_" + time.strftime("%Y%m%d_%H%M%S") + ".json"
-        with open(writeFilename, 'w') as writeFile:
-            json.dump(file_data, writeFile)
-        print("File saved at PATH:", writeFilename)
-
-# Append dictionary containing timestamp and current pressure matrix to list
-def writeMatrix():
-    global Values
-    #startTime = time.time()
-    # get current timestamp
-    timestampData = datetime.now().astimezone().isoformat()
-    # make a dictionary with timestamp and list of pressure values
-    newEntry = {
-        "dateTime": timestampData,
-		"pressureMatrix": Values.tolist()
-    }
-    data.append(newEntry)
-    #endTime = time.time()
-    #print("Time Taken to store matrix: ", '{:.8f}'.format(endTime-startTime), "s \n")
-
-# Check number of arguments
-if(len(sys.argv) < 4):
-    print("Insufficient Parameters.\nEnter in the form \"python script.py \"PATH\" number_of_mats \'PORTS\'\"")
-    sys.exit("Exited")
-print("Started")
-
-# get command line arguments
-filename = sys.argv[1]
-# Check if path is valid
-if(os.path.exists(filename) == False):
-    print("PATH does not exist.")
-    sys.exit("Exited")
-
-# Check for number of mats
-try:
-    numMats = int(sys.argv[2])
-except Exception:
-    print("Invalid Parameters.\nEnter in the form \"python script.py \"PATH\" number_of_mats \'PORTS\'\"")
-    sys.exit("Exited")
-if(len(sys.argv) != numMats+3):
-    print("Insufficient Parameters.\nEnter in the form \"python script.py \"PATH\" number_of_mats \'PORTS\'\"")
-    sys.exit("Exited")
-
-# Connect to serial
-for x in range(numMats):
-    try:
-        ser.insert(x, serial.Serial(sys.argv[x+3], baudrate=115200, timeout=0.1))
-    except Exception:
-        print("Invalid Ports.")
-        sys.exit("Exited")
-print("Ports Inserted")
-
-# Final matrix size
-ROWS = 48*numMats
-COLS = 48
-
-# initialize array of zeroes to store pressure values
-Values = np.zeros((ROWS, COLS))
-
-# Main
-print("Running...\n\n[Press \'q\' to Stop Reading Values]\n")
-while True:
-    #startTime = time.time()
-    getMatrix()
-    #endTime = time.time() 
-    #print("Total Time to get Matrix: ", '{:.8f}'.format(endTime-startTime), "s")
-    writeMatrix()
-    Values = np.zeros((ROWS, COLS))
-    if keyboard.is_pressed('q'):   
-        break
-    time.sleep(0.05)
-
-print("Writing to JSON")
-#startTime = time.time()
-write_json()
-#endTime = time.time()
-#print("Time Taken to write to JSON File: ", '{:.8f}'.format(endTime-startTime), "s \n")
-print("\nFinished\n")
\ No newline at end of file
+'''
+Program has to be run from command line with the following format
+"python script.py PATH number_of_mats PORTS [--parallel] [--no-json] [--sparse] [--fps FPS] [--buffer FRAMES]
+                  [--stats] [--stats-json FILE]"
+
+With --parallel the request is sent to all the mats at once and the replies
+are read by one thread per port.
+
+Frames are written to a .smat recording (see matfile.py) as they are read,
+which is converted to JSON when the program is stopped unless --no-json is
+given. With --sparse the recording only stores the active points of every
+frame.
+
+Frames are read at --fps frames per second (20 by default). The program is
+stopped by entering 'q', Ctrl+C or SIGTERM, so it can also run without a
+console.
+
+The mats are read on one thread which only copies the raw replies into a
+ring of --buffer preallocated frames, and another thread decodes and stores
+them, so a slow disk does not delay the requests to the mats.
+
+With --stats the reply latency and bytes read of every mat, the points in
+each frame and the time taken to read, decode and store the frames are
+recorded in histograms (see instrumentation.py) and summarised when the
+program stops, --stats-json also saves the summary as JSON. Recording can
+be switched on and off while the program runs by entering 's' (or with
+SIGUSR1 where it exists).
+
+'''
+
+from concurrent.futures import ThreadPoolExecutor
+from matfile import MatFileWriter, MatFile
+from instrumentation import Instruments
+import numpy as np
+import threading
+import argparse
+import serial
+import signal
+import sys
+import os
+import time
+import json
+
+# Folder in which the recording is stored
+filename=''
+
+# Number of Mats Connected
+numMats = 1
+
+# Ports used to connect the mats in order
+ports = ['COM3']
+
+# Store Serial connections
+ser = []
+
+# recording to which every frame is appended as soon as it is read
+recorder = None
+
+# histograms of the timings, only recorded when enabled
+instruments = Instruments()
+
+# request the mat to send active pressure points
+def RequestPressureMap(ser):
+    data = "R"
+    ser.write(data.encode())
+
+# layout of a single active point: x, y (1 byte each) and a big endian 16 bit value
+POINT_DTYPE = np.dtype([('x', 'u1'), ('y', 'u1'), ('value', '>u2')])
+
+# read until size bytes are received or the port times out
+def readExact(ser, size):
+    buf = ser.read(size)
+    while len(buf) < size:
+        chunk = ser.read(size - len(buf))
+        if not chunk:
+            break
+        buf += chunk
+    return buf
+
+# read the points of a reply after the 'N' without decoding them, None if the header is incomplete
+def activePointsReadPayload(ser):
+    # header after 'N': one unused byte, number of points (high, low) and two unused bytes
+    header = readExact(ser, 5)
+    if len(header) < 5:
+        return None
+    nPoints = int.from_bytes(header[1:3], 'big')
+    # read all the points in one go
+    return readExact(ser, nPoints*4)
+
+# decode the points as a structured array and store them in the rows of the mat
+def decodePoints(payload, frame, currMat):
+    # calculate offset for storing vlaues in array based on current mat
+    offset = 48*currMat
+    points = np.frombuffer(payload, dtype=POINT_DTYPE, count=len(payload)//4)
+    frame[points['y'].astype(np.intp) + offset, points['x']] = points['value']
+
+# Paces the main loop at a frame rate against a monotonic clock. Each frame is scheduled one period
+# after the previous one, so the time taken to read and store a frame is taken off the wait. A
+# frame which starts after its time is late, and when whole periods have been missed those frames
+# are counted as dropped and the schedule moves on instead of reading them in a burst.
+class FrameScheduler:
+    def __init__(self, fps):
+        self.period = 1.0 / fps
+        self.start = time.monotonic()
+        self.next = self.start
+        self.last = self.start
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+
+    # wait until the next frame is due, returns early if stop is set
+    def wait(self, stop):
+        self.frames += 1
+        self.next += self.period
+        now = time.monotonic()
+        self.last = now
+        if now < self.next:
+            stop.wait(self.next - now)
+            return
+        self.late += 1
+        missed = int((now - self.next) // self.period)
+        self.dropped += missed
+        self.next += missed * self.period
+
+    # frames per second achieved from the start to the end of the period of the last frame
+    def rate(self):
+        elapsed = max(self.last, self.next) - self.start
+        return self.frames / elapsed if elapsed > 0 else 0.0
+
+    def report(self):
+        return "Frames: %d \tAchieved: %.2f Hz (target %.2f Hz) \tLate: %d \tDropped: %d" % (
+            self.frames, self.rate(), 1.0 / self.period, self.late, self.dropped)
+
+# largest reply of a mat, every point of the 48x48 matrix
+MAX_PAYLOAD = 48*48*4
+
+# preallocated storage for the raw replies of all the mats in one frame
+class FrameSlot:
+    def __init__(self, numMats):
+        self.time = 0.0
+        self.matTimes = [None] * numMats
+        self.payloads = [bytearray(MAX_PAYLOAD) for x in range(numMats)]
+        # number of bytes received from each mat, None when the mat did not reply
+        self.lengths = [None] * numMats
+
+# Bounded ring of preallocated frame slots between one reader and one writer. The reader fills
+# the slot from claim() and publishes it, the writer takes the oldest published slot and releases
+# it when it is done. When every slot is waiting to be written claim() gives None and the reader
+# drops the frame, so a slow writer never delays the requests to the mats.
+class FrameRing:
+    def __init__(self, capacity, numMats):
+        self.slots = [FrameSlot(numMats) for x in range(capacity)]
+        self.head = 0
+        self.count = 0
+        self.closed = False
+        self.condition = threading.Condition()
+        self.published = 0
+        self.dropped = 0
+        # largest number of frames waiting to be written
+        self.highWater = 0
+
+    def claim(self):
+        with self.condition:
+            if self.count == len(self.slots):
+                self.dropped += 1
+                return None
+            return self.slots[self.head]
+
+    def publish(self):
+        with self.condition:
+            self.head = (self.head + 1) % len(self.slots)
+            self.count += 1
+            self.published += 1
+            self.highWater = max(self.highWater, self.count)
+            self.condition.notify()
+
+    # oldest published slot, None once the ring is closed and empty
+    def take(self):
+        with self.condition:
+            while self.count == 0 and not self.closed:
+                self.condition.wait()
+            if self.count == 0:
+                return None
+            return self.slots[(self.head - self.count) % len(self.slots)]
+
+    def release(self):
+        with self.condition:
+            self.count -= 1
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    # frames waiting to be written
+    def backlog(self):
+        with self.condition:
+            return self.count
+
+# Reads the mats on one thread and decodes and stores the frames on another. The reader only sends
+# the requests at the times given by the scheduler and copies the raw replies into the ring, the
+# writer decodes them into the pressure matrix and appends it to the recording, so disk or CPU
+# stalls fill the ring (and then drop frames) instead of delaying the next request.
+class AcquisitionPipeline:
+    def __init__(self, ports, recorder, scheduler, rows, cols, capacity=64, readers=None, instruments=instruments):
+        self.ports = ports
+        self.instruments = instruments
+        # time at which the request was sent to each mat
+        self.requested = [0.0] * len(ports)
+        self.recorder = recorder
+        self.scheduler = scheduler
+        self.readers = readers
+        self.ring = FrameRing(capacity, len(ports))
+        # replies of dropped frames still have to be read from the ports
+        self.scratch = FrameSlot(len(ports))
+        self.frame = np.zeros((rows, cols))
+        self.written = 0
+        self.threads = []
+        # exceptions which stopped the threads, raised again by join()
+        self.errors = []
+
+    def start(self, stop):
+        self.threads = [threading.Thread(target=self.read, args=(stop,)), threading.Thread(target=self.write, args=(stop,))]
+        for thread in self.threads:
+            thread.start()
+
+    # wait for the reply of a mat and copy it into the slot
+    def readMat(self, slot, currMat):
+        port = self.ports[currMat]
+        try:
+            xbyte = port.read().decode('utf-8')
+        except Exception:
+            xbyte = ''
+        payload = None
+        if(xbyte == 'N'):
+            slot.matTimes[currMat] = time.time()
+            if self.instruments.enabled:
+                self.instruments.time("latency mat %d" % (currMat+1), time.perf_counter() - self.requested[currMat])
+            payload = activePointsReadPayload(port)
+            if payload is not None and self.instruments.enabled:
+                # 'N', the header and the points
+                self.instruments.amount("bytes mat %d" % (currMat+1), 6 + len(payload), "B")
+        else:
+            slot.matTimes[currMat] = None
+            port.reset_input_buffer()
+        if payload is None:
+            slot.lengths[currMat] = None
+        else:
+            slot.payloads[currMat][:len(payload)] = payload
+            slot.lengths[currMat] = len(payload)
+
+    def read(self, stop):
+        try:
+            while not stop.is_set():
+                slot = self.ring.claim()
+                target = self.scratch if slot is None else slot
+                startTime = time.perf_counter()
+                if self.readers is not None:
+                    for x in range(len(self.ports)):
+                        self.requested[x] = time.perf_counter()
+                        RequestPressureMap(self.ports[x])
+                    list(self.readers.map(lambda x: self.readMat(target, x), range(len(self.ports))))
+                else:
+                    for x in range(len(self.ports)):
+                        self.requested[x] = time.perf_counter()
+                        RequestPressureMap(self.ports[x])
+                        self.readMat(target, x)
+                target.time = time.time()
+                self.instruments.time("read frame", time.perf_counter() - startTime)
+                if slot is not None:
+                    self.ring.publish()
+                self.scheduler.wait(stop)
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            # an error on a port stops the whole program
+            stop.set()
+            self.ring.close()
+
+    def write(self, stop):
+        try:
+            while True:
+                slot = self.ring.take()
+                if slot is None:
+                    return
+                startTime = time.perf_counter()
+                self.frame.fill(0)
+                for x, length in enumerate(slot.lengths):
+                    if length is not None:
+                        decodePoints(memoryview(slot.payloads[x])[:length], self.frame, x)
+                decoded = time.perf_counter()
+                # capture time of each mat is stored when they are read in parallel
+                if self.readers is not None:
+                    self.recorder.append(self.frame, slot.time, slot.matTimes)
+                else:
+                    self.recorder.append(self.frame, slot.time)
+                if self.instruments.enabled:
+                    self.instruments.time("decode", decoded - startTime)
+                    self.instruments.time("store", time.perf_counter() - decoded)
+                    self.instruments.amount("points per frame", sum(length for length in slot.lengths if length is not None) // 4, "points")
+                self.ring.release()
+                self.written += 1
+        except Exception as e:
+            self.errors.append(e)
+        finally:
+            # an error while storing (a full disk) stops the reader as well
+            stop.set()
+
+    # wait for the reader to stop and the writer to store every frame in the ring, the error which
+    # stopped either of them is raised so that the program fails
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+        if self.errors:
+            raise self.errors[0]
+
+    def stats(self):
+        return {
+            "captured": self.ring.published,
+            "written": self.written,
+            "dropped": self.ring.dropped,
+            "backlog": self.ring.backlog(),
+            "highWater": self.ring.highWater,
+            "capacity": len(self.ring.slots)
+        }
+
+    def report(self):
+        return "Captured: %(captured)d \tWritten: %(written)d \tDropped (ring full): %(dropped)d \tLargest backlog: %(highWater)d / %(capacity)d" % self.stats()
+
+# switch the instrumentation on or off and say which one it is
+def toggleInstruments():
+    print("Instrumentation", "on" if instruments.toggle() else "off")
+
+# Event which is set by Ctrl+C, SIGTERM or by entering 'q', replacing the keyboard module which
+# needs a console (and root on Linux). Entering 's' or SIGUSR1 switches the instrumentation.
+def install_stop():
+    stop = threading.Event()
+    def handler(signum, frame):
+        stop.set()
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+    if hasattr(signal, "SIGUSR1"):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: toggleInstruments())
+    def readInput():
+        # stdin may be closed when running headless, then only the signals stop the program
+        for line in sys.stdin:
+            command = line.strip().lower()
+            if command == 's':
+                toggleInstruments()
+            elif command == 'q':
+                stop.set()
+                return
+    threading.Thread(target=readInput, daemon=True).start()
+    return stop
+
+# Create the recording file with the configuration in template.json as metadata
+def open_recording(rows, cols, numMatTimes=0, sparse=False):
+    with open("template.json",'r') as file:
+        # loading data into a dict
+        file_data = json.load(file)
+    recordFilename = os.path.join(filename, "SensingMatData_" + time.strftime("%Y%m%d_%H%M%S") + ".smat")
+    return MatFileWriter(recordFilename, rows, cols, file_data, numMatTimes, sparse=sparse)
+
+# function to convert the recording to JSON
+def write_json():
+    writeFilename = os.path.splitext(recorder.path)[0] + ".json"
+    startTime = time.perf_counter()
+    MatFile(recorder.path).to_json(writeFilename)
+    instruments.time("write json", time.perf_counter() - startTime)
+    print("File saved at PATH:", writeFilename)
+
+if __name__ == '__main__':
+    usage = "Enter in the form \"python script.py \"PATH\" number_of_mats \'PORTS\' [--parallel] [--no-json] [--sparse] [--fps FPS] [--buffer FRAMES] [--stats] [--stats-json FILE]\""
+    parser = argparse.ArgumentParser(usage=usage)
+    parser.add_argument("path", nargs="?")
+    parser.add_argument("numMats", nargs="?")
+    parser.add_argument("ports", nargs="*")
+    parser.add_argument("--parallel", action="store_true", help="read all the mats at the same time")
+    parser.add_argument("--no-json", action="store_true", help="only keep the .smat recording")
+    parser.add_argument("--sparse", action="store_true", help="only store the active points of every frame in the recording")
+    parser.add_argument("--fps", type=float, default=20.0, help="frames read per second (20 by default)")
+    parser.add_argument("--buffer", type=int, default=64, help="frames which can wait to be stored before frames are dropped (64 by default)")
+    parser.add_argument("--stats", action="store_true", help="record timings from the start, 's' switches them on and off while running")
+    parser.add_argument("--stats-json", help="save the summary of the timings to this JSON file")
+    # Check number of arguments
+    args, unknown = parser.parse_known_args()
+    if(len(args.ports) == 0 or unknown):
+        print("Insufficient Parameters.\n" + usage)
+        sys.exit("Exited")
+    print("Started")
+
+    # get command line arguments
+    filename = args.path
+    # Check if path is valid
+    if(os.path.exists(filename) == False):
+        print("PATH does not exist.")
+        sys.exit("Exited")
+
+    # Check for number of mats
+    try:
+        numMats = int(args.numMats)
+    except Exception:
+        print("Invalid Parameters.\n" + usage)
+        sys.exit("Exited")
+    if(len(args.ports) != numMats):
+        print("Insufficient Parameters.\n" + usage)
+        sys.exit("Exited")
+
+    # Connect to serial
+    ports = args.ports
+    for x in range(numMats):
+        try:
+            ser.insert(x, serial.Serial(ports[x], baudrate=115200, timeout=0.1))
+        except Exception:
+            print("Invalid Ports.")
+            sys.exit("Exited")
+    print("Ports Inserted")
+
+    # one reader thread per port when running in parallel mode
+    readers = ThreadPoolExecutor(max_workers=numMats) if args.parallel else None
+
+    # Final matrix size
+    ROWS = 48*numMats
+    COLS = 48
+
+    recorder = open_recording(ROWS, COLS, numMats if readers is not None else 0, args.sparse)
+    print("Recording to PATH:", recorder.path)
+
+    # Main
+    instruments.enabled = args.stats
+    stop = install_stop()
+    scheduler = FrameScheduler(args.fps)
+    pipeline = AcquisitionPipeline(ser, recorder, scheduler, ROWS, COLS, args.buffer, readers)
+    print("Running...\n\n[Enter \'q\' or press Ctrl+C to Stop Reading Values, \'s\' to Switch Timings On or Off]\n")
+    try:
+        pipeline.start(stop)
+        # the main thread only waits, with a timeout so that the signals are handled
+        while not stop.wait(0.5):
+            pass
+        pipeline.join()
+    finally:
+        # everything read so far stays on disk even if the loop fails
+        recorder.close()
+    print(scheduler.report())
+    print(pipeline.report())
+
+    if readers is not None:
+        readers.shutdown()
+
+    if not args.no_json:
+        print("Writing to JSON")
+        write_json()
+    if instruments.histograms:
+        print("\n" + instruments.report())
+    if args.stats_json:
+        instruments.dump(args.stats_json)
+        print("Timings saved at PATH:", args.stats_json)
+    print("\nFinished\n")
@@ -0,0 +1,217 @@
+'''
+Simulated sensing mat which can be used in place of a serial.Serial object.
+
+It answers the 'R' request with a pressure map encoded using the Active
+Point Protocol ('N', an unused byte, number of points, two unused bytes,
+then x, y, value for every active point) so the consolidator can be run and benchmarked
+without a physical mat.
+
+WalkingPattern generates the frames of one or more mats while someone walks
+over them: footprints which roll from the heel to the toes, alternating
+feet at a given cadence, and several runs with the mats empty in between.
+
+Running the file serves simulated mats on pseudo terminals (Linux and
+macOS), which the consolidator opens like real serial ports:
+
+"python simulator.py [--mats N] [--cadence STEPS_PER_MINUTE] [--runs N] [--gap SECONDS]"
+
+'''
+
+import os
+import sys
+import time
+import argparse
+import threading
+import numpy as np
+from script import POINT_DTYPE
+
+# encode a 48x48 pressure map into an active points response
+def encodeMap(frame):
+    y, x = np.nonzero(frame)
+    points = np.empty(len(x), dtype=POINT_DTYPE)
+    points['x'] = x
+    points['y'] = y
+    points['value'] = frame[y, x]
+    return b'N\x00' + len(points).to_bytes(2, 'big') + b'\x00\x00' + points.tobytes()
+
+# pressure map with nPoints active points at random positions
+def randomMap(nPoints, rows=48, cols=48, seed=0):
+    rng = np.random.default_rng(seed)
+    frame = np.zeros((rows, cols), dtype=np.uint16)
+    idx = rng.choice(rows*cols, size=nPoints, replace=False)
+    frame.flat[idx] = rng.integers(100, 4096, size=nPoints)
+    return frame
+
+# Frames of someone walking over numMats mats placed one after another along the rows. Each step
+# takes 60 / cadence seconds and every foot stays on the mat for stance steps, so both feet are on
+# the mat for part of each step. The pressure of a footprint moves from the heel to the toes while
+# it is on the mat. A run lasts until the feet have left the mats, followed by gap seconds without
+# anyone on them. Looking along the rows in the direction of walking the left foot is on the side
+# of the higher columns, firstFoot is the foot making the first step of each run.
+class WalkingPattern:
+    def __init__(self, numMats=2, cadence=110, stepLength=16, runs=1, gap=2.0, stance=1.2,
+            firstFoot='left', footLength=12, footWidth=5, seed=0):
+        self.rows = 48*numMats
+        self.cols = 48
+        self.stepTime = 60.0 / cadence
+        self.stepLength = stepLength
+        self.stance = stance
+        self.footLength = footLength
+        self.footWidth = footWidth
+        self.gap = gap
+        self.runs = runs
+        self.firstFoot = firstFoot
+        # steps until the footprints are past the end of the mats
+        self.steps = int((self.rows - footLength - 2) // stepLength) + 1
+        self.runTime = (self.steps - 1 + stance) * self.stepTime
+        self.duration = runs * self.runTime + (runs - 1) * gap
+        self.rng = np.random.default_rng(seed)
+        self.yy, self.xx = np.mgrid[0:self.rows, 0:self.cols]
+        # peak pressure of every step
+        self.peaks = self.rng.uniform(2000, 3500, size=(runs, self.steps))
+
+    # 'left' or 'right' for a step of a run
+    def foot(self, step):
+        return self.firstFoot if step % 2 == 0 else ('right' if self.firstFoot == 'left' else 'left')
+
+    # pressure of a foot with its heel at (row, col), phase goes from 0 at heel strike to 1 at toe off
+    def footprint(self, row, col, phase, peak, side):
+        heel = np.exp(-(((self.yy - row - 2) / 2.5) ** 2 + ((self.xx - col) / (self.footWidth / 2.5)) ** 2))
+        # the big toe is on the inside of the foot
+        toeCol = col + (-1 if side == 'left' else 1)
+        fore = np.exp(-(((self.yy - row - self.footLength + 3) / 2.5) ** 2 + ((self.xx - toeCol) / (self.footWidth / 2)) ** 2))
+        # the weight moves from the heel to the forefoot, which only bears weight after the first 20%
+        weight = np.sin(np.pi * phase) ** 0.5
+        return peak * weight * ((1 - phase) * heel + min(1.0, phase / 0.2) * 0.8 * fore)
+
+    def frame(self, t):
+        frame = np.zeros((self.rows, self.cols))
+        run, t = divmod(t, self.runTime + self.gap)
+        if run < self.runs and t < self.runTime:
+            for step in range(self.steps):
+                phase = (t - step * self.stepTime) / (self.stance * self.stepTime)
+                if 0 <= phase < 1:
+                    side = self.foot(step)
+                    col = self.cols // 2 + (6 if side == 'left' else -6)
+                    frame += self.footprint(2 + step * self.stepLength, col, phase, self.peaks[int(run), step], side)
+        frame[frame < 100] = 0
+        return frame.astype(np.uint16)
+
+    # frames of the whole pattern at fps frames per second
+    def frames(self, fps=20):
+        for i in range(int(self.duration * fps) + 1):
+            yield i / fps, self.frame(i / fps)
+
+    # 48x48 map of a mat at time t
+    def mat(self, currMat, t):
+        return self.frame(t)[48*currMat:48*(currMat+1)]
+
+# simulated mats which follow a walking pattern in real time from the time they are created
+def walkingMats(pattern, latency=0.0, loop=True):
+    start = time.monotonic()
+    def clock():
+        t = time.monotonic() - start
+        return t % pattern.duration if loop else t
+    return [SimulatedMat(lambda x=x: pattern.mat(x, clock()), latency=latency) for x in range(pattern.rows // 48)]
+
+class SimulatedMat:
+    # frames can be a single 48x48 map or a callable returning the next map
+    # latency is the time taken by the mat to start replying to a request
+    def __init__(self, frames, latency=0.0, timeout=0.1):
+        self.frames = frames
+        self.latency = latency
+        self.timeout = timeout
+        self.buffer = bytearray()
+        self.readyAt = 0.0
+
+    def nextFrame(self):
+        if callable(self.frames):
+            return self.frames()
+        return self.frames
+
+    def write(self, data):
+        for request in bytes(data):
+            if request == ord('R'):
+                self.buffer += encodeMap(self.nextFrame())
+                self.readyAt = time.perf_counter() + self.latency
+        return len(data)
+
+    # blocks like a serial port until the reply is available or the timeout expires
+    def read(self, size=1):
+        wait = self.readyAt - time.perf_counter()
+        if wait > 0:
+            time.sleep(min(wait, self.timeout))
+            if wait > self.timeout:
+                return b''
+        out = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return out
+
+    @property
+    def in_waiting(self):
+        if time.perf_counter() < self.readyAt:
+            return 0
+        return len(self.buffer)
+
+    def reset_input_buffer(self):
+        self.buffer.clear()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+# Answer the requests written to a pseudo terminal until stop is set. The other end of the
+# terminal is opened by the consolidator as a serial port.
+def servePty(mat, fd, stop):
+    import select
+    while not stop.is_set():
+        ready, _, _ = select.select([fd], [], [], 0.1)
+        if not ready:
+            continue
+        try:
+            data = os.read(fd, 64)
+        except OSError:
+            # the consolidator closed the port, wait for it to open it again
+            time.sleep(0.1)
+            continue
+        mat.write(data)
+        reply = bytes(mat.buffer)
+        mat.buffer.clear()
+        if mat.latency:
+            time.sleep(mat.latency)
+        os.write(fd, reply)
+
+# one pseudo terminal per mat, returns the names of the ports to give to the consolidator
+def openPtys(mats, stop):
+    import tty
+    names = []
+    for mat in mats:
+        master, slave = os.openpty()
+        # no echo or translation of line endings, the replies are binary
+        tty.setraw(slave)
+        names.append(os.ttyname(slave))
+        threading.Thread(target=servePty, args=(mat, master, stop), daemon=True).start()
+    return names
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage="python simulator.py [--mats N] [--cadence STEPS_PER_MINUTE] [--runs N] [--gap SECONDS]")
+    parser.add_argument("--mats", type=int, default=2)
+    parser.add_argument("--cadence", type=float, default=110, help="steps per minute")
+    parser.add_argument("--runs", type=int, default=3, help="runs over the mats before the pattern starts again")
+    parser.add_argument("--gap", type=float, default=2.0, help="seconds without anyone on the mats between runs")
+    parser.add_argument("--latency", type=float, default=0.005, help="seconds taken by a mat to reply")
+    args = parser.parse_args()
+    if not hasattr(os, "openpty"):
+        sys.exit("Pseudo terminals are not available on this system, use a virtual serial port pair instead.")
+    pattern = WalkingPattern(args.mats, args.cadence, runs=args.runs, gap=args.gap)
+    stop = threading.Event()
+    names = openPtys(walkingMats(pattern), stop)
+    print("Simulated mats on ports:", " ".join(names))
+    print("python script.py PATH", args.mats, " ".join(names))
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop.set()
@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the tests import the modules of the folder the same way the scripts import each other, the
+# script module of another folder collected before is forgotten
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.modules.pop("script", None)
@@ -0,0 +1,107 @@
+import os
+import json
+import numpy as np
+import pytest
+from matfile import MatFileWriter, MatFile, SparseFrames, from_json, orient
+
+SOURCE = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# modules copied into the folder of every program which uses them
+SHARED = {
+    "matfile.py": ["ConsolidatingSensingMatReadings", "PressureMatMetricsCalculator", "PressureDataLogger"],
+    "cache.py": ["PressureMatMetricsCalculator", "PressureDataLogger"]
+}
+
+def read_source(folder, name):
+    with open(os.path.join(SOURCE, folder, name), 'rb') as file:
+        # the folders use different line endings
+        return file.read().replace(b'\r\n', b'\n')
+
+@pytest.mark.parametrize("name", sorted(SHARED))
+def test_copies_are_identical(name):
+    first, *others = SHARED[name]
+    for folder in others:
+        assert read_source(folder, name) == read_source(first, name), "%s/%s differs from %s/%s" % (folder, name, first, name)
+
+# frames of a few points pressed on a 6x4 mat, one frame without any pressure
+def sample_frames(numFrames=5, rows=6, cols=4):
+    rng = np.random.default_rng(0)
+    frames = np.zeros((numFrames, rows, cols), dtype=np.uint16)
+    for i in range(1, numFrames):
+        frames[i] = np.where(rng.random((rows, cols)) < 0.3, rng.integers(300, 65535, size=(rows, cols)), 0)
+    frames[2, 0, 0] = 65535
+    return frames
+
+def write_recording(path, frames, sparse=False, matTimes=False):
+    # utcOffset is given so that the timestamps do not depend on the machine
+    with MatFileWriter(path, frames.shape[1], frames.shape[2], {"name": "walk"}, 2 if matTimes else 0, source=1, utcOffset=3600, sparse=sparse) as writer:
+        for i, frame in enumerate(frames):
+            writer.append(frame, 1654084800.0 + i * 0.05, [1654084800.0 + i * 0.05, None] if matTimes else None)
+    return MatFile(path)
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_round_trip(tmp_path, sparse):
+    frames = sample_frames()
+    recording = write_recording(str(tmp_path / "walk.smat"), frames, sparse, matTimes=True)
+    assert recording.sparse == sparse
+    assert len(recording) == len(frames)
+    assert recording.metadata == {"name": "walk"} and recording.source == 1 and recording.utcOffset == 3600
+    assert np.array_equal(recording.frames, frames)
+    assert np.array_equal(recording.points.dense(), frames)
+    assert all(np.array_equal(recording.frame(i), frames[i]) for i in range(len(frames)))
+    assert np.array_equal(recording.records['time'], 1654084800 * 10**6 + np.arange(len(frames)) * 50000)
+    assert np.array_equal(recording.records['matTimes'][:, 1], np.zeros(len(frames)))
+
+def test_dense_and_sparse_conversion(tmp_path):
+    frames = sample_frames()
+    dense = write_recording(str(tmp_path / "dense.smat"), frames)
+    sparse = dense.convert(str(tmp_path / "sparse.smat"), sparse=True)
+    back = sparse.convert(str(tmp_path / "back.smat"))
+    assert sparse.sparse and not back.sparse
+    assert np.array_equal(sparse.frames, frames) and np.array_equal(back.frames, frames)
+    assert np.array_equal(back.records['time'], dense.records['time'])
+    # the points of a sparse recording take less space than the dense frames
+    assert os.path.getsize(sparse.path) < os.path.getsize(dense.path)
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_json_round_trip(tmp_path, sparse):
+    frames = sample_frames()
+    recording = write_recording(str(tmp_path / "walk.smat"), frames, matTimes=True)
+    jsonPath = str(tmp_path / "walk.json")
+    recording.to_json(jsonPath)
+    with open(jsonPath, 'r') as file:
+        fileData = json.load(file)
+    assert fileData["name"] == "walk" and len(fileData["pressureData"]) == len(frames)
+    assert fileData["pressureData"][0]["dateTime"] == "2022-06-01T13:00:00+01:00"
+    assert fileData["pressureData"][1]["matDateTimes"][1] is None
+    imported = from_json(jsonPath, str(tmp_path / "imported.smat"), 1, sparse)
+    assert imported.sparse == sparse
+    assert imported.metadata == {"name": "walk"} and imported.utcOffset == 3600
+    assert np.array_equal(imported.frames, frames)
+    assert np.array_equal(imported.records['time'], recording.records['time'])
+    assert np.array_equal(imported.records['matTimes'], recording.records['matTimes'])
+
+def test_partial_last_frame_is_ignored(tmp_path):
+    frames = sample_frames()
+    path = str(tmp_path / "walk.smat")
+    write_recording(path, frames)
+    with open(path, 'ab') as file:
+        file.write(b'\x01' * 10)
+    recording = MatFile(path)
+    assert len(recording) == len(frames)
+    assert np.array_equal(recording.frames, frames)
+
+def test_not_a_recording(tmp_path):
+    path = str(tmp_path / "walk.smat")
+    with open(path, 'wb') as file:
+        file.write(b'\x00' * 64)
+    with pytest.raises(ValueError):
+        MatFile(path)
+
+@pytest.mark.parametrize("source", [0, 1, 2])
+def test_sparse_orient_matches_dense(source):
+    frames = sample_frames()
+    points = SparseFrames.from_dense(frames)
+    assert np.array_equal(orient(points, source).dense(), orient(frames, source))
+    assert np.array_equal(points.threshold(1000).dense(), np.where(frames < 1000, 0, frames))
+    assert np.array_equal(points[1:4].dense(), frames[1:4])
@@ -0,0 +1,46 @@
+import threading
+import numpy as np
+import pytest
+from script import AcquisitionPipeline, FrameScheduler
+from simulator import SimulatedMat, randomMap
+
+# recording which keeps the frames in memory and fails after failAfter frames like a full disk
+class Recorder:
+    def __init__(self, failAfter=None):
+        self.frames = []
+        self.failAfter = failAfter
+
+    def append(self, frame, timestamp, matTimes=None):
+        if self.failAfter is not None and len(self.frames) == self.failAfter:
+            raise OSError("No space left on device")
+        self.frames.append(frame.copy())
+
+# pipeline reading simulated mats at 200 frames per second, and the frame they give
+def start_pipeline(recorder, stop, numMats=2):
+    maps = [randomMap(50, seed=x) for x in range(numMats)]
+    pipeline = AcquisitionPipeline([SimulatedMat(m) for m in maps], recorder, FrameScheduler(200), 48*numMats, 48, capacity=8)
+    pipeline.start(stop)
+    return pipeline, np.concatenate(maps)
+
+def test_frames_are_stored():
+    recorder = Recorder()
+    stop = threading.Event()
+    pipeline, expected = start_pipeline(recorder, stop)
+    stop.wait(0.1)
+    stop.set()
+    pipeline.join()
+    stats = pipeline.stats()
+    assert stats["written"] == stats["captured"] == len(recorder.frames) > 0
+    assert all(np.array_equal(frame, expected) for frame in recorder.frames)
+
+def test_writer_error_stops_the_pipeline():
+    recorder = Recorder(failAfter=3)
+    stop = threading.Event()
+    pipeline, expected = start_pipeline(recorder, stop)
+    stopped = stop.wait(5)
+    stop.set()
+    assert stopped
+    with pytest.raises(OSError, match="No space left"):
+        pipeline.join()
+    assert not any(thread.is_alive() for thread in pipeline.threads)
+    assert len(recorder.frames) == 3
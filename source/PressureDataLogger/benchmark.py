@@ -0,0 +1,100 @@
+'''
+Rendering benchmark for the data logger.
+
+Renders the footprints of synthetic frames with the original matplotlib
+path (plt.imshow, plt.savefig and cv2.imread, then encoded again by
+VisualRecord) and with the lookup table renderer which encodes the PNG once
+in memory, and compares the images per second of both. The records are then
+rendered by 1, 2 and 4 worker processes, which have to give the same html
+as rendering the frames one after another. Finally a session of a short
+walk, standing still and an empty mat is logged with every frame and with
+runs of unchanged frames collapsed.
+
+"python benchmark.py [frames]"
+
+'''
+
+import sys
+import time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import script
+from converter import VisualRecord
+
+# 96x48 frames of two feet stepping along the mat, like the frames of a walk at ~20 Hz
+def synthetic_frames(numFrames, rows=96, cols=48, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:rows, 0:cols]
+    frames = []
+    for i in range(numFrames):
+        frame = np.zeros((rows, cols))
+        for foot in range(2):
+            y = ((i // 10 + foot) * 12) % (rows - 12) + 6
+            x = 16 if foot else 32
+            frame += np.exp(-(((yy - y) / 5.0) ** 2 + ((xx - x) / 3.0) ** 2)) * rng.uniform(1500, 3000)
+        frame[frame < 100] = 0
+        frames.append(frame)
+    return frames
+
+# a short walk, standing still with some sensor noise and an empty mat with noise under the threshold
+def session_frames(seed=0):
+    rng = np.random.default_rng(seed)
+    walk = synthetic_frames(40)
+    standing = [np.where(walk[-1] > 200, walk[-1] + rng.integers(-20, 20, walk[-1].shape), walk[-1]) for i in range(200)]
+    empty = [rng.integers(0, 60, walk[0].shape).astype(np.double) for i in range(200)]
+    return walk + standing + empty
+
+# seconds and size of the html to log a session, with runs of frames collapsed when tolerance is given
+def measure_session(frames, tolerance=None):
+    startTime = time.perf_counter()
+    frames = [(i, arr) for i, arr in enumerate(frames)]
+    if tolerance is not None:
+        frames = script.collapse_frames(frames, tolerance)
+    size = sum(len(str(VisualRecord(str(i), imgs=imgList, fmt="png"))) for i, imgList in script.render_frames(frames))
+    return time.perf_counter() - startTime, size
+
+# images per second and average size of the html of a record for a renderer
+def measure(frames, render):
+    images = 0
+    size = 0
+    startTime = time.perf_counter()
+    for arr in frames:
+        imgList = [render(arr[slice[0], slice[1]]) for slice in script.find_foot(arr)]
+        size += len(str(VisualRecord("title", imgs=imgList, fmt="png")))
+        images += len(imgList)
+    elapsed = time.perf_counter() - startTime
+    return images / elapsed, size / len(frames)
+
+# html of every record rendered with the given number of workers and the frames per second
+def measure_workers(frames, workers):
+    startTime = time.perf_counter()
+    records = [str(VisualRecord(str(i), imgs=imgList, fmt="png"))
+        for i, imgList in script.render_frames(enumerate(frames), workers=workers)]
+    return records, len(frames) / (time.perf_counter() - startTime)
+
+if __name__ == '__main__':
+    numFrames = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    frames = synthetic_frames(numFrames)
+    print("Renderer \t\t| Images / s \t| Record size (kB)")
+    print("-" * 60)
+    results = [("matplotlib", script.render_matplotlib), ("lookup table", script.render_lut),
+        ("lookup table, no upscaling", lambda roi: script.render_lut(roi, scale=1))]
+    for label, render in results:
+        rate, size = measure(frames, render)
+        print(label.ljust(24), "\t|", '%.1f'%rate, "\t|", '%.1f'%(size/1024))
+
+    print("\nWorkers \t| Frames / s \t| Same html")
+    print("-" * 60)
+    serial, rate = measure_workers(frames, 1)
+    print(1, "\t\t|", '%.1f'%rate, "\t|", True)
+    for workers in [2, 4]:
+        records, rate = measure_workers(frames, workers)
+        print(workers, "\t\t|", '%.1f'%rate, "\t|", records == serial)
+
+    session = session_frames()
+    print("\nSession of", len(session), "frames \t| Time (s) \t| Size (kB)")
+    print("-" * 60)
+    for label, tolerance in [("every frame", None), ("identical frames", 0), ("tolerance 50", 50)]:
+        seconds, size = measure_session(session, tolerance)
+        print(label.ljust(24), "\t|", '%.2f'%seconds, "\t|", '%.1f'%(size/1024))
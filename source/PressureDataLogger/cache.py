@@ -0,0 +1,148 @@
+'''
+On-disk cache of analysis products
+
+The products of the slow steps of an analysis (the decoded frames, the
+footprints, the heels, the runs) are kept in a folder under a key made from
+the SHA-256 hash of the recording and the parameters they were made with,
+so they are only used again for the same content and the same parameters.
+Changing a parameter gives a new key, and the products of the old one are
+left to be evicted.
+
+Arrays are stored as .npy files and read back memory mapped, other values
+as JSON. Arrays too large for memory can be written a chunk at a time.
+Reading a product touches its file, and when the folder grows over maxBytes
+the files used least recently are deleted first.
+
+The hash of a recording is remembered with its size and modification time,
+so an unchanged file is not read again to hash it. These small files are
+not evicted with the products.
+
+The folder is given by the SENSING_MAT_CACHE environment variable, or is
+.sensing_mat_cache in the home folder.
+
+'''
+
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+
+# changes whenever the products are calculated differently
+VERSION = 1
+
+def default_folder():
+    return os.environ.get("SENSING_MAT_CACHE") or os.path.join(os.path.expanduser("~"), ".sensing_mat_cache")
+
+class AnalysisCache:
+    def __init__(self, folder=None, maxBytes=2**30):
+        self.folder = folder or default_folder()
+        self.maxBytes = maxBytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.folder, exist_ok=True)
+
+    # write to a temporary file first, so other processes never read a file being written
+    def write(self, path, save):
+        fd, temp = tempfile.mkstemp(dir=self.folder, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                save(file)
+            os.replace(temp, path)
+        except BaseException:
+            os.remove(temp)
+            raise
+
+    # sha256 of the content of a file, remembered by path, size and modification time
+    def file_hash(self, filename):
+        stat = os.stat(filename)
+        memo = os.path.join(self.folder, "hash_" + hashlib.sha256(os.path.abspath(filename).encode()).hexdigest()[:32] + ".json")
+        try:
+            with open(memo, 'r') as file:
+                known = json.load(file)
+            if known["size"] == stat.st_size and known["mtime"] == stat.st_mtime_ns:
+                return known["sha256"]
+        except (OSError, ValueError, KeyError):
+            pass
+        digest = hashlib.sha256()
+        with open(filename, 'rb') as file:
+            for block in iter(lambda: file.read(2**20), b''):
+                digest.update(block)
+        known = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+        self.write(memo, lambda file: file.write(json.dumps(known).encode()))
+        return known["sha256"]
+
+    # key of the products made from a recording with the given parameters
+    def key(self, filename, **params):
+        params = dict(params, version=VERSION)
+        return hashlib.sha256((self.file_hash(filename) + json.dumps(params, sort_keys=True)).encode()).hexdigest()[:40]
+
+    def path(self, key, name, ext):
+        return os.path.join(self.folder, "%s_%s%s" % (key, name, ext))
+
+    # product stored under the key, None if there is none
+    def load(self, key, name):
+        for ext in ['.npy', '.json']:
+            path = self.path(key, name, ext)
+            try:
+                if ext == '.npy':
+                    value = np.load(path, mmap_mode='r')
+                else:
+                    with open(path, 'r') as file:
+                        value = json.load(file)
+            except (OSError, ValueError):
+                continue
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            self.hits += 1
+            return value
+        self.misses += 1
+        return None
+
+    # store an array or a value which can be written as JSON, returns the value
+    def store(self, key, name, value):
+        if isinstance(value, np.ndarray):
+            self.write(self.path(key, name, '.npy'), lambda file: np.save(file, value))
+        else:
+            self.write(self.path(key, name, '.json'), lambda file: file.write(json.dumps(value).encode()))
+        self.evict()
+        return value
+
+    # store an array given as chunks along its first axis, so that it is never in memory as a
+    # whole, returns it memory mapped
+    def store_chunks(self, key, name, shape, dtype, chunks):
+        dtype = np.dtype(dtype)
+        def save(file):
+            np.lib.format.write_array_header_1_0(file, {"descr": np.lib.format.dtype_to_descr(dtype), "fortran_order": False, "shape": tuple(shape)})
+            for chunk in chunks:
+                file.write(np.ascontiguousarray(chunk, dtype=dtype).tobytes())
+        path = self.path(key, name, '.npy')
+        self.write(path, save)
+        # mapped before evicting, an array larger than the cache is still returned
+        value = np.load(path, mmap_mode='r')
+        self.evict()
+        return value
+
+    # delete the products used least recently until the folder is under maxBytes, the remembered
+    # hashes are kept
+    def evict(self):
+        files = []
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and not entry.name.endswith(".tmp") and not entry.name.startswith("hash_"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for mtime, size, path in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.maxBytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                # still open in another process
+                pass
+
+    def size(self):
+        return sum(entry.stat().st_size for entry in os.scandir(self.folder) if entry.is_file())
@@ -1,16 +1,22 @@
+import io
 import os
 import cv2
 import sys
 import json
 import time
 import logging
+import argparse
+import functools
 import numpy as np
 import scipy as sp
 import scipy.ndimage
 import matplotlib.pyplot as plt
 from datetime import datetime
-from logging import FileHandler
-from converter import VisualRecord
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from converter import VisualRecord, VisualFileHandler, PagedFileHandler
+from matfile import MatFile
+from cache import AnalysisCache
 from matplotlib.colors import LinearSegmentedColormap
 
 
@@ -22,71 +28,228 @@ def get_custom_color_palette():
         '#FEF001', '#FFCE03', '#FD9A01', '#FD6104', '#FF2C05', '#F00505'
     ])
 
-def log_foot(dict):
+# yield the timestamp and pressure matrix of every frame in a JSON file or .smat recording
+def read_frames(filename):
+    if filename.lower().endswith('.smat'):
+        recording = MatFile(filename)
+        # sparse recordings are made dense one frame at a time
+        frames = recording.points.orient(recording.source) if recording.sparse else recording.oriented
+        for i, t in enumerate(recording.times):
+            yield datetime.fromtimestamp(t, recording.timezone), frames.frame(i) if recording.sparse else frames[i]
+    else:
+        with open(filename,'r+') as file:
+            file_data = json.load(file)
+        for curr in file_data["pressureData"]:
+            timeData = datetime.strptime(curr["dateTime"], '%Y-%m-%dT%H:%M:%S.%f%z')
+            arr = np.array(curr["pressureMatrix"], dtype=np.double)
+            yield timeData, np.rot90(arr)
+
+# pressure which can be kept as uint16 without changing it, the values below the threshold are already 0
+def fits_uint16(arr):
+    return arr.size == 0 or (arr.max() < 2**16 and np.array_equal(arr, np.round(arr)))
+
+# Yield the timestamp, the pressure matrix thresholded at 100 and the footprints of every frame. The
+# footprints, and the frames of JSON files, are kept in the cache (see cache.py) once the whole
+# recording has been read, and read back when it is logged again with the same parameters. The
+# frames of JSON files are stored as uint16 like the frames of .smat recordings, unless a value
+# does not fit.
+def cached_frames(filename, cache, smooth_radius=5, threshold=0.0001):
+    key = cache.key(filename, pressureThreshold=100, smoothRadius=smooth_radius, threshold=threshold)
+    isJson = not filename.lower().endswith('.smat')
+    frames = None
+    if isJson:
+        times, pressure = cache.load(key, "times"), cache.load(key, "frames")
+        if times is not None and pressure is not None:
+            frames = zip([datetime.fromisoformat(t) for t in times], pressure)
+    footprints = cache.load(key, "footprints")
+    if footprints is not None and (frames is not None or not isJson):
+        if frames is None:
+            frames = ((timeData, np.where(arr < 100, 0, arr)) for timeData, arr in read_frames(filename))
+        for (timeData, arr), boxes in zip(frames, footprints):
+            yield timeData, arr, [tuple(slice(start, stop) for start, stop in box) for box in boxes]
+        return
+    times, pressure, footprints = [], [], []
+    dtype = np.uint16
+    for timeData, arr in read_frames(filename):
+        arr = np.where(arr < 100, 0, arr)
+        slices = find_foot(arr, smooth_radius, threshold)
+        footprints.append([[[s.start, s.stop] for s in slice] for slice in slices])
+        if isJson:
+            times.append(timeData.isoformat())
+            if dtype == np.uint16 and not fits_uint16(arr):
+                dtype = np.double
+            pressure.append(arr.astype(np.uint16) if dtype == np.uint16 else arr)
+        yield timeData, arr, slices
+    cache.store(key, "footprints", footprints)
+    if isJson and len(pressure):
+        cache.store(key, "times", times)
+        # written one frame at a time, without a stacked copy of the recording
+        cache.store_chunks(key, "frames", (len(pressure),) + pressure[0].shape, dtype, pressure)
+
+# colours of get_custom_color_palette() as a lookup table in the BGR order used by OpenCV
+def get_color_table():
+    cmap = get_custom_color_palette()
+    rgba = cmap(np.arange(cmap.N))
+    return np.round(rgba[:, 2::-1] * 255).astype(np.uint8)
+
+colorTable = None
+
+# Colour a footprint with the lookup table and encode it as PNG in memory. The values are scaled
+# between the lowest and highest pressure of the footprint like plt.imshow does. When scale is
+# more than 1 the pressure is upscaled with bicubic interpolation first, in place of the
+# 'quadric' interpolation of plt.imshow.
+def render_lut(roi, scale=16):
+    global colorTable
+    if colorTable is None:
+        colorTable = get_color_table()
+    roi = np.asarray(roi, dtype=np.float32)
+    low, high = roi.min(), roi.max()
+    if scale > 1:
+        roi = cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_CUBIC)
+    if high > low:
+        index = np.clip((roi - low) * (len(colorTable) / (high - low)), 0, len(colorTable) - 1).astype(np.intp)
+    else:
+        index = np.zeros(roi.shape, dtype=np.intp)
+    retval, buf = cv2.imencode(".png", colorTable[index])
+    return buf.tobytes()
+
+# original rendering, draws the footprint with matplotlib and reads the PNG back. The PNG is kept
+# in memory instead of plt.png so that worker processes do not overwrite each other's images.
+def render_matplotlib(roi):
+    # the images of the previous footprints would otherwise pile up on the axes and be drawn again
+    plt.cla()
+    img = plt.imshow(roi, cmap=get_custom_color_palette(), interpolation='quadric')
+    plt.axis('off')
+    img.axes.get_xaxis().set_visible(False)
+    img.axes.get_yaxis().set_visible(False)
+    buf = io.BytesIO()
+    plt.savefig(buf, format="png", bbox_inches='tight', pad_inches = 0)
+    return cv2.imdecode(np.frombuffer(buf.getvalue(), dtype=np.uint8), cv2.IMREAD_COLOR)
+
+# images of the footprints in a frame, found in the frame unless they are given
+def render_frame(arr, render=render_lut, slices=None):
+    arr = np.where(arr < 100, 0, arr)
+    if slices is None:
+        slices = find_foot(arr)
+    return [render(arr[slice[0], slice[1]]) for slice in slices]
+
+# Timestamp and images of every frame in order. With more than one worker the frames are rendered
+# by a pool of processes, a few frames per worker are in flight while the next ones are read. The
+# frames can come with their footprints, as given by cached_frames().
+def render_frames(frames, render=render_lut, workers=1):
+    if workers <= 1:
+        for timeData, arr, *slices in frames:
+            yield timeData, render_frame(arr, render, *slices)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for timeData, arr, *slices in frames:
+            pending.append((timeData, executor.submit(render_frame, np.asarray(arr), render, *slices)))
+            if len(pending) >= workers * 4:
+                timeData, future = pending.popleft()
+                yield timeData, future.result()
+        while pending:
+            timeData, future = pending.popleft()
+            yield timeData, future.result()
+
+# Collapse runs of frames which differ from the first frame of the run by at most tolerance, the
+# largest difference of a pressure value (metric 'max') or the sum of the differences ('l1').
+# Yields the time of the first and last frame and the number of frames of each run with its first
+# frame (and its footprints when they are given), only the first frame of a run is rendered.
+def collapse_frames(frames, tolerance=0, metric="max"):
+    run = None
+    for timeData, arr, *slices in frames:
+        arr = np.where(arr < 100, 0, arr)
+        if run is not None:
+            diff = np.abs(np.subtract(arr, run[1], dtype=np.double))
+            if (diff.max() if metric == "max" else diff.sum()) <= tolerance:
+                first, last, count = run[0]
+                run[0] = (first, timeData, count + 1)
+                continue
+            yield tuple(run)
+        run = [(timeData, timeData, 1), arr, *slices]
+    if run is not None:
+        yield tuple(run)
+
+# title of a record, a single frame or the time range of a collapsed run of frames
+def format_time(timeData):
+    if not isinstance(timeData, tuple):
+        return timeData.strftime('%d %b %Y') + ', ' + timeData.strftime('%H:%M:%S.%f')
+    first, last, count = timeData
+    if count == 1:
+        return format_time(first)
+    if first.date() == last.date():
+        return format_time(first) + ' - ' + last.strftime('%H:%M:%S.%f') + ' (%d frames)' % count
+    return format_time(first) + ' - ' + format_time(last) + ' (%d frames)' % count
+
+def log_foot(frames, render=render_lut, workers=1, tolerance=None, metric="max"):
     global name
     logger.debug("<h1 style=\"text-align: center;\">Pressure Data Log</h1>")
     name = "<h2 style=\"text-align: center;\"><i>( " + name + " )</i></h2><hr/>"
     logger.debug(name)
-    cmap = get_custom_color_palette()
     print("Logging...")
-    for x in range(len(dict)):
-        imgList = []
-        curr = dict[x]
-        data = curr["pressureMatrix"]
-        timeData = curr["dateTime"]
-        timeData = datetime.strptime(timeData, '%Y-%m-%dT%H:%M:%S.%f%z')
-        timeDataDate = timeData.strftime('%d %b %Y')
-        timeDataTime = timeData.strftime('%H:%M:%S.%f')
-        timeData = timeDataDate + ', ' + timeDataTime
-        arr = np.array(data, dtype=np.double)
-        arr = np.rot90(arr)
-        arr[arr<100] = 0
-        foot = find_foot(arr)
-        for slice in foot:
-            roi = arr[slice[0], slice[1]]
-            #print(roi)
-            img = plt.imshow(roi, cmap=cmap, interpolation='quadric')
-            plt.axis('off')
-            img.axes.get_xaxis().set_visible(False)
-            img.axes.get_yaxis().set_visible(False)
-            plt.savefig("plt.png", bbox_inches='tight', pad_inches = 0)
-            img = cv2.imread("plt.png")
-            imgList.append(img)
+    if tolerance is not None:
+        frames = collapse_frames(frames, tolerance, metric)
+    for timeData, imgList in render_frames(frames, render, workers):
+        timeData = format_time(timeData)
         logger.debug(VisualRecord(("%s" %(timeData)), imgs=imgList, fmt = "png"))
-    os.remove("plt.png")
 
 def find_foot(data, smooth_radius=5, threshold=0.0001):
-    data = sp.ndimage.uniform_filter(data, smooth_radius)
+    data = sp.ndimage.uniform_filter(data, smooth_radius, output=np.double)
     thresh = data > threshold
     filled = sp.ndimage.binary_fill_holes(thresh)
     coded_foot, num_foot = sp.ndimage.label(filled)
     data_slices = sp.ndimage.find_objects(coded_foot)
     return data_slices
 
-# get command line arguments
-filename = sys.argv[1]
-name = os.path.basename(filename)
-# Check if path is valid
-if(os.path.exists(filename) == False):
-    print("File does not exist.")
-    sys.exit("Exited")
-
-# get command line arguments
-filePath = sys.argv[2]
-# Check if path is valid
-if(os.path.exists(filePath) == False):
-    print("Invalid PATH.")
-    sys.exit("Exited")
-
-with open(filename,'r+') as file:
-    file_data = json.load(file)
-dict = file_data["pressureData"]
-
-logFilename = filePath + "\PressureDataLog_" + time.strftime("%Y%m%d_%H%M%S") + ".html"
-logger = logging.getLogger("Pressure_Data_log")
-fh = FileHandler(logFilename, mode = "w")
-logger.setLevel(logging.DEBUG)
-logger.addHandler(fh)
-
-log_foot(dict)
+if __name__ == '__main__':
+    # get command line arguments
+    parser = argparse.ArgumentParser(usage="python script.py PATH_TO_JSON PATH_TO_OUTPUT [--renderer lut|matplotlib] [--scale N] [--workers N] [--pages N] [--tolerance T [--metric max|l1]] [--cache FOLDER] [--cache-size MB] [--no-cache]")
+    parser.add_argument("filename")
+    parser.add_argument("filePath")
+    parser.add_argument("--renderer", choices=["lut", "matplotlib"], default="lut",
+        help="colour the footprints with a lookup table (default) or draw them with matplotlib")
+    parser.add_argument("--scale", type=int, default=16, help="upscaling factor of the lookup table renderer, 1 to turn it off")
+    parser.add_argument("--workers", type=int, default=1, help="number of processes rendering the frames, 1 renders them one after another")
+    parser.add_argument("--pages", type=int, help="write a folder of pages with this many records each, with the images in separate files")
+    parser.add_argument("--tolerance", type=float,
+        help="log a run of frames once while they differ from its first frame by at most this much, 0 for identical frames")
+    parser.add_argument("--metric", choices=["max", "l1"], default="max",
+        help="difference between frames, largest difference of a pressure value (default) or sum of the differences")
+    parser.add_argument("--cache", help="folder of the cache of decoded frames and footprints")
+    parser.add_argument("--cache-size", type=float, default=1024, help="size of the cache in MB (1024 by default)")
+    parser.add_argument("--no-cache", action="store_true", help="read the recording and find the footprints again")
+    args = parser.parse_args()
+    filename = args.filename
+    name = os.path.basename(filename)
+    # Check if path is valid
+    if(os.path.exists(filename) == False):
+        print("File does not exist.")
+        sys.exit("Exited")
+
+    filePath = args.filePath
+    # Check if path is valid
+    if(os.path.exists(filePath) == False):
+        print("Invalid PATH.")
+        sys.exit("Exited")
+
+    logFilename = filePath + "\PressureDataLog_" + time.strftime("%Y%m%d_%H%M%S")
+    logger = logging.getLogger("Pressure_Data_log")
+    if args.pages:
+        fh = PagedFileHandler(logFilename, args.pages)
+    else:
+        fh = VisualFileHandler(logFilename + ".html", mode = "w")
+    logger.setLevel(logging.DEBUG)
+    logger.addHandler(fh)
+
+    if args.renderer == "matplotlib":
+        render = render_matplotlib
+    else:
+        render = functools.partial(render_lut, scale=args.scale)
+    if args.no_cache:
+        frames = read_frames(filename)
+    else:
+        frames = cached_frames(filename, AnalysisCache(args.cache, int(args.cache_size * 2**20)))
+    log_foot(frames, render, args.workers, args.tolerance, args.metric)
+    fh.close()
 
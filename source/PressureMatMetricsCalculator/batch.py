@@ -0,0 +1,410 @@
+'''
+Headless batch mode for the metrics calculator
+
+Calculates the same metrics as single_run() and multi_runs() in script.py
+for one or more recordings without a display or any prompts, and writes
+them as JSON or CSV instead of printed tables. Plots are only drawn when a
+folder is given, as PNG files using the non-interactive Agg backend.
+
+"python batch.py PATH [PATH ...] [--manifest FILE] [--source 1|2] [--foot-label auto|left|right|none|l,r,...]
+                 [--gap SECONDS] [--output RESULTS.json|RESULTS.csv] [--plots FOLDER]
+                 [--features FOLDER] [--rate HZ] [--workers N] [--summary SUMMARY.csv] [--resume JOURNAL]
+                 [--cache FOLDER] [--cache-size MB] [--no-cache] [--chunk FRAMES] [--min-confidence C]"
+
+Every PATH is a recording or a folder of recordings, and a manifest lists
+one recording per line. The files are spread over a pool of processes
+(--workers, one per CPU by default). A file which cannot be processed is
+reported with its error and does not stop the others. A summary table with
+one row per file and the time taken by each step is printed at the end and
+can be saved with --summary. With --resume every result is added to a
+journal as soon as it is ready with the parameters it was calculated with,
+and files whose content hash is already in the journal with the same
+parameters are not processed again.
+
+--foot-label gives the foot which made the first footprint (foot 1) of
+every run: left or right for all the runs, l or r for each run separated by
+commas, or none to keep the values as foot 1 and foot 2. With auto foot 1
+of each run is classified from its heels (classify_feet() in script.py) and
+the confidence is given with the results. A run classified with a
+confidence below --min-confidence (0.8 by default, like multi_runs()) is
+not labelled: its values are kept as foot 1 and foot 2 and it is left out
+of the consolidated left and right values. Consolidated metrics over
+several runs need the feet to be labelled.
+
+The stance, swing and stride times are taken on a uniform timeline of
+--rate frames per second (100 by default) from the time each foot touches
+and leaves the mat between the frames, see resample_time() in script.py.
+With --rate 0 they are taken from the recorded frames.
+
+The decoded frames, footprints, heels and runs of every recording are kept
+in an on-disk cache (see cache.py) keyed by the content of the file and the
+parameters, so running the batch again, for example with another --rate or
+--foot-label, does not load and segment the recordings again. --cache gives
+its folder, --cache-size its size in MB (1024 by default) above which the
+files used least recently are deleted, and --no-cache turns it off.
+
+Recordings larger than the memory are analysed with --chunk: the footprints
+are found FRAMES frames at a time (see chunks.py) and the frames of dense
+.smat recordings are thresholded into the cache (or a temporary file with
+--no-cache) a chunk at a time and memory mapped from it, so the memory used
+depends on the size of a chunk. JSON files are always read whole, they can
+be converted to .smat with matfile.py.
+
+With --features the pressure features of every footprint (see features.py)
+are saved in the folder as a .npz file for each recording.
+
+'''
+
+import os
+import sys
+import csv
+import json
+import time
+import hashlib
+import argparse
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import script
+import features
+from cache import AnalysisCache
+
+# 'l' or 'r' for the first foot of each run, None when the feet are not labelled
+def foot_labels(footLabel, numRuns):
+    if footLabel in ('none', 'auto'):
+        return [None] * numRuns
+    if footLabel in ('left', 'right'):
+        return [footLabel[0]] * numRuns
+    labels = [label.strip().lower() for label in footLabel.split(',')]
+    if len(labels) != numRuns or any(label not in ('l', 'r') for label in labels):
+        raise ValueError("foot labels %s do not match the %d runs found" % (footLabel, numRuns))
+    return labels
+
+# values of foot 1 and foot 2, or of the left and right foot once they have been swapped
+def by_foot(values, feet):
+    if values is None:
+        return None
+    return {feet[0]: float(values[0]), feet[1]: float(values[1])}
+
+def metrics_result(cadence, stride, gait, feet):
+    return {
+        "cadence": float(cadence),
+        "strideLength": by_foot(stride and stride[0], feet),
+        "strideVelocity": by_foot(stride and stride[1], feet),
+        "gait": None if gait is None else {
+            "cycles": {foot: int(n) for foot, n in zip(feet, gait[0])},
+            "avgStance": by_foot(gait[1], feet),
+            "avgSwing": by_foot(gait[2], feet),
+            "stancePercentage": by_foot(gait[3], feet)
+        }
+    }
+
+# gait cycle and path of a run saved as PNG files
+def save_plots(plotFolder, filename, run, pressureMatrices, timeData, dataSlices, indices):
+    name = os.path.splitext(os.path.basename(filename))[0]
+    fig = plt.figure()
+    script.draw_gait(fig.gca(), timeData, dataSlices)
+    fig.savefig(os.path.join(plotFolder, "%s_run%d_gait.png" % (name, run)))
+    plt.close(fig)
+    fig = plt.figure()
+    script.draw_path(fig.gca(), pressureMatrices, indices)
+    fig.savefig(os.path.join(plotFolder, "%s_run%d_path.png" % (name, run)))
+    plt.close(fig)
+
+# metrics of every run of a recording and the metrics consolidated over the runs
+# the time taken by each step is added to timings in seconds
+def analyse_file(filename, jsonSource=1, footLabel='left', gap=0.5, plotFolder=None, timings=None, featureFolder=None, rate=100, cache=None, chunkFrames=None, minConfidence=0.8):
+    timings = {} if timings is None else timings
+    pressureData, timeData, timestamps, footRegions, activity, runs, runRegions = script.analyse_recording(filename, jsonSource, gap, cache, timings, chunkFrames=chunkFrames)
+    startTime = time.perf_counter()
+    labels = foot_labels(footLabel, len(runs))
+
+    result = {
+        "file": filename,
+        "frames": len(pressureData),
+        "footprints": len(footRegions),
+        "runs": [],
+        "consolidated": None
+    }
+    timeRegions, timeBase = footRegions, timeData
+    if rate:
+        timeBase, timeRegions, timestamps = script.resample_time(pressureData, timeData, footRegions, timestamps, rate)
+    footRegionRuns = [[footRegions[i] for i in regions] for regions in runRegions]
+    timeRegionRuns = [[timeRegions[i] for i in regions] for regions in runRegions]
+    cadenceValues = []
+    strideValues = []
+    gaitValues = []
+    for i, dataSlices in enumerate(footRegionRuns):
+        indices = script.find_heels(pressureData, dataSlices, activity)
+        cadenceValues.append(script.cadence_metrics(timeBase, timeRegionRuns[i]))
+        strideValues.append(script.stride_metrics(pressureData, timeBase, timeRegionRuns[i], activity, indices))
+        gaitValues.append(script.gait_metrics(timeBase, timeRegionRuns[i]))
+        confidence = None
+        if footLabel == 'auto':
+            label, confidence = script.classify_feet(indices)
+            labels[i] = label if confidence >= minConfidence else None
+        if plotFolder is not None:
+            save_plots(plotFolder, filename, i + 1, pressureData[runs[i][0]:runs[i][1]], timeBase, timeRegionRuns[i], indices)
+        if labels[i] == 'r':
+            script.swap_feet(strideValues[i], gaitValues[i])
+        run = {
+            "run": i + 1,
+            "start": runs[i][0],
+            "stop": runs[i][1],
+            "startTime": float(timeData[runs[i][0]]),
+            "footprints": len(dataSlices),
+            "foot1": {'l': 'left', 'r': 'right', None: None}[labels[i]],
+            "foot1Confidence": confidence
+        }
+        run.update(metrics_result(cadenceValues[i], strideValues[i], gaitValues[i], ['foot1', 'foot2'] if labels[i] is None else ['left', 'right']))
+        result["runs"].append(run)
+    # runs without a label are left out of the left and right values, a single run is given as foot 1 and foot 2
+    labelled = [i for i in range(len(runs)) if labels[i] is not None]
+    if labelled:
+        result["consolidated"] = metrics_result(*script.consolidate_runs(timeBase, [timeRegionRuns[i] for i in labelled], [cadenceValues[i] for i in labelled],
+            [strideValues[i] for i in labelled], [gaitValues[i] for i in labelled]), ['left', 'right'])
+    elif len(runs) == 1:
+        result["consolidated"] = metrics_result(*script.consolidate_runs(timeBase, timeRegionRuns, cadenceValues, strideValues, gaitValues), ['foot1', 'foot2'])
+    if featureFolder is not None:
+        result["features"] = os.path.join(featureFolder, os.path.splitext(os.path.basename(filename))[0] + "_features.npz")
+        features.FootprintFeatures(pressureData, timeData, footRegions).save(result["features"])
+    timings["metrics"] = time.perf_counter() - startTime
+    return result
+
+# sha256 of the content of a file, read in blocks
+def file_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(2**20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Runs in the worker processes. Errors are returned with the result so that
+# one file which cannot be processed does not stop the batch.
+def process_file(filename, jsonSource, footLabel, gap, plotFolder, sha256=None, featureFolder=None, rate=100, cache=None, chunkFrames=None, minConfidence=0.8):
+    result = {"file": filename, "sha256": sha256, "error": None, "timings": {}}
+    startTime = time.perf_counter()
+    try:
+        if sha256 is None:
+            result["sha256"] = file_hash(filename)
+            result["timings"]["hash"] = time.perf_counter() - startTime
+        result.update(analyse_file(filename, jsonSource, footLabel, gap, plotFolder, result["timings"], featureFolder, rate, cache, chunkFrames, minConfidence))
+    except Exception as e:
+        result["error"] = "%s: %s" % (type(e).__name__, e)
+        result["traceback"] = traceback.format_exc()
+    result["timings"]["total"] = time.perf_counter() - startTime
+    return result
+
+# recordings in the paths and in the manifest, a folder gives all the recordings in it
+# and a JSON file is left out when the .smat recording it was converted from is there too
+def collect_files(paths, manifest=None):
+    if manifest is not None:
+        folder = os.path.dirname(manifest)
+        with open(manifest, 'r') as file:
+            lines = [line.strip() for line in file]
+        paths = list(paths) + [os.path.join(folder, line) for line in lines if line and not line.startswith('#')]
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            names = sorted(os.listdir(path))
+            for name in names:
+                base, ext = os.path.splitext(name)
+                if ext.lower() == '.smat' or (ext.lower() == '.json' and base + '.smat' not in names):
+                    files.append(os.path.join(path, name))
+        else:
+            files.append(path)
+    return files
+
+# parameters which change the result of a file, kept with it in the journal
+def journal_params(jsonSource=1, footLabel='left', gap=0.5, featureFolder=None, rate=100, chunkFrames=None, minConfidence=0.8):
+    return {"source": jsonSource, "footLabel": footLabel, "gap": gap, "features": featureFolder, "rate": rate, "chunk": chunkFrames, "minConfidence": minConfidence}
+
+# a result is looked up in the journal by the content hash of its file and its parameters
+def journal_key(sha256, params):
+    return (sha256, json.dumps(params, sort_keys=True))
+
+# results already in the journal, by content hash and parameters
+# results written before the parameters were kept have none and are calculated again
+def read_journal(journal):
+    done = {}
+    if journal is not None and os.path.exists(journal):
+        with open(journal, 'r') as file:
+            for line in file:
+                if line.strip():
+                    result = json.loads(line)
+                    if result.get("error") is None:
+                        done[journal_key(result["sha256"], result.get("params"))] = result
+    return done
+
+# Process the files over a pool of worker processes, results are in the order of the files. Files whose
+# hash is in the journal with the same parameters are skipped and new results are added to it as they finish.
+def process_files(files, jsonSource=1, footLabel='left', gap=0.5, plotFolder=None, workers=None, journal=None, featureFolder=None, rate=100, cache=None, chunkFrames=None, minConfidence=0.8):
+    done = read_journal(journal)
+    params = journal_params(jsonSource, footLabel, gap, featureFolder, rate, chunkFrames, minConfidence)
+    results = [None] * len(files)
+    hashes = [None] * len(files)
+    pending = []
+    for ind, filename in enumerate(files):
+        if done:
+            try:
+                hashes[ind] = file_hash(filename)
+            except OSError:
+                pass
+        key = journal_key(hashes[ind], params)
+        if key in done:
+            results[ind] = dict(done[key], file=filename, skipped=True)
+        else:
+            pending.append(ind)
+    journalFile = open(journal, 'a') if journal is not None else None
+    try:
+        def finish(ind, result):
+            result["params"] = params
+            results[ind] = result
+            if journalFile is not None:
+                journalFile.write(json.dumps(result) + '\n')
+                journalFile.flush()
+        if workers == 1:
+            for ind in pending:
+                finish(ind, process_file(files[ind], jsonSource, footLabel, gap, plotFolder, hashes[ind], featureFolder, rate, cache, chunkFrames, minConfidence))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(process_file, files[ind], jsonSource, footLabel, gap, plotFolder, hashes[ind], featureFolder, rate, cache, chunkFrames, minConfidence): ind for ind in pending}
+                for future in as_completed(futures):
+                    ind = futures[future]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        # the worker process itself failed
+                        result = {"file": files[ind], "sha256": None, "error": "%s: %s" % (type(e).__name__, e), "timings": {}}
+                    finish(ind, result)
+    finally:
+        if journalFile is not None:
+            journalFile.close()
+    return results
+
+SUMMARY_FIELDS = ["file", "status", "frames", "footprints", "runs", "cadence", "hash", "load", "findFoot", "correctSlices", "metrics", "total"]
+
+# one row for every file with the time taken by each step
+def summary_rows(results):
+    rows = []
+    for result in results:
+        status = "error" if result.get("error") else ("skipped" if result.get("skipped") else "ok")
+        consolidated = result.get("consolidated")
+        row = {
+            "file": result["file"],
+            "status": status,
+            "frames": result.get("frames"),
+            "footprints": result.get("footprints"),
+            "runs": len(result["runs"]) if "runs" in result else None,
+            "cadence": consolidated["cadence"] if consolidated else None
+        }
+        for step in SUMMARY_FIELDS[6:]:
+            row[step] = result["timings"].get(step)
+        rows.append(row)
+    return rows
+
+def print_summary(results):
+    print("File \t\t\t\t| Status \t| Frames \t| Footprints \t| Runs \t| Cadence \t| Load (s) \t| Metrics (s) \t| Total (s)")
+    print("-" * 150)
+    for row, result in zip(summary_rows(results), results):
+        cadence = '%.2f'%row["cadence"] if row["cadence"] is not None else '-'
+        times = ['%.3f'%row[step] if row[step] is not None else '-' for step in ["load", "metrics", "total"]]
+        print(os.path.basename(row["file"]).ljust(24), "\t|", row["status"], "\t|", row["frames"], "\t|", row["footprints"], "\t\t|", row["runs"], "\t|", cadence,
+            "\t|", times[0], "\t|", times[1], "\t|", times[2])
+        if result.get("error"):
+            print("\t", result["error"])
+
+def write_summary(results, path):
+    with open(path, 'w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summary_rows(results))
+
+# nested values as columns named like "gait.avgStance.left"
+def flatten(value, prefix=''):
+    if isinstance(value, dict):
+        row = {}
+        for key, item in value.items():
+            row.update(flatten(item, prefix + key + '.'))
+        return row
+    return {prefix[:-1]: value}
+
+# one row for every run and one for the consolidated metrics of each file
+def result_rows(results):
+    rows = []
+    for result in results:
+        for run in result.get("runs", []):
+            rows.append(dict({"file": result["file"]}, **flatten(run)))
+        if result.get("consolidated") is not None:
+            rows.append(dict({"file": result["file"], "run": "all"}, **flatten(result["consolidated"])))
+    return rows
+
+def write_csv(results, file):
+    rows = result_rows(results)
+    fields = []
+    for row in rows:
+        fields += [field for field in row if field not in fields]
+    writer = csv.DictWriter(file, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(rows)
+
+def write_results(results, output):
+    if output.lower().endswith('.csv'):
+        with open(output, 'w', newline='') as file:
+            write_csv(results, file)
+    else:
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage="python batch.py PATH [PATH ...] [--manifest FILE] [--source 1|2] [--foot-label auto|left|right|none|l,r,...] "
+        "[--gap SECONDS] [--output RESULTS.json|RESULTS.csv] [--plots FOLDER] [--features FOLDER] [--rate HZ] [--workers N] [--summary SUMMARY.csv] [--resume JOURNAL] "
+        "[--cache FOLDER] [--cache-size MB] [--no-cache] [--chunk FRAMES] [--min-confidence C]")
+    parser.add_argument("paths", nargs="*", help="recordings or folders of recordings")
+    parser.add_argument("--manifest", help="text file with the path of one recording on each line")
+    parser.add_argument("--source", type=int, choices=[1, 2], default=1,
+        help="1 - Consolidator Script, 2 - Sensing Mat Software (JSON files only)")
+    parser.add_argument("--foot-label", default="left",
+        help="foot 1 of every run is left or right, l or r for each run separated by commas, none, or auto to classify each run")
+    parser.add_argument("--min-confidence", type=float, default=0.8,
+        help="with --foot-label auto, runs classified with a lower confidence (0 to 1, 0.8 by default) are not labelled")
+    parser.add_argument("--gap", type=float, default=0.5, help="seconds without pressure which end a run")
+    parser.add_argument("--output", help="JSON or CSV file for the results of every run")
+    parser.add_argument("--plots", help="folder to save the gait cycle and path of each run as PNG files")
+    parser.add_argument("--features", help="folder to save the pressure features of every footprint as .npz files")
+    parser.add_argument("--rate", type=float, default=100.0, help="frames per second of the timeline used for the timing (100 by default), 0 for the recorded frames")
+    parser.add_argument("--cache", help="folder of the cache of decoded frames, footprints and runs")
+    parser.add_argument("--cache-size", type=float, default=1024, help="size of the cache in MB (1024 by default)")
+    parser.add_argument("--no-cache", action="store_true", help="load and segment every recording again")
+    parser.add_argument("--chunk", type=int, metavar="FRAMES", help="threshold and segment .smat recordings FRAMES frames at a time, for recordings larger than the memory (JSON files are read whole)")
+    parser.add_argument("--workers", type=int, help="number of worker processes, one per CPU by default")
+    parser.add_argument("--summary", help="CSV file for the summary table with one row per file")
+    parser.add_argument("--resume", metavar="JOURNAL", help="skip the files already in this journal and add the new results to it")
+    args = parser.parse_args()
+
+    for path in args.paths + ([args.manifest] if args.manifest else []):
+        if(os.path.exists(path) == False):
+            print("File does not exist:", path)
+            sys.exit("Exited")
+    if args.chunk is not None and args.chunk < 1:
+        print("A chunk needs at least 1 frame.")
+        sys.exit("Exited")
+    if not 0 <= args.min_confidence <= 1:
+        print("The minimum confidence is from 0 to 1.")
+        sys.exit("Exited")
+    files = collect_files(args.paths, args.manifest)
+    if len(files) == 0:
+        print("No recordings found.")
+        sys.exit("Exited")
+    for folder in [args.plots, args.features]:
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+    cache = None if args.no_cache else AnalysisCache(args.cache, int(args.cache_size * 2**20))
+    results = process_files(files, args.source, args.foot_label, args.gap, args.plots, args.workers, args.resume, args.features, args.rate, cache, args.chunk, args.min_confidence)
+    if args.output is not None:
+        write_results(results, args.output)
+    if args.summary is not None:
+        write_summary(results, args.summary)
+    print_summary(results)
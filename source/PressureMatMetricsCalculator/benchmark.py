@@ -0,0 +1,232 @@
+'''
+Benchmarks for the metrics calculator.
+
+1. Load time: writes a synthetic walk of each length as a JSON file (the
+   format written by the consolidator) and as a .smat recording, then
+   compares the time and peak memory taken by get_filedata() for both.
+2. Regions (--regions): times the frame by frame scans correct_slices() and
+   find_heels() used originally against the activity index on a synthetic
+   walk (20000 frames by default).
+3. Sparse (--sparse): writes a synthetic walk as a dense and as a sparse
+   recording and compares the file size, and the time and peak memory
+   taken to load each of them and find the footprints and heels.
+4. Chunked (--chunked): analyses a synthetic walk written as a dense
+   recording in memory and a chunk of 1000 frames at a time through a
+   temporary cache (see chunks.py), and compares the time and peak memory.
+
+"python benchmark.py [frames ...]"
+"python benchmark.py --regions [frames ...]"
+"python benchmark.py --sparse [frames ...]"
+"python benchmark.py --chunked [frames ...]"
+
+'''
+
+import os
+import sys
+import time
+import tempfile
+import tracemalloc
+import numpy as np
+import script
+from cache import AnalysisCache
+from matfile import MatFileWriter, MatFile
+
+# 96x48 frames of two feet stepping along the mat at ~20 Hz
+def synthetic_walk(numFrames, rows=96, cols=48, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:rows, 0:cols]
+    for i in range(numFrames):
+        frame = np.zeros((rows, cols))
+        step = i // 10
+        if i % 10 < 7:
+            y = (step * 12) % (rows - 12) + 6
+            x = 16 if step % 2 else 32
+            foot = np.exp(-(((yy - y) / 5.0) ** 2 + ((xx - x) / 3.0) ** 2))
+            frame = foot * rng.uniform(1500, 3000)
+        frame[frame < 100] = 0
+        yield frame.astype(np.uint16)
+
+def write_recordings(folder, numFrames):
+    smatPath = os.path.join(folder, "walk_%d.smat" % numFrames)
+    jsonPath = os.path.join(folder, "walk_%d.json" % numFrames)
+    startTime = time.time()
+    with MatFileWriter(smatPath, 96, 48) as writer:
+        for i, frame in enumerate(synthetic_walk(numFrames)):
+            writer.append(frame, startTime + i * 0.05)
+    MatFile(smatPath).to_json(jsonPath)
+    return jsonPath, smatPath
+
+# time and peak traced memory of get_filedata, measured in separate runs
+def measure(filename):
+    startTime = time.perf_counter()
+    pressureMatrices, timeData, timestamps = script.get_filedata(filename, 1)
+    elapsed = time.perf_counter() - startTime
+    del pressureMatrices, timeData, timestamps
+    tracemalloc.start()
+    pressureMatrices, timeData, timestamps = script.get_filedata(filename, 1)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, pressureMatrices
+
+# original implementations which check the frames of each region one at a time
+def legacy_correct_slices(pressureMatrices, dataSlices):
+    for ind in range(len(dataSlices)):
+        x, y, z = dataSlices[ind]
+        start = z.start
+        end = z.stop
+        for i in range (start, end):
+            curr = pressureMatrices[i]
+            curr = curr[x, y]
+            if(np.any(curr)):
+                start = i
+                break
+        for i in range(end, start, -1):
+            curr = pressureMatrices[i]
+            curr = curr[x, y]
+            if(np.any(curr)):
+                end = i+1
+                break
+        z = slice(start, end, None)
+        dataSlices[ind] = list(dataSlices[ind])
+        dataSlices[ind][2] = z
+        dataSlices[ind] = tuple(dataSlices[ind])
+    return dataSlices
+
+def legacy_find_heels(pressureMatrices, dataSlices):
+    stepCount = len(dataSlices)
+    indices = []
+    for i in range(stepCount):
+        curr = pressureMatrices[dataSlices[i][2].start]
+        curr = curr[dataSlices[i][0], dataSlices[i][1]]
+        max = np.unravel_index(np.argmax(curr), curr.shape)
+        max = list(max)
+        max[0] = max[0] + dataSlices[i][0].start
+        max[1] = max[1] + dataSlices[i][1].start
+        indices.append(max)
+    return indices
+
+def benchmarkRegions(numFrames):
+    pressureData = np.stack(list(synthetic_walk(numFrames)))
+    # the scans read the frame after the last region
+    pressureData = np.concatenate([pressureData, np.zeros((1,) + pressureData.shape[1:], dtype=pressureData.dtype)])
+    footRegions = script.find_foot(np.moveaxis(pressureData, 0, -1))
+    footRegions.sort(key=lambda data_slice: data_slice[2].start)
+
+    startTime = time.perf_counter()
+    legacyRegions = legacy_correct_slices(pressureData, list(footRegions))
+    legacyHeels = legacy_find_heels(pressureData, legacyRegions)
+    legacyTime = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    index = script.ActivityIndex(pressureData, footRegions)
+    indexTime = time.perf_counter() - startTime
+    regions = script.correct_slices(pressureData, list(footRegions), index)
+    heels = script.find_heels(pressureData, regions, index)
+    totalTime = time.perf_counter() - startTime
+
+    # both methods have to give the same regions and heels
+    assert regions == legacyRegions
+    assert heels == [[int(v) for v in heel] for heel in legacyHeels]
+    print(numFrames, "frames,", len(regions), "footprints")
+    print("Frame by frame scans: ", '%.3f'%legacyTime, "s")
+    print("Activity index:       ", '%.3f'%totalTime, "s (building the index", '%.3f'%indexTime, "s)")
+    print("Speedup:              ", '%.1fx'%(legacyTime/totalTime))
+
+# footprints and heels of a recording the same way as the main program
+def analyse(filename):
+    pressureData, timeData, timestamps = script.get_filedata(filename, 1)
+    if isinstance(pressureData, script.SparseFrames):
+        footRegions = script.find_foot_sparse(pressureData)
+        activity = None
+    else:
+        footRegions = script.find_foot(pressureData)
+        footRegions.sort(key=lambda data_slice: data_slice[2].start)
+        pressureData = np.rollaxis(pressureData, -1)
+        activity = script.ActivityIndex(pressureData, footRegions)
+        footRegions = script.correct_slices(pressureData, footRegions, activity)
+    return footRegions, script.find_heels(pressureData, footRegions, activity)
+
+def benchmarkSparse(folder, numFrames):
+    densePath = os.path.join(folder, "walk_%d.smat" % numFrames)
+    sparsePath = os.path.join(folder, "walk_%d_sparse.smat" % numFrames)
+    startTime = time.time()
+    with MatFileWriter(densePath, 96, 48) as dense, MatFileWriter(sparsePath, 96, 48, sparse=True) as sparse:
+        for i, frame in enumerate(synthetic_walk(numFrames)):
+            dense.append(frame, startTime + i * 0.05)
+            sparse.append(frame, startTime + i * 0.05)
+    results = []
+    for path in [densePath, sparsePath]:
+        startTime = time.perf_counter()
+        analyse(path)
+        elapsed = time.perf_counter() - startTime
+        tracemalloc.start()
+        result = analyse(path)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append(result)
+        print(numFrames, "\t|", "sparse" if path == sparsePath else "dense", "\t|", '%.1f'%(os.path.getsize(path)/2**20),
+            "\t\t|", '%.3f'%elapsed, "\t|", '%.1f'%(peak/2**20))
+    # both layouts have to give the same footprints and heels
+    assert results[0] == results[1]
+
+# time and peak traced memory of analysing a dense recording in memory and in chunks, the memory
+# mapped frames of the cache are not traced
+def benchmarkChunked(folder, numFrames, chunkFrames=1000):
+    path = os.path.join(folder, "walk_%d.smat" % numFrames)
+    startTime = time.time()
+    with MatFileWriter(path, 96, 48) as writer:
+        for i, frame in enumerate(synthetic_walk(numFrames)):
+            writer.append(frame, startTime + i * 0.05)
+    results = []
+    for chunked in [False, True]:
+        # a new cache every time, so nothing is read back from it
+        cache = AnalysisCache(tempfile.mkdtemp(dir=folder)) if chunked else None
+        tracemalloc.start()
+        startTime = time.perf_counter()
+        pressureData, timeData, timestamps, footRegions, activity, runs, runRegions = script.analyse_recording(path, 1, cache=cache, chunkFrames=chunkFrames if chunked else None)
+        heels = script.find_heels(pressureData, footRegions, activity)
+        elapsed = time.perf_counter() - startTime
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        results.append((footRegions, heels, runs, runRegions))
+        del pressureData
+        print(numFrames, "\t|", "chunks of %d" % chunkFrames if chunked else "in memory\t", "\t|", '%.1f'%(os.path.getsize(path)/2**20),
+            "\t\t|", '%.3f'%elapsed, "\t|", '%.1f'%(peak/2**20))
+    # both have to give the same footprints, heels and runs
+    assert results[0] == results[1]
+
+if __name__ == '__main__':
+    if "--chunked" in sys.argv[1:]:
+        lengths = [int(n) for n in sys.argv[1:] if n != "--chunked"] or [2000, 8000, 32000]
+        print("Frames \t| Analysis \t\t| File (MB) \t| Time (s) \t| Peak (MB)")
+        print("-" * 80)
+        with tempfile.TemporaryDirectory() as folder:
+            for numFrames in lengths:
+                benchmarkChunked(folder, numFrames)
+        sys.exit()
+    if "--sparse" in sys.argv[1:]:
+        lengths = [int(n) for n in sys.argv[1:] if n != "--sparse"] or [2000, 8000]
+        print("Frames \t| Layout \t| File (MB) \t| Time (s) \t| Peak (MB)")
+        print("-" * 72)
+        with tempfile.TemporaryDirectory() as folder:
+            for numFrames in lengths:
+                benchmarkSparse(folder, numFrames)
+        sys.exit()
+    if "--regions" in sys.argv[1:]:
+        lengths = [int(n) for n in sys.argv[1:] if n != "--regions"] or [20000]
+        for numFrames in lengths:
+            benchmarkRegions(numFrames)
+        sys.exit()
+    lengths = [int(n) for n in sys.argv[1:]] or [500, 2000, 8000]
+    print("Frames \t| JSON (s) \t| JSON (MB) \t| .smat (s) \t| .smat (MB) \t| File Size JSON / .smat (MB)")
+    print("-" * 110)
+    with tempfile.TemporaryDirectory() as folder:
+        for numFrames in lengths:
+            jsonPath, smatPath = write_recordings(folder, numFrames)
+            jsonTime, jsonPeak, jsonData = measure(jsonPath)
+            smatTime, smatPeak, smatData = measure(smatPath)
+            # both paths have to give the same pressure data
+            assert np.array_equal(jsonData, smatData)
+            del jsonData, smatData
+            print(numFrames, "\t|", '%.3f'%jsonTime, "\t|", '%.1f'%(jsonPeak/2**20), "\t\t|", '%.3f'%smatTime, "\t|", '%.1f'%(smatPeak/2**20),
+                "\t\t|", '%.1f'%(os.path.getsize(jsonPath)/2**20), "/", '%.1f'%(os.path.getsize(smatPath)/2**20))
@@ -0,0 +1,158 @@
+'''
+Out-of-core footprint segmentation
+
+find_foot_chunked() finds the same footprints as find_foot() sorted by their
+first frame, but goes through the (frames, rows, cols) pressure data
+chunkFrames frames at a time, so the memory it uses depends on the size of
+a chunk and not on the length of the recording. The frames can be a memory
+mapped recording or the frames stored in the analysis cache (see cache.py),
+they stay uint16 until a chunk is smoothed.
+
+- each chunk is read with the frames before and after it which the uniform
+  filter needs, so the chunks overlap and the smoothed values of the frames
+  of a chunk are the same as over the whole recording
+- the regions are labelled in each chunk and joined with the regions of the
+  previous chunk which they touch across the boundary between the chunks
+- only the bounding box and the first pixel (in the order used by scipy's
+  label) of each region are kept, which give the slices and the order of
+  find_foot()
+
+binary_fill_holes() is left out for the same reason as in segmenter.py, and
+filling the holes of each chunk would take its ends for the ends of the
+recording.
+
+threshold_chunks() sets the pressure below the threshold to 0 a chunk at a
+time, so the frames of a recording can be written to the cache without a
+thresholded copy of the whole recording in memory. threshold_to_disk() does
+the same into a temporary file when there is no cache.
+
+"python chunks.py PATH_TO_FILE [jsonSource] [chunkFrames]" compares both
+methods on a recording.
+
+'''
+
+import sys
+import time
+import tempfile
+import numpy as np
+import scipy as sp
+import scipy.ndimage
+
+# frames of (frames, rows, cols) pressure data with the values below pressureThreshold set to 0,
+# chunkFrames frames at a time
+def threshold_chunks(frames, chunkFrames=1000, pressureThreshold=300):
+    for start in range(0, len(frames), chunkFrames):
+        chunk = np.asarray(frames[start:start + chunkFrames])
+        yield np.where(chunk < pressureThreshold, chunk.dtype.type(0), chunk)
+
+# frames of (frames, rows, cols) pressure data thresholded chunkFrames frames at a time into an unnamed
+# temporary file and memory mapped from it, the file is deleted once the frames are not used any more
+def threshold_to_disk(frames, chunkFrames=1000, pressureThreshold=300):
+    if frames.size == 0:
+        return np.zeros(frames.shape, dtype=np.uint16)
+    with tempfile.TemporaryFile() as file:
+        for chunk in threshold_chunks(frames, chunkFrames, pressureThreshold):
+            file.write(np.ascontiguousarray(chunk, dtype=np.uint16).tobytes())
+        file.flush()
+        # the mapping keeps the data of the file after it is closed
+        return np.memmap(file, dtype=np.uint16, mode='r', shape=frames.shape)
+
+class ChunkedRegions:
+    def __init__(self):
+        # (frame start, frame stop, row start, row stop, col start, col stop) of each region
+        self.boxes = []
+        # first pixel (row, col, frame) of each region
+        self.firsts = []
+        self.parent = []
+
+    def add(self, box, first):
+        self.parent.append(len(self.parent))
+        self.boxes.append(box)
+        self.firsts.append(first)
+
+    def find(self, key):
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[b] = a
+
+    # slices of the joined regions, sorted by first frame and then first pixel like find_foot()
+    def slices(self):
+        regions = {}
+        for key in range(len(self.parent)):
+            root = self.find(key)
+            box, first = self.boxes[key], self.firsts[key]
+            if root in regions:
+                known, knownFirst = regions[root]
+                box = (min(known[0], box[0]), max(known[1], box[1]), min(known[2], box[2]),
+                    max(known[3], box[3]), min(known[4], box[4]), max(known[5], box[5]))
+                first = min(knownFirst, first)
+            regions[root] = (box, first)
+        ordered = sorted(regions.values(), key=lambda region: (region[0][0], region[1]))
+        return [(slice(box[2], box[3], None), slice(box[4], box[5], None), slice(box[0], box[1], None)) for box, first in ordered]
+
+# footprints of (frames, rows, cols) pressure data, the same as find_foot() sorted by start frame
+def find_foot_chunked(frames, chunkFrames=1000, smoothRadius=5, threshold=0.0001):
+    before = smoothRadius // 2
+    after = smoothRadius - before - 1
+    numFrames = len(frames)
+    regions = ChunkedRegions()
+    prevLabels = None
+    prevOffset = 0
+    for start in range(0, numFrames, chunkFrames):
+        stop = min(start + chunkFrames, numFrames)
+        # the frames around the chunk are smoothed with it, the ends of the recording are reflected
+        # by the filter the same way as find_foot() does
+        low, high = max(start - before, 0), min(stop + after, numFrames)
+        smooth = sp.ndimage.uniform_filter(np.asarray(frames[low:high]), smoothRadius, output=np.double)
+        labels, numLabels = sp.ndimage.label(smooth[start - low:stop - low] > threshold)
+        del smooth
+        offset = len(regions.parent)
+        for label, (z, x, y) in enumerate(sp.ndimage.find_objects(labels), 1):
+            # first pixel of the region in the order (row, col, frame)
+            pixels = labels[z, x.start, y] == label
+            col = int(np.argmax(pixels.any(axis=0)))
+            frame = int(np.argmax(pixels[:, col]))
+            regions.add((start + z.start, start + z.stop, x.start, x.stop, y.start, y.stop), (x.start, y.start + col, start + z.start + frame))
+        # regions touching across the boundary with the previous chunk are the same region
+        if prevLabels is not None and numLabels:
+            overlap = (prevLabels > 0) & (labels[0] > 0)
+            for prev, curr in set(zip(prevLabels[overlap].tolist(), labels[0][overlap].tolist())):
+                regions.union(prevOffset + prev - 1, offset + curr - 1)
+        prevLabels = labels[-1].copy()
+        prevOffset = offset
+    return regions.slices()
+
+if __name__ == '__main__':
+    import tracemalloc
+    import script
+    if(len(sys.argv) < 2):
+        print("Insufficient Parameters.\nEnter in the form \"python chunks.py PATH_TO_FILE [jsonSource] [chunkFrames]\"")
+        sys.exit("Exited")
+    jsonSource = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    chunkFrames = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+    pressureData, timeData, timestamps = script.get_filedata(sys.argv[1], jsonSource)
+
+    tracemalloc.start()
+    startTime = time.perf_counter()
+    footRegions = script.find_foot(pressureData)
+    footRegions.sort(key=lambda data_slice: data_slice[2].start)
+    batchTime = time.perf_counter() - startTime
+    batchPeak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    startTime = time.perf_counter()
+    chunkRegions = find_foot_chunked(np.rollaxis(pressureData, -1), chunkFrames)
+    chunkTime = time.perf_counter() - startTime
+    chunkPeak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print("find_foot:        ", len(footRegions), "footprints", '%.3f'%batchTime, "s", '%.1f'%(batchPeak/2**20), "MB")
+    print("find_foot_chunked:", len(chunkRegions), "footprints", '%.3f'%chunkTime, "s", '%.1f'%(chunkPeak/2**20), "MB")
+    print("Same footprints:", footRegions == chunkRegions)
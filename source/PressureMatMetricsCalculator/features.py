@@ -0,0 +1,185 @@
+'''
+Pressure features of every footprint
+
+FootprintFeatures calculates for all the footprints of a recording at once:
+- the centre of pressure (COP) in every frame of each footprint
+- the total pressure and the contact area (pixels with pressure) in every frame
+- the peak pressure map, the highest pressure of each pixel of the footprint
+- the pressure-time integral map, the pressure of each pixel summed over time
+- the loading rate, the highest total pressure divided by the time taken to
+  reach it from the first contact
+
+The pixels of the bounding box of every footprint in every one of its frames
+are gathered from the (frames, rows, cols) array in one fancy indexing
+operation (gather_footprints() in script.py) and the features are reductions over
+them, so there is no loop over the frames. The footprints are gathered in
+groups of about GATHER_ROWS rows of the mat like footprint_loads(), so the
+memory used does not grow with the length of the recording. Sparse
+recordings are gathered one footprint at a time.
+
+The values are in the units of the recording: pressure as stored, positions
+and areas in cells of the mat, times in seconds. The values of each frame of
+footprint k are at frameptr[k]:frameptr[k+1] and the pixels of its maps at
+pixelptr[k]:pixelptr[k+1], with shapes[k] rows and columns. save() writes
+all of them to a compressed .npz file.
+
+"python features.py PATH_TO_FILE [jsonSource]" prints a summary of every
+footprint.
+
+'''
+
+import sys
+import numpy as np
+import script
+from matfile import SparseFrames
+
+# total pressure, contact area and COP in every frame and the peak and pressure-time integral of every
+# pixel of the footprints in the boxes, from the pixels gathered in one operation
+def pixel_features(pressureMatrices, frameTime, boxes, starts, durations, dataSlices):
+    heights = boxes[:, 1] - boxes[:, 0]
+    widths = boxes[:, 3] - boxes[:, 2]
+    area = heights * widths
+    footprint = np.repeat(np.arange(len(boxes)), durations)
+    frames = starts[footprint] + script.ragged_arange(durations)
+    values = script.gather_footprints(pressureMatrices, boxes, footprint, frames, dataSlices).astype(np.double)
+    frameArea = area[footprint]
+    offsets = np.cumsum(frameArea) - frameArea
+    # position of every pixel on the mat
+    pixel = script.ragged_arange(frameArea)
+    pixelWidth = np.repeat(widths[footprint], frameArea)
+    rows = np.repeat(boxes[footprint, 0], frameArea) + pixel // pixelWidth
+    cols = np.repeat(boxes[footprint, 2], frameArea) + pixel % pixelWidth
+
+    if len(values):
+        force = np.add.reduceat(values, offsets)
+        contact = script.count_pressed(values, frameArea)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            cop = np.stack([np.add.reduceat(values * rows, offsets), np.add.reduceat(values * cols, offsets)], axis=1) / force[:, np.newaxis]
+    else:
+        force = np.zeros(0)
+        contact = np.zeros(0, dtype=np.intp)
+        cop = np.zeros((0, 2))
+
+    # the values of each pixel over the frames of its footprint next to each other
+    sizes = area * durations
+    valueptr = np.cumsum(sizes) - sizes
+    owner = np.repeat(np.arange(len(boxes)), sizes)
+    index = script.ragged_arange(sizes)
+    order = valueptr[owner] + (index % durations[owner]) * area[owner] + index // durations[owner]
+    pixelOwner = np.repeat(np.arange(len(boxes)), area)
+    pixelStarts = valueptr[pixelOwner] + script.ragged_arange(area) * durations[pixelOwner]
+    if len(values):
+        peak = np.maximum.reduceat(values[order], pixelStarts)
+        pti = np.add.reduceat((values * np.repeat(frameTime[frames], frameArea))[order], pixelStarts)
+    else:
+        peak = np.zeros(0)
+        pti = np.zeros(0)
+    return force, contact, cop, peak, pti
+
+class FootprintFeatures:
+    def __init__(self, pressureMatrices, timeData, dataSlices):
+        boxes = script.region_boxes(dataSlices)
+        starts = np.array([z.start for x, y, z in dataSlices], dtype=np.intp)
+        durations = np.array([z.stop - z.start for x, y, z in dataSlices], dtype=np.intp)
+        heights = boxes[:, 1] - boxes[:, 0]
+        widths = boxes[:, 3] - boxes[:, 2]
+        area = heights * widths
+        self.boxes = boxes
+        self.shapes = np.stack([heights, widths], axis=1)
+        self.frameptr = np.concatenate(([0], np.cumsum(durations)))
+        self.pixelptr = np.concatenate(([0], np.cumsum(area)))
+
+        # one entry for every frame of every footprint
+        footprint = np.repeat(np.arange(len(boxes)), durations)
+        self.frames = starts[footprint] + script.ragged_arange(durations)
+        self.time = np.asarray(timeData, dtype=np.double)[self.frames]
+        # time covered by each frame, halfway to the frames before and after it
+        frameTime = np.gradient(np.asarray(timeData, dtype=np.double)) if len(timeData) > 1 else np.ones(len(timeData))
+
+        # the values of the frames and the pixels of the footprints of each group follow those of the group before
+        rows = heights * durations
+        groups = np.flatnonzero(np.diff((np.cumsum(rows) - rows) // script.GATHER_ROWS, prepend=-1))
+        bounds = np.concatenate((groups, [len(boxes)]))
+        parts = [pixel_features(pressureMatrices, frameTime, boxes[first:last], starts[first:last], durations[first:last], dataSlices[first:last])
+            for first, last in zip(bounds[:-1], bounds[1:])]
+        if parts:
+            self.force, self.contact, self.cop, self.peak, self.pti = [np.concatenate(values) for values in zip(*parts)]
+        else:
+            self.force, self.contact, self.cop = np.zeros(0), np.zeros(0, dtype=np.intp), np.zeros((0, 2))
+            self.peak, self.pti = np.zeros(0), np.zeros(0)
+
+        # highest total pressure of each footprint and the first frame it is reached in
+        firsts = self.frameptr[:-1]
+        if len(self.force):
+            self.maxForce = np.maximum.reduceat(self.force, firsts)
+            highest = np.flatnonzero(self.force == self.maxForce[footprint])
+            peakFrame = highest[np.searchsorted(footprint[highest], np.arange(len(boxes)))]
+            rise = self.time[peakFrame] - self.time[firsts]
+        else:
+            self.maxForce = np.zeros(0)
+            rise = np.zeros(0)
+        # NaN when the highest pressure is in the first frame
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.loadingRate = np.where(rise > 0, self.maxForce / rise, np.nan)
+
+    def __len__(self):
+        return len(self.boxes)
+
+    # COP (row, col) in every frame of footprint k, NaN in frames without pressure
+    def cop_path(self, k):
+        return self.cop[self.frameptr[k]:self.frameptr[k+1]]
+
+    def peak_map(self, k):
+        return self.peak[self.pixelptr[k]:self.pixelptr[k+1]].reshape(self.shapes[k])
+
+    def pti_map(self, k):
+        return self.pti[self.pixelptr[k]:self.pixelptr[k+1]].reshape(self.shapes[k])
+
+    # one value of each feature for every footprint
+    def summary(self):
+        rows = []
+        for k in range(len(self)):
+            frames = slice(self.frameptr[k], self.frameptr[k+1])
+            path = self.cop[frames]
+            path = path[~np.isnan(path).any(axis=1)]
+            rows.append({
+                "start": float(self.time[frames.start]),
+                "contactTime": float(self.time[frames.stop - 1] - self.time[frames.start]),
+                "peakPressure": float(self.peak_map(k).max()),
+                "maxForce": float(self.maxForce[k]),
+                "maxContactArea": int(self.contact[frames].max()),
+                "loadingRate": None if np.isnan(self.loadingRate[k]) else float(self.loadingRate[k]),
+                "copLength": float(np.hypot(*np.diff(path, axis=0).T).sum()) if len(path) > 1 else 0.0,
+                "pressureTimeIntegral": float(self.pti_map(k).sum())
+            })
+        return rows
+
+    def save(self, path):
+        np.savez_compressed(path, boxes=self.boxes, shapes=self.shapes, frameptr=self.frameptr, pixelptr=self.pixelptr,
+            frames=self.frames, time=self.time, force=self.force, contact=self.contact, cop=self.cop,
+            peak=self.peak, pti=self.pti, maxForce=self.maxForce, loadingRate=self.loadingRate)
+
+# footprints of a recording and their features, the same way as the main program
+def recording_features(filename, jsonSource=1):
+    pressureData, timeData, timestamps = script.get_filedata(filename, jsonSource)
+    if isinstance(pressureData, SparseFrames):
+        footRegions = script.find_foot_sparse(pressureData)
+    else:
+        footRegions = script.find_foot(pressureData)
+        footRegions.sort(key=lambda data_slice: data_slice[2].start)
+        pressureData = np.rollaxis(pressureData, -1)
+        footRegions = script.correct_slices(pressureData, footRegions)
+    return FootprintFeatures(pressureData, timeData, footRegions)
+
+if __name__ == '__main__':
+    if(len(sys.argv) < 2):
+        print("Insufficient Parameters.\nEnter in the form \"python features.py PATH_TO_FILE [jsonSource]\"")
+        sys.exit("Exited")
+    jsonSource = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    features = recording_features(sys.argv[1], jsonSource)
+    print("Footprint \t| Start (s) \t| Contact (s) \t| Peak \t| Max Total \t| Max Area \t| Loading Rate (/s) \t| COP Path (cells)")
+    print("-" * 130)
+    for k, row in enumerate(features.summary()):
+        rate = '%.0f'%row["loadingRate"] if row["loadingRate"] is not None else '-'
+        print(k + 1, "\t\t|", '%.2f'%row["start"], "\t|", '%.2f'%row["contactTime"], "\t|", '%.0f'%row["peakPressure"], "\t|", '%.0f'%row["maxForce"],
+            "\t|", row["maxContactArea"], "\t\t|", rate, "\t\t|", '%.1f'%row["copLength"])
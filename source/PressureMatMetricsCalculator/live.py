@@ -0,0 +1,164 @@
+'''
+Live gait metrics while a recording is being made
+
+Follows a .smat recording written by the consolidator and updates cadence,
+stride and gait metrics every time a footprint is completed, using the
+streaming segmenter. Every update is published as a line of JSON on stdout,
+or as a UDP datagram to a port on localhost.
+
+"python live.py PATH_TO_RECORDING [--port PORT] [--idle SECONDS]"
+
+The metrics are calculated the same way as get_cadence(), get_stride() and
+get_gait() for a single run, with foot 1 being the first footprint. Only the
+running sums, the last footprints and the times of the frames which can
+still be part of a footprint are kept, so a long session does not use more
+and more memory.
+
+'''
+
+import math
+import json
+import socket
+import argparse
+import numpy as np
+from collections import deque
+from matfile import MatFile, orient
+from segmenter import FootstepSegmenter
+
+class LiveMetrics:
+    def __init__(self, publish, smoothRadius=5, threshold=0.0001):
+        self.publish = publish
+        self.segmenter = FootstepSegmenter(smoothRadius, threshold)
+        self.numFrames = 0
+        self.firstTime = None
+        # times of the frames from frame timeOffset on
+        self.times = deque()
+        self.timeOffset = 0
+        # footprints completed by the segmenter but not yet in start order
+        self.pending = []
+        self.count = 0
+        self.firstStart = None
+        # start, last frame time and heel of the last two footprints, stances of the last three
+        self.recent = deque(maxlen=2)
+        self.stances = deque(maxlen=3)
+        # running sums of get_stride() and get_gait() for each foot
+        self.step = [0, 0]
+        self.vel = [0, 0]
+        self.percentages = [0, 0]
+        self.avgStance = [0, 0]
+        self.avgSwing = [0, 0]
+
+    # add a pressure matrix (oriented and thresholded like get_filedata) with its time in seconds
+    def add_frame(self, frame, timestamp):
+        if self.firstTime is None:
+            self.firstTime = timestamp
+        self.times.append(timestamp)
+        self.numFrames += 1
+        self.pending += self.segmenter.push(frame)
+        self.release(self.segmenter.open_start())
+
+    def close(self):
+        self.pending += self.segmenter.close()
+        self.release(self.numFrames + 1)
+
+    # time of a frame relative to the first one
+    def time(self, index):
+        return self.times[min(index, self.numFrames - 1) - self.timeOffset] - self.firstTime
+
+    # footprints starting before frame are final and are added in the order of find_foot()
+    def release(self, frame):
+        self.pending.sort(key=lambda region: (region.start, region.first))
+        while self.pending and self.pending[0].start < frame:
+            self.add_footprint(self.pending.pop(0))
+        # the frames before the first footprint still to be added are not needed any more
+        keep = min([region.start for region in self.pending] + [frame, self.numFrames - 1])
+        while self.timeOffset < keep:
+            self.times.popleft()
+            self.timeOffset += 1
+
+    def add_footprint(self, region):
+        dt = region.slices[2]
+        i = self.count
+        ind = i % 2
+        self.count += 1
+        start = self.time(dt.start)
+        last = self.time(dt.stop - 1)
+        if i == 0:
+            self.firstStart = start
+        stance = last - start
+        self.stances.append(stance)
+        swing = None
+        if i >= 2:
+            previous = self.recent[0]
+            swing = start - previous["last"]
+            currDist = math.dist(previous["heel"], region.heel) * 2
+            self.step[ind] += currDist
+            self.vel[ind] += currDist / (start - previous["start"])
+            # each stance is paired with the swing at the same index, as in get_gait(), which is
+            # the stance two footprints before
+            cycle = i - 2
+            self.percentages[cycle % 2] += (self.stances[0] / (self.stances[0] + swing)) * 100
+            self.avgStance[cycle % 2] += self.stances[0]
+            self.avgSwing[cycle % 2] += swing
+        self.recent.append({"start": start, "last": last, "heel": region.heel})
+        self.publish(self.metrics(region, stance, swing))
+
+    def metrics(self, region, stance, swing):
+        count = self.count
+        dt = region.slices[2]
+        update = {
+            "footprint": count,
+            "foot": (count - 1) % 2 + 1,
+            "start": self.time(dt.start),
+            "stance": stance,
+            "swing": swing,
+            "heel": [int(v) for v in region.heel],
+            "cadence": count / ((self.time(dt.stop) - self.firstStart) / 60),
+            "strideLength": None,
+            "strideVelocity": None,
+            "gait": None
+        }
+        if count >= 4:
+            n1 = math.ceil(count / 2) - 1
+            n2 = math.floor(count / 2) - 1
+            update["strideLength"] = [self.step[0] / n1, self.step[1] / n2]
+            update["strideVelocity"] = [self.vel[0] / n1, self.vel[1] / n2]
+        cycles = max(count - 2, 0)
+        n1 = math.ceil(cycles / 2)
+        n2 = math.floor(cycles / 2)
+        if n1 and n2:
+            update["gait"] = {
+                "cycles": [n1, n2],
+                "avgStance": [self.avgStance[0] / n1, self.avgStance[1] / n2],
+                "avgSwing": [self.avgSwing[0] / n1, self.avgSwing[1] / n2],
+                "percentages": [self.percentages[0] / n1, self.percentages[1] / n2]
+            }
+        return update
+
+# write every update as a line of JSON on stdout
+def publish_stdout(update):
+    print(json.dumps(update), flush=True)
+
+# send every update as a UDP datagram to a port on localhost
+def publish_udp(port):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    def publish(update):
+        sock.sendto(json.dumps(update).encode(), ("127.0.0.1", port))
+    return publish
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage="python live.py PATH_TO_RECORDING [--port PORT] [--idle SECONDS]")
+    parser.add_argument("recording")
+    parser.add_argument("--port", type=int, help="send updates to this UDP port on localhost instead of stdout")
+    parser.add_argument("--idle", type=float, help="stop when no frame has been added for this many seconds")
+    args = parser.parse_args()
+
+    recording = MatFile(args.recording)
+    live = LiveMetrics(publish_udp(args.port) if args.port else publish_stdout)
+    try:
+        for record in recording.follow(idle=args.idle):
+            frame = orient(record['frame'][np.newaxis], recording.source)[0]
+            live.add_frame(np.where(frame < 300, 0, frame), record['time'] / 1e6)
+    except KeyboardInterrupt:
+        pass
+    live.close()
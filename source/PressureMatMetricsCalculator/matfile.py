@@ -0,0 +1,466 @@
+'''
+Binary recording format for sensing mat data (.smat)
+
+The file starts with a fixed header followed by JSON metadata (the
+template.json configuration and details of the recording) and is then
+followed by one fixed size record per frame. Every record holds the
+timestamp of the frame in microseconds since the epoch, optionally the
+time at which each mat replied, and the uint16 pressure matrix.
+
+Frames are only ever appended, so a recording which was interrupted can
+still be read up to the last complete frame. The frames can be memory
+mapped as a (frames, rows, cols) array without reading the file.
+
+Sparse recordings (version 2) only store the points with pressure of every
+frame, as the number of points followed by (row, col, value) triples.
+They are a fraction of the size of a dense recording when only a small
+part of the mat is pressed. MatFile.points gives the frames of either
+layout as SparseFrames, which can be cropped or turned into dense frames
+one frame at a time.
+
+JSON files written by the consolidator (source 1) or recorded by the
+Sensing Mat Analytics software (source 2) can be imported, the source is
+kept in the header and orient() applies the matching rotation or flip as a
+view.
+
+"python matfile.py RECORDING.smat [OUTPUT.json]" converts a recording to JSON
+"python matfile.py RECORDING.json [OUTPUT.smat] [--source 2] [--sparse]" imports a JSON file
+"python matfile.py RECORDING.smat OUTPUT.smat [--sparse]" rewrites a recording as dense or sparse
+
+This file is used by the consolidator, the metrics calculator and the data
+logger. The copies in each folder are kept identical, which is checked by
+ConsolidatingSensingMatReadings/tests/test_matfile.py.
+
+'''
+
+from datetime import datetime, timezone, timedelta
+import numpy as np
+import argparse
+import struct
+import json
+import time
+import sys
+import os
+import re
+
+MAGIC = b'SMAT'
+VERSION = 1
+SPARSE_VERSION = 2
+# magic, version, rows, cols, number of mat timestamps per frame, metadata length
+HEADER = struct.Struct('<4sHHHHI')
+
+# dtype of a single frame record
+def recordDtype(rows, cols, numMatTimes=0):
+    fields = [('time', '<i8')]
+    if numMatTimes:
+        fields.append(('matTimes', '<i8', (numMatTimes,)))
+    fields.append(('frame', '<u2', (rows, cols)))
+    return np.dtype(fields)
+
+# dtype of the fixed part of a sparse frame record, followed by count points
+def sparseRecordDtype(numMatTimes=0):
+    fields = [('time', '<i8')]
+    if numMatTimes:
+        fields.append(('matTimes', '<i8', (numMatTimes,)))
+    fields.append(('count', '<u4'))
+    return np.dtype(fields)
+
+# a point with pressure of a sparse frame
+POINT = np.dtype([('row', '<u2'), ('col', '<u2'), ('value', '<u2')])
+
+# offset and number of points of every complete sparse record in data
+def splitSparse(data, fixed):
+    offsets = []
+    counts = []
+    pos = 0
+    while pos + fixed.itemsize <= len(data):
+        count = int.from_bytes(data[pos + fixed.itemsize - 4:pos + fixed.itemsize], 'little')
+        end = pos + fixed.itemsize + count * POINT.itemsize
+        if end > len(data):
+            break
+        offsets.append(pos)
+        counts.append(count)
+        pos = end
+    return np.array(offsets, dtype=np.intp), np.array(counts, dtype=np.intp), pos
+
+# fixed parts and points of the sparse records found by splitSparse()
+def readSparse(data, fixed, offsets, counts):
+    end = offsets[-1] + fixed.itemsize + counts[-1] * POINT.itemsize if len(offsets) else 0
+    buf = np.frombuffer(data, dtype=np.uint8, count=end)
+    # the bytes of the fixed parts are marked, everything else are the points one after another
+    fixedBytes = np.zeros(end, dtype=bool)
+    fixedBytes[offsets[:, np.newaxis] + np.arange(fixed.itemsize)] = True
+    return buf[fixedBytes].view(fixed), buf[~fixedBytes].view(POINT)
+
+# Frames stored as their points with pressure, one frame after another like the rows of a CSR
+# matrix: points indptr[i] to indptr[i + 1] belong to frame i and are in row major order.
+class SparseFrames:
+    def __init__(self, shape, indptr, rows, cols, values):
+        self.shape = tuple(shape)
+        self.indptr = indptr
+        self.rows = rows
+        self.cols = cols
+        self.values = values
+
+    @classmethod
+    def from_dense(cls, frames):
+        frames = np.asarray(frames)
+        index, rows, cols = np.nonzero(frames)
+        indptr = np.concatenate(([0], np.cumsum(np.bincount(index, minlength=len(frames)))))
+        return cls(frames.shape[1:], indptr, rows.astype(np.uint16), cols.astype(np.uint16), frames[index, rows, cols])
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    # consecutive frames, without copying the points
+    def __getitem__(self, index):
+        start, stop, step = index.indices(len(self))
+        if step != 1:
+            raise ValueError("only consecutive frames can be selected")
+        stop = max(start, stop)
+        low, high = self.indptr[start], self.indptr[stop]
+        return SparseFrames(self.shape, self.indptr[start:stop + 1] - low,
+            self.rows[low:high], self.cols[low:high], self.values[low:high])
+
+    # dense frames one at a time
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.frame(i)
+
+    # number of points with pressure in each frame
+    def counts(self):
+        return np.diff(self.indptr)
+
+    # frame of every point
+    def frame_index(self):
+        return np.repeat(np.arange(len(self)), self.counts())
+
+    def frame(self, i):
+        low, high = self.indptr[i], self.indptr[i + 1]
+        frame = np.zeros(self.shape, dtype=self.values.dtype)
+        frame[self.rows[low:high], self.cols[low:high]] = self.values[low:high]
+        return frame
+
+    # (frames, rows, cols) array of all the frames
+    def dense(self):
+        frames = np.zeros((len(self),) + self.shape, dtype=self.values.dtype)
+        frames[self.frame_index(), self.rows, self.cols] = self.values
+        return frames
+
+    # dense pressure of frame i inside the rows and cols slices
+    def crop(self, i, rows, cols):
+        low, high = self.indptr[i], self.indptr[i + 1]
+        r, c = self.rows[low:high], self.cols[low:high]
+        inside = (r >= rows.start) & (r < rows.stop) & (c >= cols.start) & (c < cols.stop)
+        roi = np.zeros((rows.stop - rows.start, cols.stop - cols.start), dtype=self.values.dtype)
+        roi[r[inside] - rows.start, c[inside] - cols.start] = self.values[low:high][inside]
+        return roi
+
+    # sum of the pressure of all the frames
+    def total(self):
+        flat = self.rows.astype(np.intp) * self.shape[1] + self.cols
+        return np.bincount(flat, weights=self.values, minlength=self.shape[0] * self.shape[1]).reshape(self.shape)
+
+    # frames with only the points selected by keep
+    def select(self, keep):
+        counts = np.bincount(self.frame_index()[keep], minlength=len(self))
+        return SparseFrames(self.shape, np.concatenate(([0], np.cumsum(counts))),
+            self.rows[keep], self.cols[keep], self.values[keep])
+
+    # frames without the points under the threshold, like np.where(frames < low, 0, frames)
+    def threshold(self, low):
+        return self.select(self.values >= low)
+
+    # same as orient() on the dense frames
+    def orient(self, jsonSource):
+        if jsonSource == 1:
+            rows, cols, shape = self.shape[1] - 1 - self.cols.astype(np.intp), self.rows, self.shape[::-1]
+        elif jsonSource == 2:
+            rows, cols, shape = self.shape[0] - 1 - self.rows.astype(np.intp), self.cols, self.shape
+        else:
+            return self
+        # points are put back in row major order within each frame
+        order = np.lexsort((cols, rows, self.frame_index()))
+        return SparseFrames(shape, self.indptr, rows[order].astype(np.uint16), cols[order], self.values[order])
+
+# current utc offset of the local timezone in seconds
+def localUtcOffset():
+    return int(datetime.now().astimezone().utcoffset().total_seconds())
+
+ISO_TIMESTAMP = re.compile(r'(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d)(?:\.(\d+))?(.*)')
+
+# parse an iso format timestamp with any number of digits for the fraction of a second
+def parseTimestamp(timestamp):
+    base, fraction, zone = ISO_TIMESTAMP.match(timestamp).groups()
+    fraction = (fraction or '')[:6].ljust(6, '0')
+    return datetime.fromisoformat(base + '.' + fraction + zone)
+
+# rotate or flip (frames, rows, cols) the same way get_filedata does for each source
+def orient(frames, jsonSource):
+    if isinstance(frames, SparseFrames):
+        return frames.orient(jsonSource)
+    if jsonSource == 1:
+        return np.rot90(frames, axes=(1, 2))
+    elif jsonSource == 2:
+        return np.flip(frames, axis=1)
+    return frames
+
+class MatFileWriter:
+    # metadata is stored in the header, checkpoint is the time in seconds between fsyncs
+    # sparse recordings only store the points with pressure of every frame
+    def __init__(self, path, rows, cols, metadata=None, numMatTimes=0, checkpoint=1.0, source=1, utcOffset=None, sparse=False):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.sparse = sparse
+        header = {
+            "template": metadata or {},
+            "utcOffset": localUtcOffset() if utcOffset is None else utcOffset,
+            "source": source
+        }
+        meta = json.dumps(header).encode()
+        # pad the metadata so that the records start at a multiple of 8 bytes
+        meta += b' ' * (-(HEADER.size + len(meta)) % 8)
+        self.file = open(path, 'wb')
+        self.file.write(HEADER.pack(MAGIC, SPARSE_VERSION if sparse else VERSION, rows, cols, numMatTimes, len(meta)))
+        self.file.write(meta)
+        # single record reused for every frame
+        if sparse:
+            self.record = np.zeros(1, dtype=sparseRecordDtype(numMatTimes))
+        else:
+            self.record = np.zeros(1, dtype=recordDtype(rows, cols, numMatTimes))
+        self.frames = 0
+        self.lastSync = time.monotonic()
+        self.sync()
+
+    # append a frame, timestamp and matTimes are in seconds since the epoch
+    def append(self, frame, timestamp=None, matTimes=None):
+        if timestamp is None:
+            timestamp = time.time()
+        self.record['time'] = round(timestamp * 1e6)
+        if matTimes is not None:
+            # missing replies are stored as 0
+            self.record['matTimes'] = [0 if t is None else round(t * 1e6) for t in matTimes]
+        if self.sparse:
+            frame = np.asarray(frame)
+            rows, cols = np.nonzero(frame)
+            points = np.empty(len(rows), dtype=POINT)
+            points['row'] = rows
+            points['col'] = cols
+            points['value'] = frame[rows, cols]
+            self.record['count'] = len(points)
+            self.file.write(self.record.tobytes() + points.tobytes())
+        else:
+            self.record['frame'] = frame
+            self.file.write(self.record.tobytes())
+        self.frames += 1
+        if time.monotonic() - self.lastSync >= self.checkpoint:
+            self.sync()
+
+    # write everything buffered so far to disk
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.lastSync = time.monotonic()
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class MatFile:
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            magic, version, rows, cols, numMatTimes, metaLength = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("%s is not a sensing mat recording" % path)
+            if version not in (VERSION, SPARSE_VERSION):
+                raise ValueError("%s is a recording of an unknown version %d" % (path, version))
+            header = json.loads(file.read(metaLength))
+        self.rows = rows
+        self.cols = cols
+        self.metadata = header["template"]
+        self.utcOffset = header["utcOffset"]
+        self.source = header["source"]
+        self.sparse = version == SPARSE_VERSION
+        self.numMatTimes = numMatTimes
+        offset = HEADER.size + metaLength
+        self.dataOffset = offset
+        if self.sparse:
+            # the records have different sizes and are read into memory, a partially written
+            # last frame is ignored
+            self.dtype = sparseRecordDtype(numMatTimes)
+            with open(path, 'rb') as file:
+                file.seek(offset)
+                data = file.read()
+            offsets, counts, end = splitSparse(data, self.dtype)
+            self.records, points = readSparse(data, self.dtype, offsets, counts)
+            indptr = np.concatenate(([0], np.cumsum(counts)))
+            self.sparseFrames = SparseFrames((rows, cols), indptr, points['row'], points['col'], points['value'])
+            return
+        self.dtype = recordDtype(rows, cols, numMatTimes)
+        # a partially written last frame is ignored
+        count = (os.path.getsize(path) - offset) // self.dtype.itemsize
+        if count > 0:
+            self.records = np.memmap(path, dtype=self.dtype, mode='r', offset=offset, shape=(count,))
+        else:
+            self.records = np.zeros(0, dtype=self.dtype)
+
+    def __len__(self):
+        return len(self.records)
+
+    # (frames, rows, cols) uint16 view of the pressure data, sparse recordings are made dense
+    @property
+    def frames(self):
+        if self.sparse:
+            return self.sparseFrames.dense()
+        return self.records['frame']
+
+    # pressure data as SparseFrames, without making sparse recordings dense
+    @property
+    def points(self):
+        if self.sparse:
+            return self.sparseFrames
+        return SparseFrames.from_dense(self.frames)
+
+    # uint16 pressure matrix of a single frame
+    def frame(self, i):
+        if self.sparse:
+            return self.sparseFrames.frame(i)
+        return self.records['frame'][i]
+
+    # (frames, rows, cols) view in the orientation used by the analysis tools
+    @property
+    def oriented(self):
+        return orient(self.frames, self.source)
+
+    # timestamps of the frames in seconds since the epoch
+    @property
+    def times(self):
+        return self.records['time'] / 1e6
+
+    @property
+    def timezone(self):
+        return timezone(timedelta(seconds=self.utcOffset))
+
+    # iso format timestamp of a frame, same as datetime.now().astimezone().isoformat()
+    def isoformat(self, microseconds):
+        seconds, micro = divmod(int(microseconds), 10**6)
+        return (datetime.fromtimestamp(seconds, self.timezone) + timedelta(microseconds=micro)).isoformat()
+
+    # complete records at the start of data and the number of bytes they take up, the frames of
+    # sparse records are given back dense like the records of a dense recording
+    def parse(self, data):
+        if not self.sparse:
+            count = len(data) // self.dtype.itemsize
+            return np.frombuffer(data[:count * self.dtype.itemsize], dtype=self.dtype), count * self.dtype.itemsize
+        offsets, counts, end = splitSparse(data, self.dtype)
+        fixed, points = readSparse(data, self.dtype, offsets, counts)
+        frames = SparseFrames((self.rows, self.cols), np.concatenate(([0], np.cumsum(counts))),
+            points['row'], points['col'], points['value'])
+        records = np.zeros(len(fixed), dtype=recordDtype(self.rows, self.cols, self.numMatTimes))
+        for name in fixed.dtype.names[:-1]:
+            records[name] = fixed[name]
+        records['frame'] = frames.dense()
+        return records, end
+
+    # yield every record of a recording which is still being written, waiting for new frames
+    # until no frame has been added for idle seconds (forever if idle is None)
+    def follow(self, interval=0.05, idle=None):
+        lastFrame = time.monotonic()
+        with open(self.path, 'rb') as file:
+            file.seek(self.dataOffset)
+            pending = b''
+            while True:
+                pending += file.read()
+                records, size = self.parse(pending)
+                if len(records):
+                    pending = pending[size:]
+                    lastFrame = time.monotonic()
+                    for record in records:
+                        yield record
+                elif idle is not None and time.monotonic() - lastFrame > idle:
+                    return
+                else:
+                    time.sleep(interval)
+
+    # convert to the JSON format written by the consolidator, one frame at a time
+    def to_json(self, path):
+        fileData = dict(self.metadata)
+        fileData.pop("pressureData", None)
+        hasMatTimes = 'matTimes' in self.dtype.names
+        with open(path, 'w') as file:
+            file.write(json.dumps(fileData)[:-1] + (', ' if fileData else '') + '"pressureData": [')
+            for i, record in enumerate(self.records):
+                entry = {
+                    "dateTime": self.isoformat(record['time']),
+                    "pressureMatrix": self.frame(i).astype(np.double).tolist()
+                }
+                if hasMatTimes:
+                    entry["matDateTimes"] = [self.isoformat(t) if t else None for t in record['matTimes']]
+                if i:
+                    file.write(', ')
+                file.write(json.dumps(entry))
+            file.write(']}')
+
+    # write the recording to path as a dense or sparse recording
+    def convert(self, path, sparse=False):
+        numMatTimes = self.numMatTimes
+        with MatFileWriter(path, self.rows, self.cols, self.metadata, numMatTimes, source=self.source,
+                utcOffset=self.utcOffset, sparse=sparse) as writer:
+            for i, record in enumerate(self.records):
+                matTimes = None
+                if numMatTimes:
+                    matTimes = [t / 1e6 if t else None for t in record['matTimes']]
+                writer.append(self.frame(i), record['time'] / 1e6, matTimes)
+        return MatFile(path)
+
+# import a JSON file written by the consolidator (source 1) or the Sensing Mat software (source 2)
+def from_json(jsonPath, path, jsonSource=1, sparse=False):
+    with open(jsonPath, 'r') as file:
+        fileData = json.load(file)
+    pressureData = fileData.pop("pressureData")
+    if len(pressureData) == 0:
+        raise ValueError("%s does not contain any pressure data" % jsonPath)
+    rows, cols = np.shape(pressureData[0]["pressureMatrix"])
+    numMatTimes = len(pressureData[0].get("matDateTimes", []))
+    utcOffset = parseTimestamp(pressureData[0]["dateTime"]).utcoffset()
+    utcOffset = localUtcOffset() if utcOffset is None else int(utcOffset.total_seconds())
+    with MatFileWriter(path, rows, cols, fileData, numMatTimes, source=jsonSource, utcOffset=utcOffset, sparse=sparse) as writer:
+        for entry in pressureData:
+            arr = np.rint(np.array(entry["pressureMatrix"], dtype=np.double))
+            if arr.min() < 0 or arr.max() > 65535:
+                raise ValueError("pressure values of %s do not fit in 16 bits" % jsonPath)
+            matTimes = None
+            if numMatTimes:
+                matTimes = [parseTimestamp(t).timestamp() if t else None for t in entry["matDateTimes"]]
+            writer.append(arr, parseTimestamp(entry["dateTime"]).timestamp(), matTimes)
+    return MatFile(path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage="python matfile.py INPUT [OUTPUT] [--source 1|2] [--sparse]")
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--source", type=int, choices=[1, 2], default=1,
+        help="1 - Consolidator Script, 2 - Sensing Mat Software (JSON input only)")
+    parser.add_argument("--sparse", action="store_true", help="only store the points with pressure of every frame")
+    args = parser.parse_args()
+    if(os.path.exists(args.input) == False):
+        print("File does not exist.")
+        sys.exit("Exited")
+    if args.input.lower().endswith(".json"):
+        output = args.output or os.path.splitext(args.input)[0] + ".smat"
+        from_json(args.input, output, args.source, args.sparse)
+    elif args.output and args.output.lower().endswith(".smat"):
+        output = args.output
+        MatFile(args.input).convert(output, args.sparse)
+    else:
+        output = args.output or os.path.splitext(args.input)[0] + ".json"
+        MatFile(args.input).to_json(output)
+    print("File saved at PATH:", output)
@@ -3,12 +3,16 @@ import os
 import sys
 import json
 import math
+import time
 import numpy as np
 import scipy as sp
 import scipy.ndimage
 import matplotlib.pyplot as plt
+import chunks
+import segmenter
+from cache import AnalysisCache
 from datetime import datetime
-from tkinter import filedialog as fd
+from matfile import MatFile, SparseFrames
 from matplotlib.colors import LinearSegmentedColormap
 
 def get_custom_color_palette():
@@ -20,79 +24,253 @@ def get_custom_color_palette():
     ])
 
 def get_filedata(filename, jsonSource):
+    if filename.lower().endswith('.smat'):
+        return get_matfiledata(filename)
     with open(filename,'r+') as file:
         file_data = json.load(file)
     dict = file_data["pressureData"]
-    inTime = datetime.strptime(correct_time(dict[0]["dateTime"]), '%Y-%m-%dT%H:%M:%S.%f').timestamp()
-    pressureMatrices, timeData, timestamps = [], [], []
+    if(len(dict)==0):
+        raise ValueError("%s has no pressure data" % filename)
+    # the frames are written into a single (frames, rows, cols) array, as uint16 unless a value does
+    # not fit, instead of stacking a list of frames which needs twice the memory
+    pressureMatrices = None
     for x in range(len(dict)):
         data = dict[x]["pressureMatrix"]
-        arr = np.array(data, dtype=np.double)
+        arr = np.array(data)
         if jsonSource==1:
             arr = np.rot90(arr)
         elif jsonSource==2:
             arr = np.flip(arr, axis=0)
         arr[arr<300] = 0
-        pressureMatrices.append(arr)
-        currTime = correct_time(dict[x]["dateTime"])
-        timeData.append(datetime.strptime(currTime, '%Y-%m-%dT%H:%M:%S.%f').timestamp() - inTime)
-        timestamps.append(datetime.strptime(currTime, '%Y-%m-%dT%H:%M:%S.%f').strftime('%d %b %Y %H:%M:%S.%f'))
-    pressureMatrices = np.dstack(pressureMatrices)
-    timeData = np.asarray(timeData)
-    timestamps = np.asarray(timestamps)
-    return pressureMatrices, timeData, timestamps
-
-def correct_slices(pressureMatrices, dataSlices):
+        if pressureMatrices is None:
+            pressureMatrices = np.empty((len(dict),) + arr.shape, dtype=np.uint16)
+        if pressureMatrices.dtype == np.uint16 and not fits_uint16(arr):
+            pressureMatrices = pressureMatrices.astype(np.double)
+        pressureMatrices[x] = arr
+    times = parse_times([entry["dateTime"] for entry in dict])
+    return np.moveaxis(pressureMatrices, 0, -1), relative_time(times), Timestamps(times)
+
+# pressure which can be kept as uint16 without changing it, the values below the threshold are already 0
+def fits_uint16(arr):
+    return arr.size == 0 or (arr.max() < 2**16 and (arr.dtype.kind in 'biu' or np.array_equal(arr, np.round(arr))))
+
+# local time of the frames of a recording, like the timestamps in the JSON files
+def matfile_times(recording):
+    return (recording.records['time'] + recording.utcOffset * 10**6).astype('datetime64[us]')
+
+# Dense recordings give a (rows, cols, frames) array like the JSON files, sparse recordings give
+# SparseFrames which are never made dense as a whole
+def get_matfiledata(filename):
+    recording = MatFile(filename)
+    times = matfile_times(recording)
+    if recording.sparse:
+        frames = recording.points.orient(recording.source).threshold(300)
+        return frames, relative_time(times), Timestamps(times)
+    # the orientation is stored in the recording and applied as a view
+    frames = recording.oriented
+    # thresholding makes the only copy of the data, which stays as uint16
+    frames = np.where(frames < 300, np.uint16(0), frames)
+    return np.moveaxis(frames, 0, -1), relative_time(times), Timestamps(times)
+
+# numbers from 0 up to each of the lengths, one after another
+def ragged_arange(lengths):
+    return np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+# bounding boxes (row start, row stop, col start, col stop) of the regions
+def region_boxes(dataSlices):
+    return np.array([[x.start, x.stop, y.start, y.stop] for x, y, z in dataSlices], dtype=np.intp).reshape(-1, 4)
+
+# pressure inside each box in the given frame, in one fancy indexing operation for all the boxes,
+# returns the pixels of every box in row major order one box after another and the area of each box
+def gather_boxes(pressureMatrices, boxes, frames):
+    heights = boxes[:, 1] - boxes[:, 0]
+    line = np.repeat(np.arange(len(boxes)), heights)
+    # whole rows are copied and the columns of the box are selected with a mask
+    lines = pressureMatrices[frames[line], boxes[line, 0] + ragged_arange(heights)]
+    cols = np.arange(lines.shape[1])
+    inside = ((cols >= boxes[:, 2, np.newaxis]) & (cols < boxes[:, 3, np.newaxis]))[line]
+    return lines[inside], heights * (boxes[:, 3] - boxes[:, 2])
+
+# number of pixels with pressure in each box of gather_boxes()
+def count_pressed(values, area):
+    if len(values) == 0:
+        return np.zeros(len(area), dtype=np.intp)
+    return np.add.reduceat(values != 0, np.cumsum(area) - area)
+
+# point of highest pressure in each box of gather_boxes(), ties go to the first pixel like np.argmax
+def box_heels(values, area, boxes):
+    offsets = np.cumsum(area) - area
+    box = np.repeat(np.arange(len(area)), area)
+    highest = np.flatnonzero(values == np.maximum.reduceat(values, offsets)[box]) if len(values) else np.zeros(0, dtype=np.intp)
+    heel = highest[np.searchsorted(box[highest], np.arange(len(area)))] - offsets
+    widths = boxes[:, 3] - boxes[:, 2]
+    rows = boxes[:, 0] + heel // widths
+    cols = boxes[:, 2] + heel % widths
+    return [[row, col] for row, col in zip(rows.tolist(), cols.tolist())]
+
+# pressure of the box of each footprint in each of its frames, in the order (footprint, frame, pixel)
+# footprint and frames give the footprint and frame of every box, sparse recordings are gathered
+# one footprint at a time
+def gather_footprints(pressureMatrices, boxes, footprint, frames, dataSlices):
+    if not isinstance(pressureMatrices, SparseFrames):
+        values, area = gather_boxes(pressureMatrices, boxes[footprint], frames)
+        return values
+    blocks = []
+    for x, y, z in dataSlices:
+        sub = pressureMatrices[z]
+        keep = (sub.rows >= x.start) & (sub.rows < x.stop) & (sub.cols >= y.start) & (sub.cols < y.stop)
+        block = np.zeros((z.stop - z.start, x.stop - x.start, y.stop - y.start), dtype=sub.values.dtype)
+        block[sub.frame_index()[keep], sub.rows[keep] - x.start, sub.cols[keep] - y.start] = sub.values[keep]
+        blocks.append(block.ravel())
+    return np.concatenate(blocks) if blocks else np.zeros(0)
+
+# First and last frame with pressure of every footprint, found for all the footprints at once.
+# The frames of all the regions are checked together one step at a time, from the start forwards
+# and from the frame after the end backwards, so the number of numpy operations depends on the
+# number of empty frames at the edges of the footprints and not on the number of footprints.
+# The heel of each footprint is found from the first frame with pressure while it is checked.
+class ActivityIndex:
+    def __init__(self, pressureMatrices, dataSlices):
+        boxes = region_boxes(dataSlices)
+        self.starts = np.array([z.start for x, y, z in dataSlices], dtype=np.intp)
+        self.stops = np.array([z.stop for x, y, z in dataSlices], dtype=np.intp)
+        self.heels = {}
+        pending = np.arange(len(boxes))
+        frames = self.starts.copy()
+        while len(pending):
+            values, area = gather_boxes(pressureMatrices, boxes[pending], frames[pending])
+            pressed = count_pressed(values, area) > 0
+            found = pending[pressed]
+            self.starts[found] = frames[found]
+            if len(found):
+                # keep only the pixels of the boxes with pressure
+                keep = np.repeat(pressed, area)
+                self.add_heels(dataSlices, found, box_heels(values[keep], area[pressed], boxes[found]))
+            pending = pending[~pressed]
+            frames[pending] += 1
+            pending = pending[frames[pending] < self.stops[pending]]
+        # like np.argmax, footprints without pressure have their heel at the corner of the box
+        empty = [ind for ind in range(len(boxes)) if self.key(dataSlices[ind], self.starts[ind]) not in self.heels]
+        self.add_heels(dataSlices, empty, boxes[empty, 0::2].tolist())
+        # the original scans also checked the frame after the end, which may not exist
+        pending = np.arange(len(boxes))
+        frames = np.minimum(self.stops, len(pressureMatrices) - 1)
+        pending = pending[frames > self.starts]
+        while len(pending):
+            values, area = gather_boxes(pressureMatrices, boxes[pending], frames[pending])
+            pressed = count_pressed(values, area) > 0
+            found = pending[pressed]
+            self.stops[found] = frames[found] + 1
+            pending = pending[~pressed]
+            frames[pending] -= 1
+            pending = pending[frames[pending] > self.starts[pending]]
+
+    # heels are looked up by bounding box and first frame
+    def key(self, dataSlice, start):
+        x, y, z = dataSlice
+        return (x.start, x.stop, y.start, y.stop, int(start))
+
+    def add_heels(self, dataSlices, regions, heels):
+        for ind, heel in zip(regions, heels):
+            self.heels[self.key(dataSlices[ind], self.starts[ind])] = heel
+
+def correct_slices(pressureMatrices, dataSlices, index=None):
+    if index is None:
+        index = ActivityIndex(pressureMatrices, dataSlices)
     for ind in range(len(dataSlices)):
         x, y, z = dataSlices[ind]
-        start = z.start
-        end = z.stop
-        for i in range (start, end):
-            curr = pressureMatrices[i]
-            curr = curr[x, y]
-            if(np.any(curr)):
-                start = i
-                break
-        for i in range(end, start, -1):
-            curr = pressureMatrices[i]
-            curr = curr[x, y]
-            if(np.any(curr)):
-                end = i+1
-                break
-        z = slice(start, end, None)
-        dataSlices[ind] = list(dataSlices[ind])
-        dataSlices[ind][2] = z
-        dataSlices[ind] = tuple(dataSlices[ind])
+        dataSlices[ind] = (x, y, slice(int(index.starts[ind]), int(index.stops[ind]), None))
     return dataSlices
 
-def get_gait(timeData, dataSlices, timestamps):
-    ax = plt.gca()
-    print('\n', "-" * 137, sep='')
-    print("| Start\t\t| End \t\t| Duration \t| Phase \t| Foot  |\t\t\t Timestamp \t\t\t\t|")
-    print("-" * 137)
-    swings = []
-    stances = []
+# rows of the mat gathered at once by footprint_loads()
+GATHER_ROWS = 2**16
+
+# total pressure in the box of every footprint in each of its frames, one footprint after another,
+# with the frame and the footprint of every value
+def footprint_loads(pressureMatrices, dataSlices):
+    boxes = region_boxes(dataSlices)
+    starts = np.array([z.start for x, y, z in dataSlices], dtype=np.intp)
+    durations = np.array([z.stop - z.start for x, y, z in dataSlices], dtype=np.intp)
+    footprint = np.repeat(np.arange(len(boxes)), durations)
+    frames = starts[footprint] + ragged_arange(durations)
+    area = ((boxes[:, 1] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 2]))[footprint]
+    loads = np.zeros(len(frames))
+    # the footprints are gathered in groups of about GATHER_ROWS rows of the mat, so the memory
+    # used does not grow with the length of the recording
+    rows = (boxes[:, 1] - boxes[:, 0]) * durations
+    groups = np.flatnonzero(np.diff((np.cumsum(rows) - rows) // GATHER_ROWS, prepend=-1))
+    bounds = np.concatenate((groups, [len(boxes)]))
+    frameptr = np.concatenate(([0], np.cumsum(durations)))
+    for first, last in zip(bounds[:-1], bounds[1:]):
+        part = slice(frameptr[first], frameptr[last])
+        values = gather_footprints(pressureMatrices, boxes, footprint[part], frames[part], dataSlices[first:last])
+        if len(values):
+            loads[part] = np.add.reduceat(values.astype(np.double), np.cumsum(area[part]) - area[part])
+    return loads, frames, footprint
+
+# time at which the line from (t0, l0) to (t1, l1) reaches level, t1 when the load does not change
+def crossing(t0, l0, t1, l1, level):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(l1 > l0, (level - l0) / (l1 - l0), 1.0)
+    return t0 + np.clip(weight, 0, 1) * (t1 - t0)
+
+# Time at which each foot touches and leaves the mat, between the frames. The load of a footprint
+# is interpolated linearly between the frames and the contact lasts while it is above fraction of
+# its highest value. The frames before and after a footprint have no load in its box.
+def contact_times(pressureMatrices, timeData, dataSlices, fraction=0.05):
+    timeData = np.asarray(timeData, dtype=np.double)
+    if(len(dataSlices)==0):
+        return np.zeros(0), np.zeros(0)
+    loads, frames, footprint = footprint_loads(pressureMatrices, dataSlices)
+    regions = np.arange(len(dataSlices))
+    firsts = np.searchsorted(footprint, regions)
+    lasts = np.searchsorted(footprint, regions, side='right') - 1
+    level = fraction * np.maximum.reduceat(loads, firsts)
+    above = np.flatnonzero(loads >= level[footprint])
+    first = above[np.searchsorted(footprint[above], regions)]
+    last = above[np.searchsorted(footprint[above], regions, side='right') - 1]
+    # the first frame of the recording has no frame before it, nor the last one a frame after it
+    before = np.where(first > firsts, loads[first - 1], 0.0)
+    onsets = crossing(timeData[np.maximum(frames[first] - 1, 0)], before, timeData[frames[first]], loads[first], level)
+    after = np.where(last < lasts, loads[np.minimum(last + 1, len(loads) - 1)], 0.0)
+    offsets = crossing(timeData[np.minimum(frames[last] + 1, len(timeData) - 1)], after, timeData[frames[last]], loads[last], level)
+    return onsets, offsets
+
+# Regions on a uniform timeline of rate frames per second going from the contact of each foot to
+# the time it leaves the mat. Returns the time of every frame of the timeline, which goes on
+# until duration, and the regions with their frames on it.
+def uniform_slices(onsets, offsets, dataSlices, rate, duration):
+    starts = np.round(np.asarray(onsets) * rate).astype(np.intp)
+    stops = np.maximum(np.round(np.asarray(offsets) * rate).astype(np.intp) + 1, starts + 1)
+    # a frame after the end of the last footprint, like the frames of a recording
+    numFrames = max(int(round(duration * rate)) + 1, int(stops.max(initial=0)) + 1)
+    slices = [(x, y, slice(int(start), int(stop), None)) for (x, y, z), start, stop in zip(dataSlices, starts, stops)]
+    return np.arange(numFrames) / rate, slices
+
+# Timing of the footprints resampled on a uniform timeline of rate frames per second, so that the
+# stance and swing times do not depend on when the frames were read. Returns the time of every
+# frame of the timeline, the regions with their frames on it and the timestamps of those frames.
+def resample_time(pressureMatrices, timeData, dataSlices, timestamps, rate=100, fraction=0.05):
+    onsets, offsets = contact_times(pressureMatrices, timeData, dataSlices, fraction)
+    grid, slices = uniform_slices(onsets, offsets, dataSlices, rate, timeData[-1])
+    times = timestamps.times[0] + np.round(grid * 1e6).astype('timedelta64[us]')
+    return grid, slices, Timestamps(times)
+
+# bars of the stance phase of each foot
+def draw_gait(ax, timeData, dataSlices):
     for i, dat_slice in enumerate(dataSlices):
         dx, dy, dt = dat_slice
-        foot = i%2 + 1
-        if(i!=0 and i!=1):
-            phase = "Swing"
-            swingStart = dataSlices[i-2][2]
-            dur = timeData[dt].min() - timeData[swingStart].max()
-            print('|', '%.8f'%timeData[swingStart].max(), "\t|", '%.8f'%timeData[dt].min(), "\t|", '%.8f'%dur, "\t|", phase, "\t|", foot, end='')
-            print("\t|", timestamps[swingStart.stop], " - ", timestamps[dt.start], "\t|")
-            swings.append(dur)
-        phase = "Stance"
-        ax.barh(y=foot, width=timeData[dt].ptp(), height=0.2, left=timeData[dt].min(), align='center', color='red')
-        print('|', '%.8f'%timeData[dt].min(), "\t|", '%.8f'%timeData[dt].max(), "\t|", '%.8f'%timeData[dt].ptp(), "\t|", phase, "\t|", foot, end='')
-        print("\t|", timestamps[dt.start], " - ", timestamps[dt.stop], "\t|")
-        stances.append(timeData[dt].ptp())
-    print("-" * 137)
+        ax.barh(y=i%2 + 1, width=np.ptp(timeData[dt]), height=0.2, left=timeData[dt].min(), align='center', color='red')
     ax.set_yticks(range(1, 3))
     ax.set_yticklabels(['Foot 1', 'Foot 2'])
     ax.set_xlabel('Time')
     ax.yaxis.grid(True)
     ax.set_title('Gait Cycle')
+
+# average stance, swing and percentage of stance of each foot, None if there are not enough cycles
+def gait_metrics(timeData, dataSlices):
+    stances = [np.ptp(timeData[dt]) for dx, dy, dt in dataSlices]
+    swings = [timeData[dataSlices[i][2]].min() - timeData[dataSlices[i-2][2]].max() for i in range(2, len(dataSlices))]
     cycles = min(len(stances), len(swings))
     percentages = [0, 0]
     avgStance = [0, 0]
@@ -108,9 +286,7 @@ def get_gait(timeData, dataSlices, timestamps):
         n1 = (cycles+1)/2
         n2 = n1-1
     if(n1==0 or n2==0):
-        print("Gait Metrics Cannot be Calculated for this Data")
-        return
-    print("\n\t\t Cycles \t Avg. Stance Phase \t\t Avg. Swing Phase \t\t Percentage Comparison")
+        return None
     avgStance[0] /= n1
     avgSwing[0] /= n1
     percentages[0] /= n1
@@ -118,48 +294,104 @@ def get_gait(timeData, dataSlices, timestamps):
     avgSwing[1] /= n2
     percentages[1] /= n2
     footCycles = [n1, n2]
+    return [footCycles, avgStance, avgSwing, percentages]
+
+def get_gait(timeData, dataSlices, timestamps):
+    draw_gait(plt.gca(), timeData, dataSlices)
+    print('\n', "-" * 137, sep='')
+    print("| Start\t\t| End \t\t| Duration \t| Phase \t| Foot  |\t\t\t Timestamp \t\t\t\t|")
+    print("-" * 137)
+    for i, dat_slice in enumerate(dataSlices):
+        dx, dy, dt = dat_slice
+        foot = i%2 + 1
+        if(i!=0 and i!=1):
+            phase = "Swing"
+            swingStart = dataSlices[i-2][2]
+            dur = timeData[dt].min() - timeData[swingStart].max()
+            print('|', '%.8f'%timeData[swingStart].max(), "\t|", '%.8f'%timeData[dt].min(), "\t|", '%.8f'%dur, "\t|", phase, "\t|", foot, end='')
+            print("\t|", timestamps[swingStart.stop], " - ", timestamps[dt.start], "\t|")
+        phase = "Stance"
+        print('|', '%.8f'%timeData[dt].min(), "\t|", '%.8f'%timeData[dt].max(), "\t|", '%.8f'%np.ptp(timeData[dt]), "\t|", phase, "\t|", foot, end='')
+        print("\t|", timestamps[dt.start], " - ", timestamps[dt.stop], "\t|")
+    print("-" * 137)
+    gait = gait_metrics(timeData, dataSlices)
+    if(gait is None):
+        print("Gait Metrics Cannot be Calculated for this Data")
+        return
+    footCycles, avgStance, avgSwing, percentages = gait
+    n1, n2 = footCycles
+    print("\n\t\t Cycles \t Avg. Stance Phase \t\t Avg. Swing Phase \t\t Percentage Comparison")
     print("foot 1\t\t", int(n1), "\t\t", avgStance[0], "\t\t", avgSwing[0], "\t\t", '%.2f'%percentages[0], "|", '%.2f'%(100-percentages[0]))
     print("foot 2\t\t", int(n2), "\t\t", avgStance[1], "\t\t", avgSwing[1], "\t\t", '%.2f'%percentages[1], "|", '%.2f'%(100-percentages[1]))
     plt.show()
-    return [footCycles, avgStance, avgSwing, percentages]
+    return gait
 
-def correct_time(timestamp):
-    size = len(timestamp)
-    size -= 6
-    timestamp = timestamp[:size]
-    while(size<26):
-        timestamp += '0'
-        size += 1
-    size = 26
-    timestamp = timestamp[:size]
-    return timestamp
-
-def find_heels(pressureMatrices, dataSlices):
-    stepCount = len(dataSlices)
-    indices = []
-    for i in range(stepCount):
-        curr = pressureMatrices[dataSlices[i][2].start]
-        curr = curr[dataSlices[i][0], dataSlices[i][1]]
-        max = np.unravel_index(np.argmax(curr), curr.shape)
-        max = list(max)
-        max[0] = max[0] + dataSlices[i][0].start
-        max[1] = max[1] + dataSlices[i][1].start
-        indices.append(max)
-    return indices
+# Parse iso format timestamps into datetime64 values of their local time
+def parse_times(dateTimes):
+    # remove the utc offset, numpy reads any number of digits for the fraction of a second
+    local = [t[:-6] if t[-6:-5] in ('+', '-') else t.rstrip('Z') for t in dateTimes]
+    return np.array(local, dtype='datetime64[us]')
+
+# seconds elapsed since the first frame
+def relative_time(times):
+    return (times - times[0]) / np.timedelta64(1, 's')
+
+# Timestamps to display, formatted only for the frames which are printed
+class Timestamps:
+    def __init__(self, times):
+        self.times = times
+
+    def __len__(self):
+        return len(self.times)
+
+    def __getitem__(self, index):
+        return self.times[index].astype(datetime).strftime('%d %b %Y %H:%M:%S.%f')
+
+# point of highest pressure in the first frame of each region
+def find_heels(pressureMatrices, dataSlices, index=None):
+    if isinstance(pressureMatrices, SparseFrames):
+        return sparse_heels(pressureMatrices, dataSlices)
+    heels = {} if index is None else index.heels
+    keys = [(x.start, x.stop, y.start, y.stop, z.start) for x, y, z in dataSlices]
+    # regions which are not in the index are looked up all at once
+    missing = [ind for ind in range(len(keys)) if keys[ind] not in heels]
+    if len(missing):
+        boxes = region_boxes([dataSlices[ind] for ind in missing])
+        frames = np.array([keys[ind][4] for ind in missing], dtype=np.intp)
+        values, area = gather_boxes(pressureMatrices, boxes, frames)
+        heels = dict(heels)
+        heels.update(zip([keys[ind] for ind in missing], box_heels(values, area, boxes)))
+    return [heels[key] for key in keys]
+
+# find_heels() for SparseFrames, only the first frame of each region is cropped
+def sparse_heels(frames, dataSlices):
+    heels = []
+    for x, y, z in dataSlices:
+        roi = frames.crop(z.start, x, y)
+        heel = np.unravel_index(np.argmax(roi), roi.shape)
+        heels.append([int(heel[0]) + x.start, int(heel[1]) + y.start])
+    return heels
+
+# Footprints of SparseFrames, the same as find_foot() sorted by start frame followed by
+# correct_slices(). The streaming segmenter makes one frame dense at a time.
+def find_foot_sparse(frames, smoothRadius=5, threshold=0.0001):
+    return segmenter.segment(frames, smoothRadius, threshold)
 
 def find_foot(data, smoothRadius=5, threshold=0.0001):
-    data = sp.ndimage.uniform_filter(data, smoothRadius)
+    data = sp.ndimage.uniform_filter(data, smoothRadius, output=np.double)
     thresh = data > threshold
     filled = sp.ndimage.binary_fill_holes(thresh)
     codedFoot, numFoot = sp.ndimage.label(filled)
     dataSlices = sp.ndimage.find_objects(codedFoot)
     return dataSlices
 
-def get_stride(pressureMatrices, timeData, dataSlices):
-    points = find_heels(pressureMatrices, dataSlices)
+# Average stride length and velocity of each foot, None if there are less than 4 footprints. The
+# heels can be given when dataSlices are on a resampled timeline instead of the recorded frames.
+def stride_metrics(pressureMatrices, timeData, dataSlices, index=None, points=None):
+    if points is None:
+        points = find_heels(pressureMatrices, dataSlices, index)
     if(len(points)<4):
-        print("Stride Metrics Cannot be Calculated for this Data")
-        return
+        return None
     step = [0, 0]
     vel = [0, 0]
     currStep = [points[0], points[1]]
@@ -182,17 +414,28 @@ def get_stride(pressureMatrices, timeData, dataSlices):
     step[1] /= (n2-1)
     vel[0] /= (n1-1)  
     vel[1] /= (n2-1)
+    return [step, vel]
+
+def get_stride(pressureMatrices, timeData, dataSlices, index=None, points=None):
+    stride = stride_metrics(pressureMatrices, timeData, dataSlices, index, points)
+    if(stride is None):
+        print("Stride Metrics Cannot be Calculated for this Data")
+        return
+    step, vel = stride
     print("Avg. Stride Length of Foot1: ", step[0], "cm", end = '')
     print("\tAvg. Stride Velocity of Foot1: ", vel[0], "cm/s")
     print("Avg. Stride Length of Foot2: ", step[1], "cm", end = '')
     print("\tAvg. Stride Velocity of Foot2: ", vel[1], "cm/s")
-    return [step, vel]
+    return stride
 
-def plot_path(pressureMatrices, indices):
-    ax = plt.gca()
+# total pressure of the frames with the path of the heels on top
+def draw_path(ax, pressureMatrices, indices):
     cmap = get_custom_color_palette()
-    pressureMatrices = np.rollaxis(pressureMatrices, 0, 3)
-    ax.imshow(pressureMatrices.sum(axis=2), cmap=cmap, interpolation='quadric')
+    if isinstance(pressureMatrices, SparseFrames):
+        total = pressureMatrices.total()
+    else:
+        total = np.rollaxis(pressureMatrices, 0, 3).sum(axis=2)
+    ax.imshow(total, cmap=cmap, interpolation='quadric')
     x, y = [], []
     for i in range(len(indices)):
         x0 = indices[i][1]
@@ -202,16 +445,26 @@ def plot_path(pressureMatrices, indices):
     ax.plot(x, y, '-wo')
     ax.axis('image')
     ax.set_title('Steps')
+
+def plot_path(pressureMatrices, indices):
+    draw_path(plt.gca(), pressureMatrices, indices)
     plt.show()
 
-def get_cadence(timeData, dataSlices):
-    timeElapsed = (timeData[dataSlices[-1][2].stop] - timeData[dataSlices[0][2].start]) / 60
+# footprints per minute
+def cadence_metrics(timeData, dataSlices):
+    # the last footprint may end with the recording
+    timeElapsed = (timeData[min(dataSlices[-1][2].stop, len(timeData)-1)] - timeData[dataSlices[0][2].start]) / 60
     stepCount = len(dataSlices)
-    cadence = stepCount / timeElapsed
+    return stepCount / timeElapsed
+
+def get_cadence(timeData, dataSlices):
+    cadence = cadence_metrics(timeData, dataSlices)
     print("\nCadence: ", cadence)
     return cadence
 
 def get_filename():
+    # imported here so that the functions can be used on machines without Tk
+    from tkinter import filedialog as fd
     filename = fd.askopenfilename()
     name = os.path.basename(filename)
     # Check if path is valid
@@ -220,124 +473,254 @@ def get_filename():
         sys.exit("Exited")
     return filename
 
-def multi_runs(pressureData, normalisedTimeData, timestamp, footRegions):
-    footRegionRuns = []
-    i=0
+# Split the frames into runs (walking onto the mat and off it again) where there is no pressure
+# on the mat for more than gap seconds. Returns the [start, stop] frames of each run and the
+# indices of the regions starting in each run, runs without any region are left out.
+def find_runs(pressureMatrices, timeData, dataSlices, gap=0.5):
+    if isinstance(pressureMatrices, SparseFrames):
+        occupied = pressureMatrices.counts() > 0
+    else:
+        occupied = np.any(pressureMatrices, axis=(1, 2))
+    edges = np.diff(occupied.astype(np.int8), prepend=0, append=0)
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)
+    if(len(starts)==0):
+        return [], []
+    # time from the last frame with pressure to the next one
+    split = timeData[starts[1:]] - timeData[stops[:-1] - 1] > gap
+    starts = starts[np.concatenate(([True], split))]
+    stops = stops[np.concatenate((split, [True]))]
+    run = np.searchsorted(starts, [z.start for x, y, z in dataSlices], side='right') - 1
+    order = np.argsort(run, kind='stable')
+    bounds = np.searchsorted(run[order], np.arange(len(starts) + 1))
+    runs = []
     runRegions = []
-    for region in footRegions:
-        x, y, z = region
-        if(z.start >= runs[i][0] and z.stop <= runs[i][1]):
-            runRegions.append(region)
+    for i in range(len(starts)):
+        if(bounds[i] < bounds[i+1]):
+            runs.append([int(starts[i]), int(stops[i])])
+            runRegions.append(order[bounds[i]:bounds[i+1]].tolist())
+    return runs, runRegions
+
+# Decide if foot 1 of a run is the left or the right foot from the side of the direction of walking
+# its heels are on, looking at the mat from above the way draw_path() shows it. Every heel with a
+# footprint before and after it is compared with the line joining those two heels of the other
+# foot, so the run does not have to be straight. Returns 'l' or 'r' and a confidence from 0 to 1:
+# how much the heels agree, lowered when they are less than minWidth cells from the lines.
+def classify_feet(indices, minWidth=2):
+    points = np.asarray(indices, dtype=np.double)
+    if(len(points)<3):
+        return 'l', 0.0
+    before, heel, after = points[:-2], points[1:-1], points[2:]
+    direction = after - before
+    length = np.hypot(direction[:, 0], direction[:, 1])
+    # distance of each heel from the line, positive on the left (rows go down on the plot)
+    side = ((heel[:, 1] - before[:, 1]) * direction[:, 0] - (heel[:, 0] - before[:, 0]) * direction[:, 1]) / np.maximum(length, 1e-9)
+    # heels 1, 3, ... are foot 2
+    side[np.arange(len(side)) % 2 == 0] *= -1
+    width = np.abs(side).sum()
+    if(width == 0):
+        return 'l', 0.0
+    agreement = abs(side.sum()) / width
+    confidence = agreement * min(1.0, width / len(side) / minWidth)
+    return ('l' if side.sum() > 0 else 'r'), float(confidence)
+
+# heels of footprints found before, used by find_heels() in place of an ActivityIndex
+class HeelIndex:
+    def __init__(self, dataSlices, heels):
+        self.heels = {(x.start, x.stop, y.start, y.stop, z.start): heel for (x, y, z), heel in zip(dataSlices, heels)}
+
+def slices_to_list(dataSlices):
+    return [[[s.start, s.stop] for s in dataSlice] for dataSlice in dataSlices]
+
+def list_to_slices(values):
+    return [tuple(slice(start, stop, None) for start, stop in dataSlice) for dataSlice in values]
+
+# Pressure data with the frames along the first axis, time of each frame, timestamps, regions of
+# the foot, an index of their heels for find_heels() and the runs, the same steps as the main code
+# before the metrics. With a cache (see cache.py) the frames of dense recordings, the regions,
+# heels and runs are read back when the file has been analysed before with the same parameters.
+# With chunkFrames the footprints are found chunkFrames frames at a time (see chunks.py) and the
+# frames of dense recordings are thresholded into the cache a chunk at a time, so recordings larger
+# than the memory can be analysed. The time taken by each step is added to timings.
+def analyse_recording(filename, jsonSource, gap=0.5, cache=None, timings=None, smoothRadius=5, threshold=0.0001, chunkFrames=None):
+    timings = {} if timings is None else timings
+    params = {"jsonSource": 0 if filename.lower().endswith('.smat') else jsonSource, "pressureThreshold": 300}
+    startTime = time.perf_counter()
+    key = cache.key(filename, **params) if cache is not None else None
+    frames = cache.load(key, "frames") if key else None
+    times = cache.load(key, "times") if key else None
+    recording = MatFile(filename) if chunkFrames and frames is None and params["jsonSource"] == 0 else None
+    if frames is not None and times is not None:
+        pressureData, timeData, timestamps = frames, relative_time(times), Timestamps(times)
+    elif recording is not None and not recording.sparse:
+        # the frames are thresholded a chunk at a time into the cache, or a temporary file without it
+        frames = recording.oriented
+        times = matfile_times(recording)
+        if key:
+            pressureData = cache.store_chunks(key, "frames", frames.shape, np.uint16, chunks.threshold_chunks(frames, chunkFrames))
+            times = cache.store(key, "times", times)
+        else:
+            pressureData = chunks.threshold_to_disk(frames, chunkFrames)
+        timeData, timestamps = relative_time(times), Timestamps(times)
+    else:
+        pressureData, timeData, timestamps = get_filedata(filename, jsonSource)
+        if not isinstance(pressureData, SparseFrames):
+            pressureData = np.rollaxis(pressureData, -1)
+            if key:
+                cache.store(key, "frames", pressureData)
+                cache.store(key, "times", timestamps.times)
+    timings["load"] = time.perf_counter() - startTime
+
+    startTime = time.perf_counter()
+    params.update(smoothRadius=smoothRadius, threshold=threshold)
+    key = cache.key(filename, **params) if cache is not None else None
+    regions = cache.load(key, "footprints") if key else None
+    heels = cache.load(key, "heels") if key else None
+    if regions is not None and heels is not None:
+        footRegions = list_to_slices(regions)
+        activity = HeelIndex(footRegions, heels)
+        timings["findFoot"] = time.perf_counter() - startTime
+        timings["correctSlices"] = 0.0
+    else:
+        if isinstance(pressureData, SparseFrames):
+            # the streaming segmenter trims the footprints while it finds them
+            footRegions = find_foot_sparse(pressureData, smoothRadius, threshold)
+            activity = None
+            timings["findFoot"] = time.perf_counter() - startTime
+            timings["correctSlices"] = 0.0
         else:
-            i+=1
-            footRegionRuns.append(runRegions)
-            runRegions = []
-            runRegions.append(region)
-    footRegionRuns.append(runRegions)
+            if chunkFrames:
+                footRegions = chunks.find_foot_chunked(pressureData, chunkFrames, smoothRadius, threshold)
+            else:
+                footRegions = find_foot(np.moveaxis(pressureData, 0, -1), smoothRadius, threshold)
+                footRegions.sort(key=lambda data_slice: data_slice[2].start)
+            timings["findFoot"] = time.perf_counter() - startTime
+            startTime = time.perf_counter()
+            activity = ActivityIndex(pressureData, footRegions)
+            footRegions = correct_slices(pressureData, footRegions, activity)
+            timings["correctSlices"] = time.perf_counter() - startTime
+        if key:
+            cache.store(key, "footprints", slices_to_list(footRegions))
+            cache.store(key, "heels", [[int(v) for v in heel] for heel in find_heels(pressureData, footRegions, activity)])
+
+    params.update(gap=gap)
+    key = cache.key(filename, **params) if cache is not None else None
+    runs = cache.load(key, "runs") if key else None
+    if runs is not None:
+        runs, runRegions = runs
+    else:
+        runs, runRegions = find_runs(pressureData, timeData, footRegions, gap)
+        if key:
+            cache.store(key, "runs", [runs, runRegions])
+    return pressureData, timeData, timestamps, footRegions, activity, runs, runRegions
+
+# ask if foot 1 of a run is the left or the right foot
+def ask_foot_label():
+    footLabel = input("\nEnter if (foot 1) is left [l/L] or right [r/R]: ").lower()
+    while footLabel != 'l' and footLabel != 'r':
+        footLabel = input("Option Does Not Exist. Retry: ").lower()
+    return footLabel
+
+# swap the values of foot 1 and foot 2 of a run when foot 1 is the right foot
+def swap_feet(strideValues, gaitValues):
+    if(strideValues is not None):
+        strideValues[0][0], strideValues[0][1] = strideValues[0][1], strideValues[0][0]
+        strideValues[1][0], strideValues[1][1] = strideValues[1][1], strideValues[1][0]
+    if(gaitValues is not None):
+        for j in range(4):
+            gaitValues[j][0], gaitValues[j][1] = gaitValues[j][1], gaitValues[j][0]
+
+# Average of the metrics of the runs weighted by the duration of each run, the values of each run
+# have to be ordered left foot, right foot. Runs without stride or gait metrics are left out of them.
+def consolidate_runs(timeData, footRegionRuns, cadenceValues, strideValues, gaitValues):
+    times = [timeData[min(run[-1][2].stop, len(timeData)-1)] - timeData[run[0][2].start] for run in footRegionRuns]
+    cadence = sum(value*t for value, t in zip(cadenceValues, times)) / sum(times)
+    avgStride = None
+    strideRuns = [(value, t) for value, t in zip(strideValues, times) if value is not None]
+    if(len(strideRuns)):
+        n = sum(t for value, t in strideRuns)
+        avgStride = [[sum(value[k][foot]*t for value, t in strideRuns) / n for foot in range(2)] for k in range(2)]
+    avgGait = None
+    gaitRuns = [(value, t) for value, t in zip(gaitValues, times) if value is not None]
+    if(len(gaitRuns)):
+        n = sum(t for value, t in gaitRuns)
+        avgGait = [[sum(value[0][foot] for value, t in gaitRuns) for foot in range(2)]]
+        avgGait += [[sum(value[j][foot]*t for value, t in gaitRuns) / n for foot in range(2)] for j in range(1, 4)]
+    return [cadence, avgStride, avgGait]
+
+# Foot 1 of each run is classified from its heels, the user is only asked when the confidence is
+# below minConfidence (0 never asks). The timing is resampled at rate frames per second, or taken
+# from the recorded frames when rate is None.
+def multi_runs(pressureData, normalisedTimeData, timestamp, footRegions, runs, runRegions, index=None, minConfidence=0.8, rate=100):
+    timeData, timeRegions, timestamps = normalisedTimeData, footRegions, timestamp
+    if(rate):
+        timeData, timeRegions, timestamps = resample_time(pressureData, normalisedTimeData, footRegions, timestamp, rate)
+    footRegionRuns = [[footRegions[i] for i in regions] for regions in runRegions]
+    timeRegionRuns = [[timeRegions[i] for i in regions] for regions in runRegions]
     cadenceValues = []
     strideValues = []
     gaitValues = []
-    footLabel = []
-    cadence = 0
-    totalTime = 0
-    avgStride = [[0, 0], [0, 0]]
-    avgGait = [[0, 0], [0, 0], [0, 0], [0, 0]]
     for i in range(len(footRegionRuns)):
         print('\n\n', '-' * 10, '\n|', ' Run ', i+1, ' |\n', '-' * 10, sep='')
         pressureMatrix = pressureData[runs[i][0]:runs[i][1]]
-        cadenceValues.append(get_cadence(normalisedTimeData, footRegionRuns[i]))
-        strideValues.append(get_stride(pressureData, normalisedTimeData, footRegionRuns[i]))
-        gaitValues.append(get_gait(normalisedTimeData, footRegionRuns[i], timestamp))
-        indices = find_heels(pressureData, footRegionRuns[i])
+        indices = find_heels(pressureData, footRegionRuns[i], index)
+        cadenceValues.append(get_cadence(timeData, timeRegionRuns[i]))
+        strideValues.append(get_stride(pressureData, timeData, timeRegionRuns[i], index, indices))
+        gaitValues.append(get_gait(timeData, timeRegionRuns[i], timestamps))
         plot_path(pressureMatrix, indices)
-        footLabel.append(input("\nEnter if (foot 1) is left [l/L] or right [r/R]: "))
-        footLabel[i] = footLabel[i].lower()
-        while footLabel[i] != 'l' and footLabel[i] != 'r':
-            footLabel[i] = input("Option Does Not Exist. Retry: ")
-            footLabel[i] = footLabel[i].lower()
-        if(footLabel[i] == 'r'):
-            strideValues[i][0][0], strideValues[i][0][1] = strideValues[i][0][1], strideValues[i][0][0]
-            strideValues[i][1][0], strideValues[i][1][1] = strideValues[i][1][1], strideValues[i][1][0]
-            for j in range(4):
-                gaitValues[i][j][0], gaitValues[i][j][1] = gaitValues[i][j][1], gaitValues[i][j][0] 
-    for i in range(len(footRegionRuns)):
-        currRun = footRegionRuns[i]
-        x1, y1, z1 = currRun[0]
-        z1 = z1.start
-        x2, y2, z2 = currRun[-1]
-        z2 = z2.stop
-        t = normalisedTimeData[z2] - normalisedTimeData[z1]
-        totalTime += t
-        cadence += (cadenceValues[i]*t)
-        avgStride[0][0] += (strideValues[i][0][0]*t)
-        avgStride[0][1] += (strideValues[i][0][1]*t)
-        avgStride[1][0] += (strideValues[i][1][0]*t)
-        avgStride[1][1] += (strideValues[i][1][1]*t)
-        avgGait[0][0] += gaitValues[i][0][0]
-        avgGait[0][1] += gaitValues[i][0][1]
-        for j in range(1, 4):
-            avgGait[j][0] += (gaitValues[i][j][0]*t)
-            avgGait[j][1] += (gaitValues[i][j][1]*t)
-    n = totalTime
-    cadence /= n
-    avgStride[0][0] /= n
-    avgStride[0][1] /= n
-    avgStride[1][0] /= n
-    avgStride[1][1] /= n
-    for j in range(1, 4):
-        avgGait[j][0] /= n
-        avgGait[j][1] /= n
+        footLabel, confidence = classify_feet(indices)
+        if(confidence < minConfidence):
+            print("\nFoot 1 could not be classified (confidence %.2f)" % confidence)
+            footLabel = ask_foot_label()
+        else:
+            print("\nFoot 1 is the", "left" if footLabel == 'l' else "right", "foot (confidence %.2f)" % confidence)
+        if(footLabel == 'r'):
+            swap_feet(strideValues[i], gaitValues[i])
+    cadence, avgStride, avgGait = consolidate_runs(timeData, timeRegionRuns, cadenceValues, strideValues, gaitValues)
     print('\n\n', '-' * 25, '\n|', ' Consolidated Metrics ', ' |\n', '-' * 25, sep='')
     print("\nCadence: ", cadence)
-    print("Avg. Stride Length of Left  Foot: ", avgStride[0][0], "cm", end = '')
-    print(" \tAvg. Stride Velocity of Left  Foot: ", avgStride[1][0], "cm/s")
-    print("Avg. Stride Length of Right Foot: ", avgStride[0][1], "cm", end = '')
-    print(" \tAvg. Stride Velocity of Right Foot: ", avgStride[1][1], "cm/s")
-    print("\n\t\t Cycles \t Avg. Stance Phase \t\t Avg. Swing Phase \t\t Percentage Comparison")
-    print("Left  foot\t", int(avgGait[0][0]), "\t\t", avgGait[1][0], "\t\t", avgGait[2][0], "\t\t", '%.2f'%avgGait[3][0], "|", '%.2f'%(100-avgGait[3][0]))
-    print("Right foot\t", int(avgGait[0][1]), "\t\t", avgGait[1][1], "\t\t", avgGait[2][1], "\t\t", '%.2f'%avgGait[3][1], "|", '%.2f'%(100-avgGait[3][1]))
+    if(avgStride is None):
+        print("Stride Metrics Cannot be Calculated for this Data")
+    else:
+        print("Avg. Stride Length of Left  Foot: ", avgStride[0][0], "cm", end = '')
+        print(" \tAvg. Stride Velocity of Left  Foot: ", avgStride[1][0], "cm/s")
+        print("Avg. Stride Length of Right Foot: ", avgStride[0][1], "cm", end = '')
+        print(" \tAvg. Stride Velocity of Right Foot: ", avgStride[1][1], "cm/s")
+    if(avgGait is None):
+        print("Gait Metrics Cannot be Calculated for this Data")
+    else:
+        print("\n\t\t Cycles \t Avg. Stance Phase \t\t Avg. Swing Phase \t\t Percentage Comparison")
+        print("Left  foot\t", int(avgGait[0][0]), "\t\t", avgGait[1][0], "\t\t", avgGait[2][0], "\t\t", '%.2f'%avgGait[3][0], "|", '%.2f'%(100-avgGait[3][0]))
+        print("Right foot\t", int(avgGait[0][1]), "\t\t", avgGait[1][1], "\t\t", avgGait[2][1], "\t\t", '%.2f'%avgGait[3][1], "|", '%.2f'%(100-avgGait[3][1]))
         
 
-def single_run(pressureData, normalisedTimeData, timestamp, footRegions):
-    get_cadence(normalisedTimeData, footRegions)
-    get_stride(pressureData, normalisedTimeData, footRegions)
-    get_gait(normalisedTimeData, footRegions, timestamp)
-    indices = find_heels(pressureData, footRegions)
+def single_run(pressureData, normalisedTimeData, timestamp, footRegions, index=None, rate=100):
+    timeData, timeRegions, timestamps = normalisedTimeData, footRegions, timestamp
+    if(rate):
+        timeData, timeRegions, timestamps = resample_time(pressureData, normalisedTimeData, footRegions, timestamp, rate)
+    indices = find_heels(pressureData, footRegions, index)
+    get_cadence(timeData, timeRegions)
+    get_stride(pressureData, timeData, timeRegions, index, indices)
+    get_gait(timeData, timeRegions, timestamps)
     plot_path(pressureData, indices)
 
 
-filename = get_filename()
-
-jsonSource = int(input("Enter JSON File Source (1 - Consolidator Script, 2 - Sensing Mat Software): "))
-while jsonSource != 1 and jsonSource != 2:
-    jsonSource = int(input("Option Does Not Exist. Retry: "))
+if __name__ == '__main__':
+    filename = get_filename()
 
-pressureData, normalisedTimeData, timestamp = get_filedata(filename, jsonSource)
+    # .smat recordings store their source
+    jsonSource = 0
+    if not filename.lower().endswith('.smat'):
+        jsonSource = int(input("Enter JSON File Source (1 - Consolidator Script, 2 - Sensing Mat Software): "))
+        while jsonSource != 1 and jsonSource != 2:
+            jsonSource = int(input("Option Does Not Exist. Retry: "))
 
-footRegions = find_foot(pressureData)
-footRegions.sort(key=lambda data_slice: data_slice[2].start)
-pressureData = np.rollaxis(pressureData, -1)
-footRegions = correct_slices(pressureData, footRegions)
+    # frames, regions, heels and runs are read back from the cache when the file was analysed before
+    pressureData, normalisedTimeData, timestamp, footRegions, activity, runs, runRegions = analyse_recording(filename, jsonSource, cache=AnalysisCache())
 
-flag = 0
-count = 0
-runs = []
-
-for i in range(len(pressureData)):
-    if(np.any(pressureData[i])==1 and flag==0):
-        start = i
-        flag = 1       
-    elif(np.any(pressureData[i])==0 and flag==1):
-        count += 1
-    if(count > 2):
-        end = i
-        count = 0
-        flag = 0
-        runs.append([start, end]) 
-
-if(len(runs)>1):
-    multi_runs(pressureData, normalisedTimeData, timestamp, footRegions)
-else:
-    single_run(pressureData, normalisedTimeData, timestamp, footRegions)
+    if(len(runs)>1):
+        multi_runs(pressureData, normalisedTimeData, timestamp, footRegions, runs, runRegions, activity)
+    else:
+        single_run(pressureData, normalisedTimeData, timestamp, footRegions, activity)
 
-input("\nPress Any Key to Exit... ")
\ No newline at end of file
+    input("\nPress Any Key to Exit... ")
\ No newline at end of file
@@ -0,0 +1,238 @@
+'''
+Streaming footstep segmentation
+
+FootstepSegmenter takes the pressure matrices one frame at a time and gives
+back every footprint as soon as the foot has left the mat, instead of
+running find_foot() and correct_slices() over the whole recording. Only a
+few frames (depending on smoothRadius) are kept in memory.
+
+The regions are the same as the ones given by find_foot() followed by
+correct_slices():
+- the temporal part of the uniform filter is a sliding window over the
+  frames, the spatial part is applied to each frame
+- regions are labelled in each frame and joined with the regions of the
+  previous frame which they overlap
+- a region is complete when none of its pixels are present in a frame, and
+  its frames are then trimmed the same way correct_slices() does
+
+binary_fill_holes() is not needed: over the whole recording a hole in a
+footprint is connected to the background through the frames before and
+after the contact, so filling it does not change the regions. Filling the
+holes of each frame on its own would join regions find_foot() keeps apart.
+
+"python segmenter.py PATH_TO_FILE [jsonSource]" compares both methods on a
+recording.
+
+'''
+
+import sys
+import time
+import numpy as np
+import scipy as sp
+import scipy.ndimage
+from collections import deque
+
+class Footprint:
+    def __init__(self, start, head):
+        self.rows = [sys.maxsize, -1]
+        self.cols = [sys.maxsize, -1]
+        self.start = start
+        self.stop = start
+        # first pixel (row, col, frame) of the region in the order used by scipy's label
+        self.first = (sys.maxsize, sys.maxsize, sys.maxsize)
+        # raw frames at the start of the region, used to trim it
+        self.head = head
+        self.slices = None
+        # point of highest pressure in the first frame, same as find_heels()
+        self.heel = None
+
+    def add(self, rows, cols, frame):
+        self.rows = [min(self.rows[0], rows.start), max(self.rows[1], rows.stop)]
+        self.cols = [min(self.cols[0], cols.start), max(self.cols[1], cols.stop)]
+        self.stop = frame + 1
+
+    def merge(self, other):
+        self.rows = [min(self.rows[0], other.rows[0]), max(self.rows[1], other.rows[1])]
+        self.cols = [min(self.cols[0], other.cols[0]), max(self.cols[1], other.cols[1])]
+        if other.start < self.start:
+            self.start = other.start
+            self.head = other.head
+        self.stop = max(self.stop, other.stop)
+        self.first = min(self.first, other.first)
+
+class FootstepSegmenter:
+    def __init__(self, smoothRadius=5, threshold=0.0001):
+        self.threshold = threshold
+        self.size = smoothRadius
+        # frames before and after the current frame used by the uniform filter
+        self.before = smoothRadius // 2
+        self.after = smoothRadius - self.before - 1
+        # raw frames kept for the temporal filter and for trimming finished regions
+        self.raw = deque(maxlen=self.before + self.after + 2)
+        self.rawStart = 0
+        self.count = 0
+        self.frame = 0
+        self.prevLabels = None
+        self.prevRegions = []
+        self.parent = {}
+        self.regions = {}
+        self.nextId = 0
+
+    def raw_frame(self, index):
+        pos = index - self.rawStart
+        if 0 <= pos < len(self.raw):
+            return self.raw[pos]
+        return None
+
+    # index of the frame used by the uniform filter in mode 'reflect'
+    def reflect(self, index, length):
+        if index < 0:
+            return -index - 1
+        if length is not None and index >= length:
+            return 2 * length - index - 1
+        return index
+
+    # add a frame, returns the footprints which were completed
+    def push(self, frame):
+        if len(self.raw) == self.raw.maxlen:
+            self.rawStart += 1
+        self.raw.append(np.asarray(frame))
+        self.count += 1
+        completed = []
+        while self.frame + self.after < self.count:
+            completed += self.process(None)
+        return completed
+
+    # end of the recording, returns the remaining footprints
+    def close(self):
+        completed = []
+        while self.frame < self.count:
+            completed += self.process(self.count)
+        for key in list(self.regions):
+            completed.append(self.finish(self.regions.pop(key)))
+        return completed
+
+    # frames before this one belong to footprints which have already been returned
+    def open_start(self):
+        return min([region.start for region in self.regions.values()] + [self.frame])
+
+    def find(self, key):
+        while self.parent[key] != key:
+            self.parent[key] = self.parent[self.parent[key]]
+            key = self.parent[key]
+        return key
+
+    def union(self, a, b):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[b] = a
+            self.regions[a].merge(self.regions.pop(b))
+        return a
+
+    def process(self, length):
+        t = self.frame
+        window = [self.raw_frame(self.reflect(i, length)) for i in range(t - self.before, t + self.after + 1)]
+        smooth = np.sum(window, axis=0, dtype=np.double) / self.size
+        if smooth.any():
+            smooth = sp.ndimage.uniform_filter(smooth, self.size)
+            labels, numLabels = sp.ndimage.label(smooth > self.threshold)
+        else:
+            labels, numLabels = np.zeros(smooth.shape, dtype=np.int32), 0
+        regions = [None] * (numLabels + 1)
+        # join with the regions of the previous frame which overlap
+        if self.prevLabels is not None:
+            overlap = (labels > 0) & (self.prevLabels > 0)
+            for prev, curr in set(zip(self.prevLabels[overlap].tolist(), labels[overlap].tolist())):
+                key = self.find(self.prevRegions[prev])
+                regions[curr] = key if regions[curr] is None else self.union(regions[curr], key)
+        objects = sp.ndimage.find_objects(labels)
+        active = set()
+        for curr in range(1, numLabels + 1):
+            if regions[curr] is None:
+                key = self.nextId
+                self.nextId += 1
+                self.parent[key] = key
+                head = [self.raw_frame(i) for i in range(t, t + self.after + 1)]
+                self.regions[key] = Footprint(t, head)
+                regions[curr] = key
+            key = self.find(regions[curr])
+            regions[curr] = key
+            region = self.regions[key]
+            rows, cols = objects[curr - 1]
+            region.add(rows, cols, t)
+            row = rows.start
+            col = cols.start + int(np.argmax(labels[row, cols] == curr))
+            region.first = min(region.first, (row, col, t))
+            active.add(key)
+        completed = []
+        for key in list(self.regions):
+            if key not in active:
+                completed.append(self.finish(self.regions.pop(key)))
+        self.prevLabels = labels
+        # only the regions which are still open are kept in the union-find, the regions of the
+        # labels of this frame are given by their roots
+        self.prevRegions = [None if key is None else self.find(key) for key in regions]
+        self.parent = {key: key for key in self.regions}
+        self.frame += 1
+        return completed
+
+    # trim the frames of a finished region like correct_slices()
+    def finish(self, region):
+        x = slice(region.rows[0], region.rows[1])
+        y = slice(region.cols[0], region.cols[1])
+        start, end = region.start, region.stop
+        for i in range(start, end):
+            curr = region.head[i - region.start] if i - region.start < len(region.head) else None
+            if curr is not None and np.any(curr[x, y]):
+                start = i
+                curr = curr[x, y]
+                heel = np.unravel_index(np.argmax(curr), curr.shape)
+                region.heel = [heel[0] + x.start, heel[1] + y.start]
+                break
+        for i in range(end, start, -1):
+            curr = self.raw_frame(i)
+            if curr is not None and np.any(curr[x, y]):
+                end = i + 1
+                break
+        region.slices = (x, y, slice(start, end, None))
+        region.head = None
+        return region
+
+# footprints of a sequence of frames, in the same order as find_foot() sorted by start frame
+def segment(frames, smoothRadius=5, threshold=0.0001):
+    segmenter = FootstepSegmenter(smoothRadius, threshold)
+    footprints = []
+    for frame in frames:
+        footprints += segmenter.push(frame)
+    footprints += segmenter.close()
+    footprints.sort(key=lambda region: (region.start, region.first))
+    return [region.slices for region in footprints]
+
+if __name__ == '__main__':
+    import tracemalloc
+    import script
+    if(len(sys.argv) < 2):
+        print("Insufficient Parameters.\nEnter in the form \"python segmenter.py PATH_TO_FILE [jsonSource]\"")
+        sys.exit("Exited")
+    jsonSource = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    pressureData, timeData, timestamps = script.get_filedata(sys.argv[1], jsonSource)
+
+    tracemalloc.start()
+    startTime = time.perf_counter()
+    footRegions = script.find_foot(pressureData)
+    footRegions.sort(key=lambda data_slice: data_slice[2].start)
+    footRegions = script.correct_slices(np.rollaxis(pressureData, -1), footRegions)
+    batchTime = time.perf_counter() - startTime
+    batchPeak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    startTime = time.perf_counter()
+    streamRegions = segment(np.rollaxis(pressureData, -1))
+    streamTime = time.perf_counter() - startTime
+    streamPeak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    print("find_foot + correct_slices: ", len(footRegions), "footprints", '%.3f'%batchTime, "s", '%.1f'%(batchPeak/2**20), "MB")
+    print("FootstepSegmenter:          ", len(streamRegions), "footprints", '%.3f'%streamTime, "s", '%.1f'%(streamPeak/2**20), "MB")
+    print("Same footprints:", footRegions == streamRegions)
@@ -0,0 +1,88 @@
+import json
+import numpy as np
+import pytest
+import batch
+import script
+import features
+from matfile import MatFileWriter
+from test_live import walk
+
+def write_walk(path, numFrames=120):
+    frames = walk(numFrames, 48, 20)
+    with MatFileWriter(path, frames.shape[1], frames.shape[2], {}, 0, source=1) as writer:
+        for i, frame in enumerate(frames):
+            writer.append(frame, 1654084800.0 + i * 0.05)
+    return path
+
+def read_lines(journal):
+    with open(journal, 'r') as file:
+        return [json.loads(line) for line in file]
+
+def test_resume_with_other_parameters(tmp_path):
+    files = [write_walk(str(tmp_path / "walk.smat"))]
+    journal = str(tmp_path / "journal.jsonl")
+    first = batch.process_files(files, workers=1, journal=journal)
+    assert first[0]["error"] is None and not first[0].get("skipped")
+    assert first[0]["params"] == batch.journal_params()
+    # the same parameters are taken from the journal
+    again = batch.process_files(files, workers=1, journal=journal)
+    assert again[0]["skipped"] and again[0]["runs"] == first[0]["runs"]
+    # other parameters calculate the file again
+    other = batch.process_files(files, workers=1, journal=journal, gap=0.2, rate=0)
+    assert not other[0].get("skipped")
+    assert other[0]["params"] == batch.journal_params(gap=0.2, rate=0)
+    assert other[0]["runs"][0]["gait"] != first[0]["runs"][0]["gait"]
+    assert len(read_lines(journal)) == 2
+    # both results are kept in the journal
+    for params, expected in [({}, first[0]), ({"gap": 0.2, "rate": 0}, other[0])]:
+        resumed = batch.process_files(files, workers=1, journal=journal, **params)
+        assert resumed[0]["skipped"] and resumed[0]["runs"] == expected["runs"]
+    assert len(read_lines(journal)) == 2
+
+def test_journal_without_parameters_is_calculated_again(tmp_path):
+    files = [write_walk(str(tmp_path / "walk.smat"))]
+    journal = str(tmp_path / "journal.jsonl")
+    result = batch.process_files(files, workers=1)[0]
+    with open(journal, 'w') as file:
+        file.write(json.dumps(dict(result, params=None)) + '\n')
+    resumed = batch.process_files(files, workers=1, journal=journal)
+    assert not resumed[0].get("skipped")
+    assert resumed[0]["runs"] == result["runs"]
+
+# a walk classified with confidence 1 and a run of 2 footprints, which cannot be classified
+def test_runs_below_min_confidence_are_not_labelled(tmp_path):
+    frames = np.concatenate([walk(60, 60, 20), np.zeros((20, 60, 20), dtype=np.uint16), walk(14, 60, 20)])
+    path = str(tmp_path / "walk.smat")
+    with MatFileWriter(path, frames.shape[1], frames.shape[2], {}, 0, source=1) as writer:
+        for i, frame in enumerate(frames):
+            writer.append(frame, 1654084800.0 + i * 0.05)
+    result = batch.process_files([path], workers=1, footLabel='auto')[0]
+    walkRun, shortRun = result["runs"]
+    assert (walkRun["foot1"], walkRun["foot1Confidence"]) == ("left", 1.0)
+    assert (shortRun["foot1"], shortRun["foot1Confidence"]) == (None, 0.0)
+    assert result["consolidated"]["cadence"] == pytest.approx(walkRun["cadence"])
+    assert result["consolidated"]["gait"]["cycles"] == walkRun["gait"]["cycles"]
+    assert result["consolidated"]["gait"]["avgStance"] == pytest.approx(walkRun["gait"]["avgStance"])
+    # without a minimum both runs are labelled and consolidated, like --foot-label left
+    labelled = batch.process_files([path], workers=1, footLabel='auto', minConfidence=0)[0]
+    assert [run["foot1"] for run in labelled["runs"]] == ["left", "left"]
+    left = batch.process_files([path], workers=1, footLabel='left')[0]
+    assert labelled["consolidated"] == left["consolidated"] != result["consolidated"]
+
+# without the cache the frames of a chunked recording are thresholded into a temporary file
+def test_chunked_analysis_matches_in_memory(tmp_path):
+    path = write_walk(str(tmp_path / "walk.smat"), 300)
+    whole = batch.analyse_file(path, footLabel='auto', featureFolder=str(tmp_path))
+    chunked = batch.analyse_file(path, footLabel='auto', chunkFrames=7)
+    assert chunked["runs"] == whole["runs"] and chunked["consolidated"] == whole["consolidated"]
+    pressureData, timeData, timestamps, footRegions = script.analyse_recording(path, 1, chunkFrames=7)[:4]
+    assert isinstance(pressureData, np.memmap)
+    # the features gathered one footprint at a time are the same as gathered at once
+    saved = np.load(whole["features"])
+    gatherRows, script.GATHER_ROWS = script.GATHER_ROWS, 1
+    try:
+        grouped = features.FootprintFeatures(pressureData, timeData, footRegions)
+    finally:
+        script.GATHER_ROWS = gatherRows
+    for name in saved.files:
+        assert np.array_equal(saved[name], getattr(grouped, name), equal_nan=True)
@@ -0,0 +1,75 @@
+import os
+import json
+import glob
+import numpy as np
+from cache import AnalysisCache
+
+def write_file(path, content):
+    with open(path, 'wb') as file:
+        file.write(content)
+    return path
+
+def test_key_changes_with_the_parameters_and_the_content(tmp_path):
+    cache = AnalysisCache(str(tmp_path / "cache"))
+    path = write_file(str(tmp_path / "walk.smat"), b"frames")
+    key = cache.key(path, gap=0.5, pressureThreshold=300)
+    assert cache.key(path, pressureThreshold=300, gap=0.5) == key
+    assert cache.key(path, gap=0.6, pressureThreshold=300) != key
+    assert cache.key(path, gap=0.5) != key
+    # another file with the same content shares the products
+    assert cache.key(write_file(str(tmp_path / "copy.smat"), b"frames"), gap=0.5, pressureThreshold=300) == key
+    write_file(path, b"other frames")
+    assert cache.key(path, gap=0.5, pressureThreshold=300) != key
+
+def test_store_and_load(tmp_path):
+    cache = AnalysisCache(str(tmp_path))
+    frames = np.arange(24, dtype=np.uint16).reshape(2, 3, 4)
+    cache.store("k", "frames", frames)
+    cache.store("k", "runs", [[0, 2], [[0, 1]]])
+    assert np.array_equal(cache.load("k", "frames"), frames)
+    assert cache.load("k", "runs") == [[0, 2], [[0, 1]]]
+    assert cache.load("k", "heels") is None
+    assert (cache.hits, cache.misses) == (2, 1)
+
+def test_store_chunks_round_trip(tmp_path):
+    cache = AnalysisCache(str(tmp_path))
+    frames = np.random.default_rng(0).integers(0, 2**16, size=(10, 4, 3)).astype(np.uint16)
+    stored = cache.store_chunks("k", "frames", frames.shape, np.uint16, (frames[i:i + 3] for i in range(0, 10, 3)))
+    assert isinstance(stored, np.memmap) and stored.dtype == np.uint16
+    assert np.array_equal(stored, frames)
+    assert np.array_equal(cache.load("k", "frames"), frames)
+
+def test_least_recently_used_are_evicted_first(tmp_path):
+    array = np.zeros(1000, dtype=np.uint8)
+    size = len(array) + 128
+    cache = AnalysisCache(str(tmp_path), maxBytes=3 * size)
+    for age, name in enumerate(["a", "b", "c"]):
+        cache.store("k", name, array)
+        # older files first, without waiting for the clock
+        os.utime(cache.path("k", name, '.npy'), (1000 + age, 1000 + age))
+    # loading a touches it, so b is now the one used least recently
+    assert cache.load("k", "a") is not None
+    cache.store("k", "d", array)
+    assert cache.load("k", "b") is None
+    assert all(cache.load("k", name) is not None for name in ["a", "c", "d"])
+    assert cache.size() <= 3 * size
+
+def test_file_hash_is_remembered(tmp_path):
+    folder = str(tmp_path / "cache")
+    cache = AnalysisCache(folder, maxBytes=0)
+    path = write_file(str(tmp_path / "walk.smat"), b"frames")
+    digest = cache.file_hash(path)
+    memo, = glob.glob(os.path.join(folder, "hash_*.json"))
+    # an unchanged file is not read again, the remembered hash is returned
+    with open(memo, 'r') as file:
+        known = json.load(file)
+    with open(memo, 'w') as file:
+        json.dump(dict(known, sha256="remembered"), file)
+    assert cache.file_hash(path) == "remembered"
+    # the remembered hashes are not evicted with the products, even over maxBytes
+    cache.store("k", "runs", [])
+    assert os.path.exists(memo) and cache.load("k", "runs") is None
+    # a changed file is hashed again
+    write_file(path, b"other frames")
+    os.utime(path, ns=(known["mtime"] + 10**9, known["mtime"] + 10**9))
+    assert cache.file_hash(path) not in ("remembered", digest)
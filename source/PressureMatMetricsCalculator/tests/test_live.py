@@ -0,0 +1,52 @@
+import numpy as np
+import live
+from test_segmentation import reference
+
+# walk with the feet apart, so that every step is a footprint of its own. Each foot is on the mat for
+# 8 frames, the other foot lands 7 frames after it and the recording ends during a step.
+def walk(numFrames, rows=40, cols=16, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:rows, 0:cols]
+    frames = np.zeros((numFrames, rows, cols), dtype=np.uint16)
+    for step in range(numFrames // 7 + 1):
+        y = (step * 5) % (rows - 8) + 4
+        x = 3 if step % 2 else 12
+        foot = np.exp(-(((yy - y) / 3.0) ** 2 + (xx - x) ** 2)) * rng.uniform(1500, 3000)
+        foot = np.where(foot < 300, 0, foot).astype(np.uint16)
+        frames[step * 7:step * 7 + 8] = np.maximum(frames[step * 7:step * 7 + 8], foot)
+    return frames
+
+def run(frames, frameTime=0.05):
+    updates = []
+    metrics = live.LiveMetrics(updates.append)
+    sizes = []
+    for i, frame in enumerate(frames):
+        metrics.add_frame(frame, 1000.0 + i * frameTime)
+        sizes.append((len(metrics.times), len(metrics.segmenter.parent), len(metrics.pending)))
+    metrics.close()
+    return updates, sizes
+
+def test_updates_match_footprints():
+    frames = walk(400)
+    regions, heels = reference(frames)
+    updates, sizes = run(frames)
+    assert [update["footprint"] for update in updates] == list(range(1, len(regions) + 1))
+    assert np.allclose([update["start"] for update in updates], [z.start * 0.05 for x, y, z in regions])
+    assert [update["heel"] for update in updates] == heels
+    stances = [(z.stop - 1 - z.start) * 0.05 for x, y, z in regions]
+    assert np.allclose([update["stance"] for update in updates], stances)
+    last = updates[-1]
+    assert np.isclose(last["cadence"], len(regions) / ((len(frames) - 1 - regions[0][2].start) * 0.05 / 60))
+    # each stance is paired with the swing which follows it on the same foot
+    swings = [(regions[i][2].start - regions[i - 2][2].stop + 1) * 0.05 for i in range(2, len(regions))]
+    cycles = [len(swings[0::2]), len(swings[1::2])]
+    assert last["gait"]["cycles"] == cycles
+    assert np.allclose(last["gait"]["avgSwing"], [np.mean(swings[0::2]), np.mean(swings[1::2])])
+    assert np.allclose(last["gait"]["avgStance"], [np.mean(stances[0:len(swings):2]), np.mean(stances[1:len(swings):2])])
+
+def test_state_does_not_grow():
+    # the frame times, union-find and pending footprints only hold the footprints still open
+    short = max(max(size) for size in run(walk(200))[1])
+    long = max(max(size) for size in run(walk(2000))[1])
+    assert long == short
+    assert long <= 20
@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+import script
+import chunks
+import segmenter
+from matfile import SparseFrames
+
+# (frames, rows, cols) walk of alternating feet, 7 frames on the mat and 3 frames off it for every
+# step. The recording stops during the last step, so its footprint runs to the last frame.
+def walk(numFrames=64, rows=40, cols=16, seed=0):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:rows, 0:cols]
+    frames = np.zeros((numFrames, rows, cols), dtype=np.uint16)
+    for i in range(numFrames):
+        step = i // 10
+        if i % 10 < 7:
+            y = (step * 6) % (rows - 8) + 4
+            x = 5 if step % 2 else 10
+            foot = np.exp(-(((yy - y) / 3.0) ** 2 + ((xx - x) / 2.0) ** 2)) * rng.uniform(1500, 3000)
+            frames[i] = np.where(foot < 300, 0, foot)
+    return frames
+
+# sparse points of pressure, which give many small regions touching in time and space
+def noise(numFrames=50, rows=20, cols=14, seed=0):
+    rng = np.random.default_rng(seed)
+    pressed = rng.random((numFrames, rows, cols)) < 0.01
+    return np.where(pressed, rng.integers(300, 3000, size=pressed.shape), 0).astype(np.uint16)
+
+RECORDINGS = [walk(), walk(63, seed=1), noise(), noise(seed=1)]
+
+# find_foot() sorted by first frame with every region trimmed and its heel found one frame at a
+# time, the way correct_slices() and find_heels() worked before the activity index. Like them the
+# end is searched from the frame after the region back to the frame after the start, the frame
+# after the region is left out when the region runs to the last frame.
+def reference(frames, smoothRadius=5):
+    regions = script.find_foot(np.moveaxis(frames, 0, -1), smoothRadius)
+    regions.sort(key=lambda data_slice: data_slice[2].start)
+    trimmed = []
+    heels = []
+    for x, y, z in regions:
+        start = next((i for i in range(z.start, z.stop) if np.any(frames[i][x, y])), z.start)
+        stop = next((i + 1 for i in range(min(z.stop, len(frames) - 1), start, -1) if np.any(frames[i][x, y])), z.stop)
+        trimmed.append((x, y, slice(start, stop, None)))
+        first = frames[start][x, y]
+        heel = np.unravel_index(np.argmax(first), first.shape)
+        heels.append([int(heel[0]) + x.start, int(heel[1]) + y.start])
+    return trimmed, heels
+
+@pytest.mark.parametrize("frames", RECORDINGS)
+def test_activity_index_matches_reference(frames):
+    regions, heels = reference(frames)
+    found = script.find_foot(np.moveaxis(frames, 0, -1))
+    found.sort(key=lambda data_slice: data_slice[2].start)
+    activity = script.ActivityIndex(frames, found)
+    found = script.correct_slices(frames, found, activity)
+    assert found == regions
+    assert script.find_heels(frames, found, activity) == heels
+    # heels of regions which are not in the index are looked up
+    assert script.find_heels(frames, found) == heels
+
+@pytest.mark.parametrize("frames", RECORDINGS)
+@pytest.mark.parametrize("smoothRadius", [5, 4])
+def test_streaming_segmenter_matches_reference(frames, smoothRadius):
+    regions, heels = reference(frames, smoothRadius)
+    stream = segmenter.FootstepSegmenter(smoothRadius)
+    footprints = []
+    for frame in frames:
+        footprints += stream.push(frame)
+    footprints += stream.close()
+    footprints.sort(key=lambda region: (region.start, region.first))
+    assert [region.slices for region in footprints] == regions
+    assert [region.heel for region in footprints] == heels
+    assert segmenter.segment(frames, smoothRadius) == regions
+
+@pytest.mark.parametrize("frames", RECORDINGS)
+def test_sparse_frames_match_reference(frames):
+    regions, heels = reference(frames)
+    points = SparseFrames.from_dense(frames)
+    assert script.find_foot_sparse(points) == regions
+    assert script.find_heels(points, regions) == heels
+
+@pytest.mark.parametrize("frames", RECORDINGS)
+@pytest.mark.parametrize("chunkFrames", [1, 7, 1000])
+def test_chunked_segmentation_matches_find_foot(frames, chunkFrames):
+    regions, heels = reference(frames)
+    found = script.find_foot(np.moveaxis(frames, 0, -1))
+    found.sort(key=lambda data_slice: data_slice[2].start)
+    chunked = chunks.find_foot_chunked(frames, chunkFrames)
+    assert chunked == found
+    activity = script.ActivityIndex(frames, chunked)
+    assert script.correct_slices(frames, chunked, activity) == regions
+    assert script.find_heels(frames, chunked, activity) == heels
+
+def test_footprint_runs_to_the_last_frame():
+    frames = walk()
+    assert np.any(frames[-1])
+    regions, heels = reference(frames)
+    assert regions[-1][2].stop == len(frames)
+    assert segmenter.segment(frames) == regions
+    for chunkFrames in [1, 7, len(frames) + 1]:
+        chunked = chunks.find_foot_chunked(frames, chunkFrames)
+        assert script.correct_slices(frames, chunked) == regions
+
+def test_threshold_chunks():
+    frames = walk()
+    thresholded = np.concatenate(list(chunks.threshold_chunks(frames, 7, 1000)))
+    assert thresholded.dtype == np.uint16
+    assert np.array_equal(thresholded, np.where(frames < 1000, 0, frames))
+    mapped = chunks.threshold_to_disk(frames, 7, 1000)
+    assert isinstance(mapped, np.memmap) and mapped.dtype == np.uint16
+    assert np.array_equal(mapped, thresholded)
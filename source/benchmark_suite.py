@@ -0,0 +1,170 @@
+'''
+End to end benchmarks of the consolidator, the metrics calculator and the
+data logger on simulated walks (see ConsolidatingSensingMatReadings/simulator.py).
+
+1. Capture: frames per second read from the simulated mats and stored by
+   the consolidator's acquisition pipeline, as fast as it can (--fps) or at
+   a target rate. The mats are simulated in the same process, or served on
+   pseudo terminals and opened as serial ports with --pty (Linux and macOS).
+2. For each recording length a walk over the mats at 20 fps, with as many
+   runs as fit in it, is written as a dense and as a sparse .smat recording:
+   - Load: time taken by get_filedata() of the metrics calculator
+   - Segmentation: find_foot() and correct_slices() on the dense recording
+     and the streaming segmenter on the sparse one, which have to find the
+     same footprints
+   - Logger: frames per second rendered into HTML records by the data
+     logger, for the first --log-frames frames of the recording
+
+"python benchmark_suite.py [frames ...] [--mats N] [--capture SECONDS] [--fps FPS] [--parallel] [--pty]
+                           [--log-frames N] [--json FILE]"
+
+'''
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import itertools
+import importlib.util
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# the three programs have a script.py each, the consolidator is imported as script since the
+# simulator uses it and the other two under their own names. Their copies of matfile.py are the same.
+sys.path.insert(0, os.path.join(FOLDER, "ConsolidatingSensingMatReadings"))
+import script as consolidator
+import simulator
+from matfile import MatFileWriter
+
+def load_script(folder, name):
+    sys.path.insert(0, os.path.join(FOLDER, folder))
+    spec = importlib.util.spec_from_file_location(name, os.path.join(FOLDER, folder, "script.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+metrics = load_script("PressureMatMetricsCalculator", "metrics")
+logger = load_script("PressureDataLogger", "logger")
+
+# frames per second captured by the acquisition pipeline in the given number of seconds
+def benchmarkCapture(folder, pattern, seconds, fps, parallel=False, pty=False):
+    numMats = pattern.rows // 48
+    mats = simulator.walkingMats(pattern)
+    stopServing = threading.Event()
+    if pty:
+        import serial
+        ports = [serial.Serial(name, baudrate=115200, timeout=0.1) for name in simulator.openPtys(mats, stopServing)]
+    else:
+        ports = mats
+    readers = ThreadPoolExecutor(max_workers=numMats) if parallel else None
+    writer = MatFileWriter(os.path.join(folder, "capture.smat"), pattern.rows, pattern.cols, numMatTimes=numMats if parallel else 0)
+    scheduler = consolidator.FrameScheduler(fps)
+    pipeline = consolidator.AcquisitionPipeline(ports, writer, scheduler, pattern.rows, pattern.cols, 64, readers)
+    stop = threading.Event()
+    pipeline.start(stop)
+    stop.wait(seconds)
+    stop.set()
+    pipeline.join()
+    writer.close()
+    stopServing.set()
+    if readers is not None:
+        readers.shutdown()
+    if pty:
+        for port in ports:
+            port.close()
+    stats = pipeline.stats()
+    return {"mats": numMats, "transport": "pty" if pty else "in process", "parallel": parallel, "target": fps,
+        "fps": scheduler.rate(), "written": stats["written"], "dropped": stats["dropped"]}
+
+# a walk of numFrames frames at fps written as a dense and a sparse recording
+def write_walk(folder, pattern, numFrames, fps=20):
+    densePath = os.path.join(folder, "walk_%d.smat" % numFrames)
+    sparsePath = os.path.join(folder, "walk_%d_sparse.smat" % numFrames)
+    startTime = time.time()
+    with MatFileWriter(densePath, pattern.rows, pattern.cols) as dense, MatFileWriter(sparsePath, pattern.rows, pattern.cols, sparse=True) as sparse:
+        for t, frame in itertools.islice(pattern.frames(fps), numFrames):
+            dense.append(frame, startTime + t)
+            sparse.append(frame, startTime + t)
+    return densePath, sparsePath
+
+def load(path):
+    startTime = time.perf_counter()
+    pressureData, timeData, timestamps = metrics.get_filedata(path, 1)
+    return pressureData, time.perf_counter() - startTime
+
+# footprints the same way as the metrics calculator, and the time taken
+def segment(pressureData):
+    startTime = time.perf_counter()
+    if isinstance(pressureData, metrics.SparseFrames):
+        footRegions = metrics.find_foot_sparse(pressureData)
+    else:
+        footRegions = metrics.find_foot(pressureData)
+        footRegions.sort(key=lambda data_slice: data_slice[2].start)
+        pressureData = np.rollaxis(pressureData, -1)
+        footRegions = metrics.correct_slices(pressureData, footRegions, metrics.ActivityIndex(pressureData, footRegions))
+    return footRegions, time.perf_counter() - startTime
+
+# frames per second rendered into HTML records by the data logger
+def render(path, numFrames):
+    frames = list(itertools.islice(logger.read_frames(path), numFrames))
+    startTime = time.perf_counter()
+    size = 0
+    for timeData, imgList in logger.render_frames(frames):
+        size += len(str(logger.VisualRecord(logger.format_time(timeData), imgs=imgList, fmt="png")))
+    return len(frames) / (time.perf_counter() - startTime), size
+
+def benchmarkRecording(folder, pattern, numFrames, logFrames):
+    densePath, sparsePath = write_walk(folder, pattern, numFrames)
+    dense, denseLoad = load(densePath)
+    sparse, sparseLoad = load(sparsePath)
+    denseRegions, denseSegment = segment(dense)
+    sparseRegions, sparseSegment = segment(sparse)
+    # both layouts have to give the same footprints
+    assert denseRegions == sparseRegions
+    del dense, sparse
+    rate, size = render(densePath, logFrames)
+    return {"frames": numFrames, "footprints": len(denseRegions),
+        "denseMB": os.path.getsize(densePath) / 2**20, "sparseMB": os.path.getsize(sparsePath) / 2**20,
+        "denseLoad": denseLoad, "sparseLoad": sparseLoad, "denseSegment": denseSegment, "sparseSegment": sparseSegment,
+        "loggerFps": rate, "loggerFrames": min(numFrames, logFrames), "loggerKB": size / 1024}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage="python benchmark_suite.py [frames ...] [--mats N] [--capture SECONDS] [--fps FPS] [--parallel] [--pty] [--log-frames N] [--json FILE]")
+    parser.add_argument("frames", nargs="*", type=int, default=[500, 2000, 8000], help="lengths of the recordings")
+    parser.add_argument("--mats", type=int, default=2)
+    parser.add_argument("--cadence", type=float, default=110, help="steps per minute of the walk")
+    parser.add_argument("--capture", type=float, default=3.0, help="seconds of capture, 0 to skip it")
+    parser.add_argument("--fps", type=float, default=1000.0, help="target frame rate of the capture (1000 by default, as fast as possible)")
+    parser.add_argument("--parallel", action="store_true", help="read the mats in parallel during the capture")
+    parser.add_argument("--pty", action="store_true", help="serve the simulated mats on pseudo terminals")
+    parser.add_argument("--log-frames", type=int, default=300, help="frames rendered by the data logger for each recording")
+    parser.add_argument("--json", help="save the results to this JSON file")
+    args = parser.parse_args()
+
+    pattern = simulator.WalkingPattern(args.mats, args.cadence, runs=1)
+    results = {"capture": None, "recordings": []}
+    with tempfile.TemporaryDirectory() as folder:
+        if args.capture > 0:
+            capture = benchmarkCapture(folder, pattern, args.capture, args.fps, args.parallel, args.pty)
+            results["capture"] = capture
+            print("Capture from", capture["mats"], "mats (%s):" % capture["transport"], '%.1f'%capture["fps"], "fps (target",
+                '%.0f)'%args.fps, "\tWritten:", capture["written"], "\tDropped:", capture["dropped"])
+        print("\nFrames \t| Footprints \t| Dense / sparse (MB) \t| Load dense / sparse (s) \t| Segment dense / sparse (s) \t| Logger (fps)")
+        print("-" * 130)
+        for numFrames in args.frames:
+            # as many runs as fit in the recording
+            walk = simulator.WalkingPattern(args.mats, args.cadence, runs=int(numFrames / 20 / (pattern.runTime + pattern.gap)) + 1)
+            result = benchmarkRecording(folder, walk, numFrames, args.log_frames)
+            results["recordings"].append(result)
+            print(numFrames, "\t|", result["footprints"], "\t\t|", '%.1f / %.1f'%(result["denseMB"], result["sparseMB"]),
+                "\t\t|", '%.3f / %.3f'%(result["denseLoad"], result["sparseLoad"]),
+                "\t\t|", '%.3f / %.3f'%(result["denseSegment"], result["sparseSegment"]), "\t\t|", '%.1f'%result["loggerFps"])
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump(results, file, indent=2)
+        print("\nResults saved at PATH:", args.json)